@@ -6,237 +6,201 @@ the user has to select one of the 2 files as the reference/"ground truth" to cal
 '''
 
 import pandas as pd
-import numpy as np
 import easygui
-from scipy import stats
+import matplotlib.pyplot as plt
 import os
-from utilities.def_func import get_csv_file, sorting_detections, input_date, t_rounder, task_status_selection, read_param
-
-# %% Load data - user inputs
-
-# Load parameters from the YAML file
-yaml_file_path = os.path.join(os.getcwd(), 'performances', 'Python', 'detection_performance_parameters.yaml')
-parameters = read_param(file=yaml_file_path)
-
-
-# import detections, reference timebin, labels and annotators for each file
-df_detections, info = pd.DataFrame(), pd.DataFrame()
-for args in parameters:
-    df_detections_file, info_file = sorting_detections(**args)
-    df_detections = pd.concat([df_detections, df_detections_file], ignore_index=True)
-    info = pd.concat([info, info_file], ignore_index=True)
-
-timebin_detections = list(set(info['max_time'].explode()))
-annotators_detections = list(set(info['annotators'].explode()))
-labels_detections = list(set(info['labels'].explode()))
-
-
-# choose which file is used as the reference or "ground truth"
-if len(parameters) == 2:
-    choice_ref = easygui.buttonbox('Select the reference', '{0}'.format('Loading data'), [os.path.basename(parameters[i]['file']) for i in range(len(parameters))])
-    if os.path.basename(parameters[0]['file']) != choice_ref:
-        info.iloc[0], info.iloc[1] = info.iloc[1], info.iloc[0]
-else: raise Exception("Passed sets of parameters different than 2")
-
-
-# select only detections/annotations of certain annotators
-# status_list = get_csv_file(1)
-# df_detections = task_status_selection(files=status_list, df_detections=df_detections, user=['jbeesa', 'bcolon'])
-
-
-# choose the date interval on which the performances will be computed
-# if mode is input, a pop-up window ask the user the dates to work with
-# if mode is fixed, the date interval is hard coded bu the user
-mode = 'fixed'
-
-if mode == 'input':
-    begin_date = input_date('Enter begin datetime')
-    end_date = input_date('Enter end datetime')
-elif mode == 'fixed':
-    begin_date = pd.Timestamp('2023-02-11 19:00:00 +0100')
-    end_date = pd.Timestamp('2023-02-12 23:00:00 +0100')
-
-# annotators
-annotator1 = easygui.buttonbox('Select annotator 1 (reference)', 'file 1 : {0}'.format(os.path.basename(parameters[0]['file'])), info['annotators'][0]) if len(info['annotators'][0]) > 1 else info['annotators'][0][0]
-annotator2 = easygui.buttonbox('Select annotator 2', 'file 2 : {0}'.format(os.path.basename(parameters[1]['file'])), info['annotators'][1]) if len(info['annotators'][1]) > 1 else info['annotators'][1][0]
-
-# labels
-labels1 = info.iloc[0]['labels']
-labels2 = info.iloc[1]['labels']
-
-# files list
-files_list = [parameters[i]['file'] for i in range(len(parameters))]
-
-# data recap
-print('\n### Detections ###')
-print('Timebin: {0}s'.format(timebin_detections))
-print('Begin date: {0}'.format(begin_date))
-print('End date: {0}'.format(end_date))
-
-print('\n### Reference file ###')
-print('detection file: {0}'.format(os.path.basename(parameters[0]['file'])))
-print('labels: {0}'.format(labels1))
-print('annotator: {0}'.format(annotator1))
-
-print('\n### file 2 ###')
-print('detection file: {0}'.format(os.path.basename(parameters[1]['file'])))
-print('labels: {0}'.format(labels2))
-print('annotator: {0}'.format(annotator2))
-
-# %% FORMAT DATA
-'''
-For each file, a dataframe is created, df1 (reference) and df2.
-For each dataframe, whithin each time_vector timestamp is checked if
-at least one timestamp of the detection file is present.
-A binary vector is then created for each df (vec1 and vec2),
-its length is the same of time_vector and is composed of 0 and 1
-corresponding to the presence/absence of detections at the corresponding datetime frame
-'''
-
-# creation of a time vector that goes from the start date to the end date with every timebin
-time_vector = [i.timestamp() for i in pd.date_range(start=begin_date, end=end_date, freq=str(timebin_detections[0]) + 's')]
-
-# df1 - REFERENCE
-selected_label1 = easygui.buttonbox('Select a label', 'file 1 : {0}'.format(files_list[0].split('/')[-1]), labels1) if len(labels1) > 1 else labels1[0]
-selected_annotations1 = df_detections[(df_detections['annotator'] == annotator1) & (df_detections['annotation'] == selected_label1) & (df_detections['start_datetime'] >= begin_date) & (df_detections['end_datetime'] <= end_date)]
-
-times1_beg = sorted(list(set(x.timestamp() for x in selected_annotations1['start_datetime'])))
-times1_end = sorted(list(set(y.timestamp() for y in selected_annotations1['end_datetime'])))
-
-vec1, ranks, k = np.zeros(len(time_vector), dtype=int), [], 0
-for i in range(len(times1_beg)):
-    for j in range(k, len(time_vector) - 1):
-        if int(times1_beg[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)) or int(times1_end[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)):
-            ranks.append(j)
-            k = j
-            break
-        else:
-            continue
-ranks = sorted(list(set(ranks)))
-vec1[np.isin(range(len(time_vector)), ranks)] = 1
-
-# df2
-selected_label2 = easygui.buttonbox('Select a label', '{0}'.format(files_list[1].split('/')[-1]), labels2) if len(labels2) > 1 else labels2[0]
-selected_annotations2 = df_detections[(df_detections['annotator'] == annotator2) & (df_detections['annotation'] == selected_label2) & (df_detections['start_datetime'] >= begin_date) & (df_detections['end_datetime'] <= end_date)]
-
-times2_beg = [i.timestamp() for i in selected_annotations2['start_datetime']]
-times2_end = [i.timestamp() for i in selected_annotations2['end_datetime']]
-
-vec2, ranks, k = np.zeros(len(time_vector), dtype=int), [], 0
-for i in range(len(times2_beg)):
-    for j in range(k, len(time_vector) - 1):
-        if int(times2_beg[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)) or int(times2_end[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)):
-            ranks.append(j)
-            k = j
-            break
-        else:
-            continue
-ranks = sorted(list(set(ranks)))
-vec2[np.isin(range(len(time_vector)), ranks)] = 1
-
-# DETECTION PERFORMANCES
-true_pos, false_pos, true_neg, false_neg, error = 0, 0, 0, 0, 0
-for i in range(len(time_vector)):
-    if vec1[i] == 0 and vec2[i] == 0:
-        true_neg += 1
-    elif vec1[i] == 1 and vec2[i] == 1:
-        true_pos += 1
-    elif vec1[i] == 0 and vec2[i] == 1:
-        false_pos += 1
-    elif vec1[i] == 1 and vec2[i] == 0:
-        false_neg += 1
-    else: error += 1
-
-print('\n\n### Detection results ###', end='\n')
-if error == 0:
-    print('True positive : {0}'.format(true_pos))
-    print('True negative : {0}'.format(true_neg))
-    print('False positive : {0}'.format(false_pos))
-    print('False negative : {0}'.format(false_neg))
-
-    print('\nPRECISION : {0:.2f}'.format(true_pos / (true_pos + false_pos)))
-    print('RECALL : {0:.2f}'.format(true_pos / (false_neg + true_pos)))
-
-    # f-score : 2*(precision*recall)/(precision+recall)
-    print('F-SCORE : {0:.2f}'.format(2 * ((true_pos / (true_pos + false_pos)) * (true_pos / (false_neg + true_pos))) / ((true_pos / (true_pos + false_pos)) + (true_pos / (false_neg + true_pos)))), end='\n\n')
+from utilities.def_func import get_csv_file, load_detections, input_date, t_rounder, task_status_selection, read_param, score_columns
+from utilities.performances_func import evaluate_detections, batch_evaluation, tolerance_sweep, score_sweep
+from utilities.event_matching import match_events
+from utilities.bootstrap import bootstrap_detections
+from utilities.correlation import correlation_resolutions
+from utilities.agreement import annotator_agreement
+
+if __name__ == '__main__':
+    # the detection files are loaded in parallel, the processes re-import this script on Windows (spawn)
+    # %% Load data - user inputs
+
+    # Load parameters from the YAML file
+    yaml_file_path = os.path.join(os.getcwd(), 'performances', 'Python', 'detection_performance_parameters.yaml')
+    parameters = read_param(file=yaml_file_path)
+
+
+    # import detections, reference timebin, labels and annotators for each file
+    df_detections, info = load_detections(parameters, n_workers=None)
+
+    timebin_detections = list(set(info['max_time'].explode()))
+    annotators_detections = list(set(info['annotators'].explode()))
+    labels_detections = list(set(info['labels'].explode()))
+
+
+    # choose which file is used as the reference or "ground truth"
+    if len(parameters) == 2:
+        choice_ref = easygui.buttonbox('Select the reference', '{0}'.format('Loading data'), [os.path.basename(parameters[i]['file']) for i in range(len(parameters))])
+        if os.path.basename(parameters[0]['file']) != choice_ref:
+            info.iloc[0], info.iloc[1] = info.iloc[1], info.iloc[0]
+    else: raise Exception("Passed sets of parameters different than 2")
+
+
+    # select only detections/annotations of the segments FINISHED by certain annotators
+    # status_list : APLOSE task status files, empty to keep all the segments (ex : status_list = get_csv_file(1))
+    # status_users : annotators whose status is taken into account (ex : ['jbeesa', 'bcolon']), 'all' by default
+    status_list = []
+    status_users = 'all'
+    if status_list:
+        df_detections = task_status_selection(files=status_list, df_detections=df_detections, user=status_users)
+
+
+    # choose the date interval on which the performances will be computed
+    # if mode is input, a pop-up window ask the user the dates to work with
+    # if mode is fixed, the date interval is hard coded bu the user
+    mode = 'fixed'
+
+    if mode == 'input':
+        begin_date = input_date('Enter begin datetime')
+        end_date = input_date('Enter end datetime')
+    elif mode == 'fixed':
+        begin_date = pd.Timestamp('2023-02-11 19:00:00 +0100')
+        end_date = pd.Timestamp('2023-02-12 23:00:00 +0100')
+
+    # annotators
+    annotator1 = easygui.buttonbox('Select annotator 1 (reference)', 'file 1 : {0}'.format(os.path.basename(parameters[0]['file'])), info['annotators'][0]) if len(info['annotators'][0]) > 1 else info['annotators'][0][0]
+    annotator2 = easygui.buttonbox('Select annotator 2', 'file 2 : {0}'.format(os.path.basename(parameters[1]['file'])), info['annotators'][1]) if len(info['annotators'][1]) > 1 else info['annotators'][1][0]
+
+    # labels
+    labels1 = info.iloc[0]['labels']
+    labels2 = info.iloc[1]['labels']
+
+    # files list
+    files_list = [parameters[i]['file'] for i in range(len(parameters))]
+
+    # data recap
+    print('\n### Detections ###')
+    print('Timebin: {0}s'.format(timebin_detections))
+    print('Begin date: {0}'.format(begin_date))
+    print('End date: {0}'.format(end_date))
+
+    print('\n### Reference file ###')
+    print('detection file: {0}'.format(os.path.basename(parameters[0]['file'])))
+    print('labels: {0}'.format(labels1))
+    print('annotator: {0}'.format(annotator1))
+
+    print('\n### file 2 ###')
+    print('detection file: {0}'.format(os.path.basename(parameters[1]['file'])))
+    print('labels: {0}'.format(labels2))
+    print('annotator: {0}'.format(annotator2))
+
+    # %% FORMAT DATA
+    '''
+    For each file, a dataframe is created, df1 (reference) and df2.
+    The time window is divided into timebins and a binary vector is created for each df,
+    each timebin being positive if it contains at least one detection (see performances_func.py)
+    '''
+
+    # df1 - REFERENCE
+    selected_label1 = easygui.buttonbox('Select a label', 'file 1 : {0}'.format(files_list[0].split('/')[-1]), labels1) if len(labels1) > 1 else labels1[0]
+    selected_annotations1 = df_detections[(df_detections['annotator'] == annotator1) & (df_detections['annotation'] == selected_label1)]
+
+    # df2
+    selected_label2 = easygui.buttonbox('Select a label', '{0}'.format(files_list[1].split('/')[-1]), labels2) if len(labels2) > 1 else labels2[0]
+    selected_annotations2 = df_detections[(df_detections['annotator'] == annotator2) & (df_detections['annotation'] == selected_label2)]
+
+    # DETECTION PERFORMANCES
+    results = evaluate_detections(df_ref=selected_annotations1, df_det=selected_annotations2, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0])
+
+    print('\n\n### Detection results ###', end='\n')
+    print('True positive : {0}'.format(results['true_pos']))
+    print('True negative : {0}'.format(results['true_neg']))
+    print('False positive : {0}'.format(results['false_pos']))
+    print('False negative : {0}'.format(results['false_neg']))
+
+    print('\nPRECISION : {0:.2f}'.format(results['precision']))
+    print('RECALL : {0:.2f}'.format(results['recall']))
+    print('F-SCORE : {0:.2f}'.format(results['f_score']), end='\n\n')
+
+    # 95% confidence intervals, the days of the window are resampled (block bootstrap)
+    df_ci = bootstrap_detections(df_ref=selected_annotations1, df_det=selected_annotations2, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0], block_duration=86400, n_boot=2000)
+    print(df_ci.to_string(float_format='{0:.3f}'.format), end='\n\n')
 
     print('File 1 : {0}/{1}\nFile 2 : {2}/{3}\n'.format(annotator1, selected_label1, annotator2, selected_label2))
 
-else: print('Error : ', error)
-
-
-# %% Compute Pearson corelation coefficient between the two subsets
-
-annot_ref = annotator1
-label_ref = selected_label1
-
-df_detections1 = df_detections[(df_detections['annotator'] == annotator1) & (df_detections['annotation'] == label_ref)]
-df_detections2 = df_detections[(df_detections['annotator'] == annotator2) & (df_detections['annotation'] == label_ref)]
-
-time_bin_ref = int(info[info['annotators'].apply(lambda x: annot_ref in x)]['max_time'].iloc[0])
-file_ref = info[info['annotators'].apply(lambda x: annot_ref in x)]['file']
-tz_data = df_detections['start_datetime'][0].tz
-
-'''
-Useless here or should we plot something ?
-
-# Ask user if their resolution_bin is in minutes or in months or in seasons
-resolution_bin = easygui.buttonbox(msg='Do you want to chose your resolution bin in minutes or in months', choices=('Minutes', 'Days', 'Weeks', 'Months'))
-if resolution_bin == 'Minutes':
-    res_min = easygui.integerbox('Enter the bin size (min)', 'Time resolution', default=10, lowerbound=1, upperbound=86400)
-    n_annot_max = (res_min * 60) / time_bin_ref  # max nb of annoted time_bin max per res_min slice
-    delta, start_vec, end_vec = dt.timedelta(seconds=60 * res_min), t_rounder(begin_date, res=600), t_rounder(end_date + dt.timedelta(seconds=time_bin_ref), res=600)
-    time_vector = [start_vec + i * delta for i in range(int((end_vec - start_vec) / delta) + 1)]
-    y_label_txt = 'Number of detections\n({0} min)'.format(res_min)
-
-elif resolution_bin == 'Days':
-    time_vector_ts = pd.date_range(begin_date, end_date, freq='D', tz=tz_data)
-    time_vector = [timestamp.date() for timestamp in time_vector_ts]
-    n_annot_max = (24 * 60 * 60) / time_bin_ref
-    y_label_txt = 'Number of detections per day'
-elif resolution_bin == 'Weeks':
-    time_vector_ts = pd.date_range(begin_date, end_date, freq='W-MON', tz=tz_data)
-    time_vector = [timestamp.date() for timestamp in time_vector_ts]
-    n_annot_max = (24 * 60 * 60 * 7) / time_bin_ref
-    y_label_txt = 'Number of detections per week (starting every Monday)'
-else:
-    # Compute the time_vector for a monthly resolution
-    time_vector_ts = pd.date_range(begin_date, end_date, freq='MS', tz=tz_data)
-    time_vector = [timestamp.date() for timestamp in time_vector_ts]
-    n_annot_max = (31 * 24 * 60 * 60) / time_bin_ref
-    y_label_txt = 'Number of detections per month'
-'''
-
-# Compute histograms
-hist1 = np.histogram(df_detections1['start_datetime'], bins=time_vector)
-hist2 = np.histogram(df_detections2['start_datetime'], bins=time_vector)
-
-# Compute the Pearson correlation coefficient
-res = stats.pearsonr(hist1[0], hist2[0])
-
-print('Pearson correlation coefficient : {0:.3f}\np-value : {1:.3e}\n'.format(res[0], res[1]))
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    # %% Precision/recall as a function of the temporal tolerance and of the timebin
+
+    df_sweep = tolerance_sweep(df_ref=selected_annotations1, df_det=selected_annotations2, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0],
+                               tolerances=[0, timebin_detections[0], 5 * timebin_detections[0]], timebins=[timebin_detections[0] * i for i in [1, 6, 60]])
+    print(df_sweep.to_string(index=False, float_format='{0:.2f}'.format))
+
+    fig, ax = plt.subplots(figsize=(8, 8))
+    for tb, df_tb in df_sweep.groupby('timebin'):
+        ax.plot(df_tb['recall'], df_tb['precision'], marker='o', label='{0}s'.format(tb))
+        [ax.annotate('±{0}s'.format(tol), (r, p)) for tol, r, p in zip(df_tb['tolerance'], df_tb['recall'], df_tb['precision'])]
+    ax.set_xlabel('Recall', fontsize=16)
+    ax.set_ylabel('Precision', fontsize=16)
+    ax.set_xlim(0, 1.05)
+    ax.set_ylim(0, 1.05)
+    ax.legend(title='timebin')
+    ax.grid(color='k', linestyle='-', linewidth=0.2)
+
+    # %% Precision-recall and ROC curves as a function of the score threshold, if file 2 has a score/confidence column
+
+    scores2 = score_columns(selected_annotations2)
+    if scores2:
+        df_scores = score_sweep(df_ref=selected_annotations1, df_det=selected_annotations2, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0], score=scores2[0])
+        print(df_scores.iloc[::max(1, len(df_scores) // 20)].to_string(index=False, float_format='{0:.2f}'.format))
+
+        fig, axs = plt.subplots(1, 2, figsize=(16, 8))
+        axs[0].plot(df_scores['recall'], df_scores['precision'], marker='.')
+        axs[0].set_xlabel('Recall', fontsize=16)
+        axs[0].set_ylabel('Precision', fontsize=16)
+        axs[1].plot(df_scores['fpr'], df_scores['recall'], marker='.')
+        axs[1].plot([0, 1], [0, 1], color='k', linestyle='--', linewidth=0.5)
+        axs[1].set_xlabel('False positive rate', fontsize=16)
+        axs[1].set_ylabel('True positive rate', fontsize=16)
+        for ax in axs:
+            ax.set_xlim(0, 1.05)
+            ax.set_ylim(0, 1.05)
+            ax.grid(color='k', linestyle='-', linewidth=0.2)
+        fig.suptitle('{0} ({1})'.format(annotator2, scores2[0]))
+
+    # %% Event-level performances : the boxes of file 2 are matched one-to-one to the boxes of the reference
+    # (only run for detections imported with box: True in the parameters file, weak detections all span their whole file)
+
+    if all(param.get('box', False) for param in parameters):
+        in_window1 = (selected_annotations1['start_datetime'] >= begin_date) & (selected_annotations1['end_datetime'] <= end_date)
+        in_window2 = (selected_annotations2['start_datetime'] >= begin_date) & (selected_annotations2['end_datetime'] <= end_date)
+        matches, results_events = match_events(df_ref=selected_annotations1[in_window1], df_cand=selected_annotations2[in_window2], min_iou=0.1, criterion='iou', method='greedy')
+
+        print('\n### Event-level results ###', end='\n')
+        print('Matched boxes : {0}'.format(results_events['true_pos']))
+        print('Unmatched boxes of file 2 : {0}'.format(results_events['false_pos']))
+        print('Unmatched reference boxes : {0}'.format(results_events['false_neg']))
+        print('PRECISION : {0:.2f}\nRECALL : {1:.2f}\nF-SCORE : {2:.2f}\n'.format(results_events['precision'], results_events['recall'], results_events['f_score']))
+    else:
+        print('\nEvent-level results skipped : set box: True for both files in the parameters file to match the detection boxes\n')
+
+    # %% Batch evaluation : performances of all the annotator/label pairings of the loaded files
+    # (use evaluate_deployments to evaluate a whole catalogue of deployments in parallel)
+
+    df_results = batch_evaluation(df=df_detections, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0], references=[annotator1])
+    print(df_results[['annotator_ref', 'label_ref', 'annotator', 'label', 'precision', 'recall', 'f_score']].to_string(index=False, float_format='{0:.2f}'.format))
+
+
+    # %% Inter-annotator agreement : pairwise Cohen's kappa, Fleiss' kappa and Krippendorff's alpha of each label
+    # if task status files are selected (status_list), only the segments FINISHED by an annotator are used for this annotator
+
+    df_pairwise, df_agreement = annotator_agreement(df=df_detections, begin_date=begin_date, end_date=end_date, timebin=timebin_detections[0], status_files=status_list or None)
+    print(df_pairwise.to_string(index=False, float_format='{0:.2f}'.format))
+    print(df_agreement.to_string(index=False, float_format='{0:.2f}'.format), '\n')
+
+    # %% Compute Pearson corelation coefficient between the two subsets
+
+    annot_ref = annotator1
+    label_ref = selected_label1
+
+    df_detections1 = df_detections[(df_detections['annotator'] == annotator1) & (df_detections['annotation'] == label_ref)]
+    df_detections2 = df_detections[(df_detections['annotator'] == annotator2) & (df_detections['annotation'] == label_ref)]
+
+    # Pearson and Spearman correlations of the numbers of detections at several resolutions,
+    # the resolutions are pandas frequencies ('10min', 'D', 'W-MON', 'MS'...) or numbers of seconds
+    resolutions = [timebin_detections[0], '10min', '1h', 'D', 'W-MON', 'MS']
+    df_correlation = correlation_resolutions(df_detections1, df_detections2, begin_date=begin_date, end_date=end_date, resolutions=resolutions)
+    print(df_correlation.to_string(index=False, float_format='{0:.3f}'.format), '\n')
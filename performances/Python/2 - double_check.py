@@ -9,7 +9,10 @@ import time
 import datetime as dt
 import pandas as pd
 import pytz
-from utilities.def_func import input_date, get_tz, read_header, get_timestamps, sorting_detections, get_csv_file, extract_datetime, t_rounder, pick_datetimes, export2Raven, n_random_hour
+from utilities.def_func import input_date, get_tz, read_header, get_timestamps, sorting_detections, get_csv_file, extract_datetime, t_rounder, pick_datetimes
+from utilities.wav_index import time_bin_index
+from utilities.sampling import sample_windows
+from utilities.raven import raven_offsets, vector_selections
 
 #%% LOAD DATA - User inputs
 # /!\ warning : the file_metadata.csv OR the wav files are necessary for this scipt /!\
@@ -56,19 +59,14 @@ time_vector_str = [str(wav_names[i]).split('.wav')[0]+ '_+'  + str(elem) for i i
 
 
 ## Pamguard
-times_PG_beg = [df_pamguard['start_datetime'][i].timestamp() for i in range(len(df_pamguard))]
-times_PG_end = [df_pamguard['end_datetime'][i].timestamp() for i in range(len(df_pamguard))]
-
-PG_vec, ranks, k = np.zeros(len(time_vector), dtype=int), [], 0
-for i in range(len(times_PG_beg)):
-    for j in range(k, len(time_vector)-1):
-        if int(times_PG_beg[i]*1000) in range(int(time_vector[j]*1000), int(time_vector[j+1]*1000)) or int(times_PG_end[i]*1000) in range(int(time_vector[j]*1000), int(time_vector[j+1]*1000)):
-                ranks.append(j)
-                k=j
-                break
-        else: continue 
-ranks = sorted(list(set(ranks)))
-PG_vec[np.isin(range(len(time_vector)), ranks)] = 1
+# timebin of each detection (its beginning or otherwise its end), compared at the ms
+edges = (np.array(time_vector) * 1000).astype(np.int64)
+ranks_beg = time_bin_index(times_ns=(pd.to_datetime(df_pamguard['start_datetime'], utc=True).to_numpy(dtype='datetime64[ms]').astype(np.int64)), edges_ns=edges)
+ranks_end = time_bin_index(times_ns=(pd.to_datetime(df_pamguard['end_datetime'], utc=True).to_numpy(dtype='datetime64[ms]').astype(np.int64)), edges_ns=edges)
+ranks = np.where(ranks_beg >= 0, ranks_beg, ranks_end)
+
+PG_vec = np.zeros(len(time_vector), dtype=int)
+PG_vec[np.unique(ranks[ranks >= 0])] = 1
 
 ##  DETECTIONS
 print('\n\nDetections : ', sum(PG_vec))
@@ -84,12 +82,11 @@ selected_time_vector = []
 # tv_day = ([dt.datetime.fromtimestamp(time_vector[i]).day for i in range(len(time_vector))])
 # tv_hour = ([dt.datetime.fromtimestamp(time_vector[i]).hour for i in range(len(time_vector))])
 
-while True:
-#     # selected_time_vector = [time_vector[i] for i in range(len(time_vector)) if tv_hour[i]%2 == 0] #select even hours
-#     # selected_time_vector, selected_PG_vec, selected_time_vector_str, selected_dates = oneday_per_month(time_vector, time_vector_str, PG_vec) #select randomly one day per month
-    selected_time_vector, selected_time_vector_str, selected_PG_vec, selected_dates = n_random_hour(time_vector_ts=time_vector, time_vector_str=time_vector_str, vec=PG_vec, n_hour=3, tz=tz_data, time_step=time_bin) #select randomly n hour in the dataset
-    if round(sum(selected_PG_vec)/len(selected_time_vector),3) > 0.75*round(sum(PG_vec)/len(time_vector),3) and round(sum(selected_PG_vec)/len(selected_time_vector),3) < 1.25*round(sum(PG_vec)/len(time_vector),3):
-        break
+# selected_time_vector = [time_vector[i] for i in range(len(time_vector)) if tv_hour[i]%2 == 0] #select even hours
+# selected_time_vector, selected_PG_vec, selected_time_vector_str, selected_dates = oneday_per_month(time_vector, time_vector_str, PG_vec) #select randomly one day per month
+
+# select randomly n hours (duration=3600) or days (duration=86400) in the dataset with a positive rate within ±25% of the global one
+selected_time_vector, selected_time_vector_str, selected_PG_vec, selected_dates = sample_windows(time_vector_ts=time_vector, time_vector_str=time_vector_str, vec=PG_vec, n_windows=3, duration=3600, tz=tz_data, tolerance=0.25)
 
 # selected_datetimes,  selected_durations = ['07/07/2022 00:00:00'], ['1d']
 # selected_time_vector, selected_time_vector_str, selected_PG_vec, selected_dates = pick_datetimes(time_vector, time_vector_str, PG_vec, selected_datetimes, selected_durations, tz_data)
@@ -118,21 +115,22 @@ with open(os.path.join(result_path, "configuration.txt"), "w+") as f:
     [f.write(selected_dates[i]+"\n") for i in range(len(selected_dates))]
 
 
-wav_tuple = (wav_names, wav_datetimes, durations)
+# offset table of the wav files, shared by the 4 exported tables
+raven_table = raven_offsets((wav_names, wav_datetimes, durations))
 
-df0_PG2Raven =  export2Raven(wav_tuple, time_vector, time_vector_str, 0.9*fmax, selection_vec=None)
+df0_PG2Raven = vector_selections(raven_table, time_vector, time_bin, 0.9*fmax)
 PG2Raven_str0 = "PG_double_check0_all_" + t_rounder(wav_datetimes[0], res=3600).strftime('%y%m%d') + '_' + t_rounder(wav_datetimes[-1], res=3600).strftime('%y%m%d') + '_'+ str(time_bin) + 's' + '.txt'
 df0_PG2Raven.to_csv(os.path.join(result_path, PG2Raven_str0), index=False, sep='\t')  
 
-df1_PG2Raven =  export2Raven(wav_tuple, time_vector, time_vector_str, 0.8*fmax, selection_vec=PG_vec)
+df1_PG2Raven = vector_selections(raven_table, time_vector, time_bin, 0.8*fmax, selection_vec=PG_vec)
 PG2Raven_str1 = "PG_double_check1_all_positives_" + t_rounder(wav_datetimes[0]).strftime('%y%m%d') + '_' + t_rounder(wav_datetimes[-1]).strftime('%y%m%d') + '_'+ str(time_bin) + 's' + '.txt'
 df1_PG2Raven.to_csv(os.path.join(result_path, PG2Raven_str1), index=False, sep='\t')  
 
-df2_PG2Raven =  export2Raven(wav_tuple, selected_time_vector, selected_time_vector_str, 0.6*fmax, selection_vec=None)
+df2_PG2Raven = vector_selections(raven_table, selected_time_vector, time_bin, 0.6*fmax)
 PG2Raven_str2 = "PG_double_check2_selected_" + t_rounder(wav_datetimes[0]).strftime('%y%m%d') + '_' + t_rounder(wav_datetimes[-1]).strftime('%y%m%d') + '_'+ str(time_bin) + 's' + '.txt'
 df2_PG2Raven.to_csv(os.path.join(result_path, PG2Raven_str2), index=False, sep='\t')  
 
-df3_PG2Raven =  export2Raven(wav_tuple, selected_time_vector, selected_time_vector_str, 0.4*fmax, selection_vec=selected_PG_vec)
+df3_PG2Raven = vector_selections(raven_table, selected_time_vector, time_bin, 0.4*fmax, selection_vec=selected_PG_vec)
 PG2Raven_str3 = "PG_double_check3_selected_positives_" + t_rounder(wav_datetimes[0]).strftime('%y%m%d') + '_' + t_rounder(wav_datetimes[-1]).strftime('%y%m%d') + '_'+ str(time_bin) + 's' + '.txt'
 df3_PG2Raven.to_csv(os.path.join(result_path, PG2Raven_str3), index=False, sep='\t')  
 
@@ -11,6 +11,7 @@ import re
 from collections import Counter
 import pytz
 from utilities.def_func import stat_box_day, stats_diel_pattern, sorting_detections, get_season
+from utilities.detection_table import DetectionTable
 
 # %% Import csv deployments
 
@@ -40,13 +41,10 @@ for file_path in tqdm(list_json):
         data.append(json.load(i))
 data = pd.DataFrame.from_dict(data)
 
-data['df_detections'] = [sorting_detections(file=data['detection_file'][i], timebin_new=data['timebin'].tolist()[i])[0] for i in tqdm(range(len(data)))]
+# detections are stored as compact DetectionTable, use .to_frame() to get the usual DataFrame
+data['df_detections'] = [DetectionTable.from_frame(sorting_detections(file=data['detection_file'][i], timebin_new=data['timebin'].tolist()[i])[0]) for i in tqdm(range(len(data)))]
 data['season'] = [get_season(i) for i in [pd.to_datetime(d) for d in data['beg_deployment']]]
 
-for i in range(len(data)):
-    data['df_detections'][i]['start_deploy'] = pd.to_datetime(data['beg_deployment'][i])
-    data['df_detections'][i]['end_deploy'] = pd.to_datetime(data['end_deployment'][i])
-
 deploy['detection_num'] = [len(data.loc[data['deploy_ID'] == ID, 'df_detections'].reset_index(drop=True)[0]) for ID in deploy['ID']]
 
 deploy['detection_rate'] = [((len(data[data['deploy_ID'] == ID].reset_index(drop=True)['df_detections'][0]) * data[data['deploy_ID'] == ID].reset_index(drop=True)['timebin'][0]) / deploy['durations_deployments'][i].total_seconds()) * 100 for i, ID in enumerate(deploy['ID'])]
@@ -224,7 +222,9 @@ plt.title('Distribution of net lengths', color='w')
 
 # %% Cumulated histogram of detections for a single detection file
 
-df_detections = data['df_detections'][100]
+ID_test = 'C6D3 ST7178'  # campaign, deployment and instrument identifier of the deployment, see data['deploy_ID']
+data_test = data[data['deploy_ID'] == ID_test].iloc[0]
+df_detections = data_test['df_detections']
 
 # from utilities.def_func import get_csv_file
 # import pytz
@@ -233,14 +233,9 @@ df_detections = data['df_detections'][100]
 
 threshold = 0.75
 
-[ID0] = list(set(df_detections['dataset']))
-ID1 = re.search(r'C\d{1,2}D\d{1,2}', ID0).group()  # campaign and deployment identifier
-ID2 = re.search(r'ST\d+', ID0).group()  # instrument identifier
-ID_test = ID1 + ' ' + ID2
-
 data_histo = df_detections['start_datetime']  # detections datetimes
 tb = df_detections['end_time'][0]  # timebin
-deploy_dt = [df_detections['start_deploy'][0], df_detections['end_deploy'][0]]  # beginning and end of deployment
+deploy_dt = [pd.to_datetime(data_test['beg_deployment']), pd.to_datetime(data_test['end_deployment'])]  # beginning and end of deployment
 # deploy_dt = [pd.Timestamp('2023-02-11 12:00:00 +0100'), pd.Timestamp('2023-02-12 09:00:00 +0100')]  # beginning and end of deployment
 
 res_min = 1
@@ -282,7 +277,8 @@ fig.suptitle('Cumulated detections - {0}\n{1} - {2}'.format(ID_test, deploy_dt[0
 # the histogram is divided into n periods of equal durations
 # the periods number with the most/least detections are printed
 
-data_test = data.iloc[100]
+# same deployment as the cumulated histogram (ID_test)
+data_test = data[data['deploy_ID'] == ID_test].iloc[0]
 n_periods = 10
 
 df_detections = data_test['df_detections']
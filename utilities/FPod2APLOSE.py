@@ -5,13 +5,11 @@ This script transforms a FPOD .xls result files to a APLOSE csv results file
 @author: torterma
 """
 import pandas as pd
-import pytz
 import easygui
 import os
 from tkinter import Tk     # from tkinter import Tk for Python 3.x
 from tkinter.filedialog import askopenfilename
-from datetime import timedelta
-from datetime import datetime
+from post_processing_detections.utilities.aplose_datetime import to_epoch_ns, format_aplose_datetime, tz_offset_minutes
 
 # Usually FPOD are in UTC, but think to change the timezone if different
 tz_data = 'UTC'
@@ -33,13 +31,14 @@ nb_det = len(df_FPOD)
 
 
 # Transform start detection format from string to absolute datatime (with time zone info)
-df_FPOD_start_dt = sorted([pytz.timezone(tz_data).localize(pd.to_datetime(x, format="%d/%m/%Y %H:%M")) for x in df_FPOD['Date heure']])
+df_FPOD_start_dt = pd.to_datetime(df_FPOD['Date heure'], format="%d/%m/%Y %H:%M").dt.tz_localize(tz_data).sort_values()
 # Compute the absolute end date time of detection
-df_FPOD_end_dt = sorted([x + timedelta(seconds = det_bin_size) for x in df_FPOD_start_dt])
+start_ns, offset = to_epoch_ns(df_FPOD_start_dt)
+end_ns = start_ns + det_bin_size * 10**9
 
 # Change datetime format to match with APLOSE format
-df_FPOD_start_AP = [datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f"))[:-3] + datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f%z"))[26:29] + ':' + datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f%z"))[29:] for dt in df_FPOD_start_dt]
-df_FPOD_end_AP = [datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f"))[:-3] + datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f%z"))[26:29] + ':' + datetime.strftime(dt, ("%Y-%m-%dT%H:%M:%S.%f%z"))[29:] for dt in df_FPOD_end_dt]
+df_FPOD_start_AP = format_aplose_datetime(start_ns, offset)
+df_FPOD_end_AP = format_aplose_datetime(end_ns, tz_offset_minutes(end_ns, tz_data))
 
 
 # Build the dataframe
@@ -0,0 +1,173 @@
+import datetime as dt
+from typing import List, Union
+import numpy as np
+import pandas as pd
+from utilities.def_func import read_task_status
+from utilities.performances_func import window_bins, _window_ranks
+from utilities.wav_index import file_start_times, file_index
+
+
+def presence_matrix(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, label: str, annotators: List[str]) -> np.ndarray:
+    ''' Presence/absence of the detections of a label for several annotators, one row per annotator
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            label : label to select
+            annotators : list of the annotators, in the order of the rows
+        Returns :
+            matrix : boolean array of shape (len(annotators), n_bins), True for the timebins containing at least one detection
+    '''
+    df = df[(df['annotation'] == label) & df['annotator'].isin(annotators)]
+    ranks, n_bins = _window_ranks(df, begin_date, end_date, timebin)
+    rows = pd.Categorical(df['annotator'], categories=annotators).codes
+
+    matrix = np.zeros((len(annotators), n_bins), dtype=bool)
+    kept = ranks >= 0
+    matrix[rows[kept], ranks[kept]] = True
+    return matrix
+
+
+def status_matrix(files: Union[str, List[str]], begin_date: dt.datetime, end_date: dt.datetime, timebin: int, annotators: List[str], tz=None) -> np.ndarray:
+    ''' Timebins annotated by each annotator according to APLOSE task status files :
+    a timebin belongs to the last segment starting before it, it is annotated if the status of this segment is 'FINISHED'
+        Parameters :
+            files : path or list of paths to the status files
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            annotators : list of the annotators, in the order of the rows
+            tz : timezone of the datetimes written in the segment filenames, timezone of begin_date by default
+        Returns :
+            mask : boolean array of shape (len(annotators), n_bins), True for the timebins annotated by the annotator
+    '''
+    if isinstance(files, str):
+        files = [files]
+    tz = pd.Timestamp(begin_date).tz if tz is None else tz
+
+    status = pd.concat([read_task_status(file) for file in files], ignore_index=True).drop_duplicates('filename', keep='last')
+    for annotator in annotators:
+        if annotator not in status.columns:
+            raise Exception(f"'{annotator}' not present in the task status file")
+
+    starts_ns = file_start_times(status['filename'].to_numpy(), tz)
+    order = np.argsort(starts_ns, kind='stable')
+    starts_ns = starts_ns[order]
+    finished = status[annotators].to_numpy().T[:, order] == 'FINISHED'
+
+    begin_ns, res_ns, n_bins = window_bins(begin_date, end_date, timebin)
+    bins_ns = begin_ns + np.arange(n_bins, dtype=np.int64) * res_ns
+    return finished[:, file_index(bins_ns, starts_ns)] & (bins_ns >= starts_ns[0])
+
+
+def cohen_kappa(matrix: np.ndarray, mask: np.ndarray = None, chunksize: int = 2**20) -> (np.ndarray, np.ndarray):
+    ''' Pairwise Cohen's kappa between the rows of a presence matrix, each pair being compared on the timebins annotated by both.
+    The contingency tables of all the pairs are computed at once as matrix products, by chunks of timebins
+        Parameters :
+            matrix : boolean array of shape (n_annotators, n_bins)
+            mask : boolean array of the same shape, True for the annotated timebins, all the timebins by default
+            chunksize : number of timebins processed at once, bounds the memory used
+        Returns :
+            kappa : array of shape (n_annotators, n_annotators) of the Cohen's kappa of each pair
+            n_bins : int array of the same shape, number of timebins annotated by both annotators
+    '''
+    n_annotators = matrix.shape[0]
+    both_pos, pos_valid, both_valid = (np.zeros((n_annotators, n_annotators)) for _ in range(3))
+    for i in range(0, matrix.shape[1], chunksize):
+        valid = np.ones(matrix[:, i:i + chunksize].shape, dtype=np.float32) if mask is None else mask[:, i:i + chunksize].astype(np.float32)
+        pos = matrix[:, i:i + chunksize] * valid
+        both_pos += pos @ pos.T
+        pos_valid += pos @ valid.T
+        both_valid += valid @ valid.T
+
+    # contingency table of each pair (i, j) : n11, n10 (i positive, j negative), n01, n00
+    n11, n10, n01 = both_pos, pos_valid - both_pos, pos_valid.T - both_pos
+    n00 = both_valid - n11 - n10 - n01
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_o = (n11 + n00) / both_valid
+        p_e = ((n11 + n10) * (n11 + n01) + (n00 + n01) * (n00 + n10)) / both_valid**2
+        kappa = (p_o - p_e) / (1 - p_e)
+
+    return kappa, both_valid.astype(np.int64)
+
+
+def fleiss_kappa(matrix: np.ndarray, mask: np.ndarray = None) -> (float, int):
+    ''' Fleiss' kappa of a presence matrix, computed on the timebins annotated by all the annotators
+        Parameters :
+            matrix : boolean array of shape (n_annotators, n_bins)
+            mask : boolean array of the same shape, True for the annotated timebins, all the timebins by default
+        Returns :
+            kappa : Fleiss' kappa, NaN if undefined
+            n_bins : number of timebins annotated by all the annotators
+    '''
+    n_annotators = matrix.shape[0]
+    positives = matrix.sum(axis=0) if mask is None else matrix[:, mask.all(axis=0)].sum(axis=0)
+    n_bins = len(positives)
+    if n_annotators < 2 or n_bins == 0:
+        return np.nan, n_bins
+
+    positives = positives.astype(np.float64)
+    negatives = n_annotators - positives
+    p_bar = np.mean((positives * (positives - 1) + negatives * (negatives - 1)) / (n_annotators * (n_annotators - 1)))
+    p_pos = positives.sum() / (n_bins * n_annotators)
+    p_e = p_pos**2 + (1 - p_pos)**2
+    return ((p_bar - p_e) / (1 - p_e) if p_e < 1 else np.nan), n_bins
+
+
+def krippendorff_alpha(matrix: np.ndarray, mask: np.ndarray = None) -> (float, int):
+    ''' Krippendorff's alpha (nominal) of a presence matrix, the timebins not annotated by an annotator are missing values
+        Parameters :
+            matrix : boolean array of shape (n_annotators, n_bins)
+            mask : boolean array of the same shape, True for the annotated timebins, all the timebins by default
+        Returns :
+            alpha : Krippendorff's alpha, NaN if undefined
+            n_bins : number of timebins annotated by at least two annotators (pairable values)
+    '''
+    n_raters = np.full(matrix.shape[1], matrix.shape[0]) if mask is None else mask.sum(axis=0)
+    positives = matrix.sum(axis=0) if mask is None else (matrix & mask).sum(axis=0)
+    pairable = n_raters >= 2
+    n_raters, positives = n_raters[pairable].astype(np.float64), positives[pairable].astype(np.float64)
+    negatives = n_raters - positives
+
+    # coincidences of the positive/negative values, o_01 being the disagreements
+    o_01 = np.sum(positives * negatives / (n_raters - 1))
+    n_pos, n_neg = positives.sum(), negatives.sum()
+    if n_pos == 0 or n_neg == 0:
+        return np.nan, int(pairable.sum())
+    return 1 - (n_pos + n_neg - 1) * o_01 / (n_pos * n_neg), int(pairable.sum())
+
+
+def annotator_agreement(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, annotators: List[str] = None, labels: List[str] = None, status_files: Union[str, List[str]] = None) -> (pd.DataFrame, pd.DataFrame):
+    ''' Inter-annotator agreement of each label of a detection DataFrame : pairwise Cohen's kappa, Fleiss' kappa and Krippendorff's alpha
+    of the presence/absence of the label in the timebins.
+    If task status files are given, only the segments 'FINISHED' by an annotator are taken into account for this annotator (see task_status_selection)
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            annotators : list of the annotators to compare, all the annotators of df by default
+            labels : list of the labels, all the labels of df by default
+            status_files : path or list of paths to the APLOSE task status files
+        Returns :
+            pairwise : DataFrame with columns label/annotator1/annotator2/n_bins/cohen_kappa, one row per pair of annotators and label
+            overall : DataFrame with columns label/n_annotators/fleiss_kappa/n_bins_fleiss/krippendorff_alpha/n_bins_alpha, one row per label
+    '''
+    annotators = sorted(set(df['annotator'])) if annotators is None else list(annotators)
+    labels = sorted(set(df['annotation'])) if labels is None else list(labels)
+    if len(annotators) < 2:
+        raise ValueError('at least two annotators are needed to compute an agreement')
+    mask = None if status_files is None else status_matrix(status_files, begin_date, end_date, timebin, annotators)
+
+    first, second = np.triu_indices(len(annotators), k=1)
+    pairwise, overall = [], []
+    for label in labels:
+        matrix = presence_matrix(df, begin_date, end_date, timebin, label, annotators)
+        kappa, n_bins = cohen_kappa(matrix, mask)
+        pairwise.append(pd.DataFrame({'label': label, 'annotator1': np.array(annotators)[first], 'annotator2': np.array(annotators)[second],
+                                      'n_bins': n_bins[first, second], 'cohen_kappa': kappa[first, second]}))
+        overall.append([label, len(annotators), *fleiss_kappa(matrix, mask), *krippendorff_alpha(matrix, mask)])
+
+    overall = pd.DataFrame(overall, columns=['label', 'n_annotators', 'fleiss_kappa', 'n_bins_fleiss', 'krippendorff_alpha', 'n_bins_alpha'])
+    return pd.concat(pairwise, ignore_index=True), overall
@@ -0,0 +1,237 @@
+import datetime as dt
+import numpy as np
+import pandas as pd
+import pytz
+
+# APLOSE datetimes are written as '%Y-%m-%dT%H:%M:%S.%f%z' with milliseconds and a '+HH:MM' offset,
+# ex : '2022-07-07T08:00:00.000+02:00'
+APLOSE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _days_from_civil(y: np.ndarray, m: np.ndarray, d: np.ndarray) -> np.ndarray:
+    # number of days since 1970-01-01 of a proleptic Gregorian date (H. Hinnant's algorithm)
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def _civil_from_days(days: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray):
+    # inverse of _days_from_civil
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = np.where(mp < 10, mp + 3, mp - 9)
+    y = yoe + era * 400 + (m <= 2)
+    return y, m, d
+
+
+def _digits(chars: np.ndarray) -> np.ndarray:
+    # numerical value of a (n, k) matrix of ascii digits
+    value = np.zeros(len(chars), dtype=np.int64)
+    for i in range(chars.shape[1]):
+        value = value * 10 + chars[:, i].astype(np.int64)
+    return value
+
+
+def parse_aplose_datetime(values) -> (np.ndarray, np.ndarray):
+    ''' Vectorized parser of APLOSE formatted datetimes ('%Y-%m-%dT%H:%M:%S.%f%z', ex : '2022-07-07T08:00:00.000+02:00')
+    All the strings must have the same layout (same number of fractional digits, same offset format)
+        Parameters :
+            values : list/array/Series of datetime strings
+        Returns :
+            ns : int64 array of the UTC epochs in nanoseconds
+            offset : int64 array of the UTC offsets in minutes
+    '''
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    try:
+        chars = values.astype('S')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        raise ValueError('Not APLOSE formatted datetimes')
+
+    n, length = len(chars), chars.dtype.itemsize
+    chars = chars.view(np.uint8).reshape(n, length)
+    if length < 20 or not np.all(chars[:, -1]):
+        raise ValueError('Not APLOSE formatted datetimes : strings of different lengths')
+
+    # layout of the timezone offset : 'Z', '+HH:MM' or '+HHMM'
+    if chars[0, -1] == ord('Z'):
+        tz_len = 1
+    elif chars[0, -3] == ord(':'):
+        tz_len = 6
+    else:
+        tz_len = 5
+    frac_len = length - 20 - tz_len if chars[0, 19] == ord('.') else 0
+
+    if frac_len < 0 or frac_len > 9 or (frac_len == 0 and length - tz_len != 19):
+        raise ValueError('Not APLOSE formatted datetimes')
+
+    tz_start = length - tz_len
+    separators = {4: '-', 7: '-', 10: 'T', 13: ':', 16: ':'}
+    digit_cols = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18] + list(range(20, 20 + frac_len))
+    if frac_len > 0:
+        separators[19] = '.'
+    if tz_len == 1:
+        separators[tz_start] = 'Z'
+    else:
+        digit_cols += [tz_start + 1, tz_start + 2, length - 2, length - 1]
+        if tz_len == 6:
+            separators[tz_start + 3] = ':'
+
+    if any(np.any(chars[:, i] != ord(c)) for i, c in separators.items()):
+        raise ValueError('Not APLOSE formatted datetimes')
+    if tz_len > 1 and np.any((chars[:, tz_start] != ord('+')) & (chars[:, tz_start] != ord('-'))):
+        raise ValueError('Not APLOSE formatted datetimes')
+
+    # uint8 arithmetic : characters below '0' wrap around and are caught by the > 9 test
+    digits = chars - np.uint8(ord('0'))
+    if np.any(digits[:, digit_cols] > 9):
+        raise ValueError('Not APLOSE formatted datetimes')
+
+    year, month, day = _digits(digits[:, 0:4]), _digits(digits[:, 5:7]), _digits(digits[:, 8:10])
+    hour, minute, second = _digits(digits[:, 11:13]), _digits(digits[:, 14:16]), _digits(digits[:, 17:19])
+    fraction = _digits(digits[:, 20:20 + frac_len]) * 10 ** (9 - frac_len) if frac_len > 0 else 0
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    if np.any((month < 1) | (month > 12)):
+        raise ValueError('Not APLOSE formatted datetimes : month out of range')
+    if np.any((day < 1) | (day > _DAYS_IN_MONTH[month - 1] + ((month == 2) & leap))) or np.any((hour > 23) | (minute > 59) | (second > 59)):
+        raise ValueError('Not APLOSE formatted datetimes : date out of range')
+
+    if tz_len == 1:
+        offset = np.zeros(n, dtype=np.int64)
+    else:
+        offset = _digits(digits[:, tz_start + 1:tz_start + 3]) * 60 + _digits(digits[:, length - 2:])
+        offset = np.where(chars[:, tz_start] == ord('-'), -offset, offset)
+
+    local = (_days_from_civil(year, month, day) * 86400 + hour * 3600 + minute * 60 + second) * 10**9 + fraction
+    return local - offset * 60 * 10**9, offset
+
+
+def format_aplose_datetime(ns: np.ndarray, offset, precision: int = 3) -> np.ndarray:
+    ''' Vectorized formatter of APLOSE datetimes, inverse of parse_aplose_datetime
+        Parameters :
+            ns : int64 array of UTC epochs in nanoseconds
+            offset : UTC offset(s) in minutes, integer or array
+            precision : number of fractional digits of the seconds (3 for APLOSE files)
+        Returns :
+            array of strings, ex : '2022-07-07T08:00:00.000+02:00'
+    '''
+    ns = np.asarray(ns, dtype=np.int64)
+    offset = np.broadcast_to(np.asarray(offset, dtype=np.int64), ns.shape)
+    local = ns + offset * 60 * 10**9
+
+    seconds, fraction = np.divmod(local, 10**9)
+    days, seconds = np.divmod(seconds, 86400)
+    year, month, day = _civil_from_days(days)
+
+    fields = [(year, 4, '-'), (month, 2, '-'), (day, 2, 'T'), (seconds // 3600, 2, ':'), (seconds // 60 % 60, 2, ':'), (seconds % 60, 2, '')]
+    if precision > 0:
+        fields[-1] = (seconds % 60, 2, '.')
+        fields.append((fraction // 10 ** (9 - precision), precision, ''))
+    length = sum(width + len(sep) for _, width, sep in fields) + 6
+
+    chars = np.zeros((len(ns), length), dtype=np.uint8)
+    pos = 0
+    for value, width, sep in fields:
+        for i in range(width):
+            chars[:, pos + i] = ord('0') + value // 10 ** (width - 1 - i) % 10
+        pos += width
+        if sep:
+            chars[:, pos] = ord(sep)
+            pos += 1
+
+    chars[:, pos] = np.where(offset < 0, ord('-'), ord('+'))
+    abs_offset = np.abs(offset)
+    for i, value in enumerate([abs_offset // 600, abs_offset // 60 % 10, None, abs_offset % 60 // 10, abs_offset % 10]):
+        chars[:, pos + 1 + i] = ord(':') if value is None else ord('0') + value
+
+    return chars.view(f'S{length}').ravel().astype(str)
+
+
+def tz_offset_minutes(ns: np.ndarray, tz) -> np.ndarray:
+    ''' UTC offsets in minutes of a timezone at given instants, this is all a batch timezone conversion needs
+        Parameters :
+            ns : int64 array of UTC epochs in nanoseconds
+            tz : pytz/datetime timezone, or a string understood by pytz ('UTC', 'Europe/Paris', ...)
+        Returns :
+            offset : int64 array of the UTC offsets in minutes
+    '''
+    ns = np.asarray(ns, dtype=np.int64)
+    if isinstance(tz, str):
+        tz = pytz.timezone(tz)
+    if isinstance(tz, (pytz._FixedOffset, dt.timezone)) or tz is pytz.utc:
+        return np.full(len(ns), int(tz.utcoffset(None).total_seconds() // 60), dtype=np.int64)
+
+    local = pd.DatetimeIndex(ns.view('M8[ns]'), tz='UTC').tz_convert(tz).tz_localize(None)
+    return (local.asi8 - ns) // (60 * 10**9)
+
+
+def to_datetime_series(ns: np.ndarray, offset: np.ndarray, tz=None, index=None) -> pd.Series:
+    ''' Builds a tz-aware datetime Series from UTC epochs and offsets
+        Parameters :
+            ns : int64 array of UTC epochs in nanoseconds
+            offset : int64 array of UTC offsets in minutes
+            tz : timezone of the Series, if None the offset of the data is used (pytz.FixedOffset)
+            index : index of the Series
+        Returns :
+            Series of aware datetimes, of dtype datetime64[ns, tz] unless the offsets are mixed and tz is None
+    '''
+    utc = pd.DatetimeIndex(np.asarray(ns, dtype=np.int64).view('M8[ns]'), tz='UTC')
+    if tz is not None:
+        return pd.Series(utc.tz_convert(tz), index=index)
+
+    offsets = np.unique(offset)
+    if len(offsets) <= 1:
+        tz = pytz.FixedOffset(int(offsets[0])) if len(offsets) else pytz.utc
+        return pd.Series(utc.tz_convert(tz), index=index)
+
+    # mixed offsets : same object Series as pd.to_datetime would return
+    return pd.Series([t.tz_convert(pytz.FixedOffset(int(o))) for t, o in zip(utc, offset)], index=index, dtype=object)
+
+
+def to_epoch_ns(datetimes) -> (np.ndarray, np.ndarray):
+    ''' UTC epochs and offsets of aware datetimes
+        Parameters :
+            datetimes : Series/DatetimeIndex/list of aware datetimes
+        Returns :
+            ns : int64 array of the UTC epochs in nanoseconds
+            offset : int64 array of the UTC offsets in minutes
+    '''
+    series = pd.Series(datetimes)
+    ns = pd.to_datetime(series, utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return ns, tz_offset_minutes(ns, series.dt.tz)
+    return ns, np.array([int(t.utcoffset().total_seconds() // 60) for t in series], dtype=np.int64)
+
+
+def read_aplose_datetime(values, tz=None, index=None) -> pd.Series:
+    ''' Parses APLOSE formatted datetimes into a tz-aware Series, with the vectorized parser when possible
+    and pd.to_datetime otherwise (ex : strings of different lengths)
+        Parameters :
+            values : Series/list of datetime strings
+            tz : timezone to convert the datetimes to, if None the offset of the data is kept
+            index : index of the Series, by default the index of values if it is a Series
+        Returns :
+            Series of aware datetimes
+    '''
+    if index is None and isinstance(values, pd.Series):
+        index = values.index
+    try:
+        ns, offset = parse_aplose_datetime(values)
+    except ValueError:
+        series = pd.Series(pd.to_datetime(values, format=APLOSE_FORMAT))
+        series.index = index if index is not None else series.index
+        return series if tz is None else pd.to_datetime(series, utc=True).dt.tz_convert(tz)
+    return to_datetime_series(ns, offset, tz=tz, index=index)
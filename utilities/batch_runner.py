@@ -0,0 +1,441 @@
+'''
+Command-line batch runner of the detection performances and results figures : every choice of the interactive scripts
+(performances/Python/1 - detection_performances.py, results/premiers_resultats.py) is read from a yaml configuration file,
+each job is run in a worker process and its results/figures are written to an output directory.
+Only the figures of premiers_resultats.py are available (see FIGURES), the other results scripts
+(glider_figures.py, plot_figure_season.py, stats_diel_pattern.py...) remain interactive.
+
+usage : python -m utilities.batch_runner config.yaml [-o OUTPUT] [-n N_WORKERS] [--jobs NAME [NAME ...]]
+
+configuration file (see performances/Python/batch_runner_parameters.yaml) :
+    output : output directory, one sub-directory per job
+    n_workers : number of processes running the jobs
+    defaults : parameters shared by all the jobs, overridden by the parameters of a job
+    jobs : list of jobs, with keys
+        name : name of the job, used as the name of its output directory
+        kind (optional) : 'performances' (default) or 'results'
+        parameters : list of detection file parameters (same entries as detection_performance_parameters.yaml) or path to such a yaml file,
+                     the files without timebin_new are reshaped to the timebin of the job (no dialog is opened)
+        date_begin/date_end : evaluation window, the span of the detections by default
+        timebin : duration of the timebins in seconds, spectrogram duration of the reference file by default
+        status_files (optional) : APLOSE task status files, only the segments FINISHED by all the annotators are kept (see task_status_selection)
+        status_annotators (optional) : annotators of the status files taken into account, 'all' by default
+        load_workers (optional) : number of processes loading the detection files, all the CPUs if the jobs are run sequentially, 1 otherwise
+    keys of the 'performances' jobs :
+        reference/detector : dict with keys file (index of the file in parameters, 0/1 by default), annotator and label,
+                             the annotator/label can be omitted if the file contains a single one
+        tolerances/timebins (optional) : temporal tolerances and timebins of the tolerance sweep, in seconds
+        resolutions (optional) : resolutions of the correlation (pandas frequencies or seconds)
+        n_boot (optional) : number of bootstrap replicates of the confidence intervals, 0 to skip them
+        block_duration (optional) : duration of the bootstrap blocks in seconds, multiple of the timebin
+        seed (optional) : seed of the bootstrap, for reproducible confidence intervals
+    keys of the 'results' jobs :
+        figures : list of figures, dict with keys
+            type : 'overview' (number of annotations per label and annotator), 'seasonality' (histogram of the detections),
+                   'diel' (number of detections per hour and day) or 'multilabel' (one histogram per label)
+            name (optional) : name of the output files, <index>_<type> by default
+            annotator : annotator of the detections, can be omitted if there is a single one
+            label/labels : label of the detections (seasonality/diel), labels of the multilabel figure (all the labels of the annotator by default)
+            resolution (optional) : bins of the histograms, pandas frequency or seconds, 'D' by default
+            percentage (optional) : if set to True, the histograms show the proportion of positive timebins of each bin
+            lat/lon (optional) : coordinates in decimal degrees, the sunrise/sunset hours are drawn on the diel figure
+'''
+
+import os
+import argparse
+import traceback
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from utilities.def_func import format_param, read_param, load_detections, task_status_selection, suntime_hour
+from utilities.performances_func import evaluate_detections, batch_evaluation, tolerance_sweep
+from utilities.bootstrap import bootstrap_detections
+from utilities.correlation import correlation_resolutions, detection_epochs, resolution_edges, binned_counts
+from utilities.aplose_datetime import tz_offset_minutes
+
+JOB_KINDS = ['performances', 'results']
+FIGURES = ['overview', 'seasonality', 'diel', 'multilabel']
+
+
+def read_config(file: str) -> dict:
+    ''' Reads a batch configuration file, the defaults are merged into every job
+        Parameters :
+            file : path to the yaml configuration file
+        Returns :
+            config : dict with keys output, n_workers and jobs (list of dict, one per job)
+    '''
+    with open(file, 'r') as yaml_file:
+        config = yaml.safe_load(yaml_file)
+
+    if not config or not config.get('jobs'):
+        raise ValueError(f'{file}: no job found')
+
+    defaults = config.get('defaults') or {}
+    jobs = []
+    for i, job in enumerate(config['jobs']):
+        job = {**defaults, **job}
+        job.setdefault('name', f'job_{i}')
+        if 'parameters' not in job:
+            raise ValueError(f"job '{job['name']}': no detection file parameters")
+        if job.setdefault('kind', 'performances') not in JOB_KINDS:
+            raise ValueError(f"job '{job['name']}': kind '{job['kind']}' not in {JOB_KINDS}")
+        if job['kind'] == 'results':
+            if not job.get('figures'):
+                raise ValueError(f"job '{job['name']}': no figure")
+            unknown = [figure.get('type') for figure in job['figures'] if figure.get('type') not in FIGURES]
+            if unknown:
+                raise ValueError(f"job '{job['name']}': figure types {unknown} not in {FIGURES}")
+        jobs.append(job)
+
+    names = [job['name'] for job in jobs]
+    if len(set(names)) != len(names):
+        raise ValueError('job names must be unique')
+
+    return {'output': config.get('output', 'batch_output'), 'n_workers': config.get('n_workers'), 'jobs': jobs}
+
+
+def _select_series(info: pd.DataFrame, selection: dict, default_file: int) -> (str, str):
+    # annotator/label of a file of the job, the single annotator/label of the file if not specified
+    i = selection.get('file', default_file)
+    if i >= len(info):
+        raise ValueError(f'file index {i} out of range ({len(info)} files)')
+
+    choices = {'annotator': list(info.iloc[i]['annotators']), 'label': list(info.iloc[i]['labels'])}
+    selected = []
+    for key, available in choices.items():
+        value = selection.get(key)
+        if value is None:
+            if len(available) != 1:
+                raise ValueError(f'file {i}: several {key}s {available}, the {key} must be specified')
+            value = available[0]
+        elif value not in available:
+            raise ValueError(f"file {i}: {key} '{value}' not in {available}")
+        selected.append(value)
+
+    return tuple(selected)
+
+
+def _plot_tolerance_sweep(df_sweep: pd.DataFrame, file: str):
+    fig, ax = plt.subplots(figsize=(8, 8))
+    for tb, df_tb in df_sweep.groupby('timebin'):
+        ax.plot(df_tb['recall'], df_tb['precision'], marker='o', label='{0}s'.format(tb))
+        [ax.annotate('±{0}s'.format(tol), (r, p)) for tol, r, p in zip(df_tb['tolerance'], df_tb['recall'], df_tb['precision'])]
+    ax.set_xlabel('Recall', fontsize=16)
+    ax.set_ylabel('Precision', fontsize=16)
+    ax.set_xlim(0, 1.05)
+    ax.set_ylim(0, 1.05)
+    ax.legend(title='timebin')
+    ax.grid(color='k', linestyle='-', linewidth=0.2)
+    fig.savefig(file, bbox_inches='tight')
+    plt.close(fig)
+
+
+def job_parameters(job: dict) -> List[dict]:
+    ''' sorting_detections arguments of the detection files of a job : reshape_timebin asks the new timebin to the user
+    when it is not given, so the files without timebin_new are reshaped to the timebin of the job
+        Parameters :
+            job : dict of the job parameters (see the configuration file)
+        Returns :
+            parameters : list of dict of sorting_detections arguments, one per file
+    '''
+    parameters = read_param(job['parameters']) if isinstance(job['parameters'], str) else [format_param(param) for param in job['parameters']]
+    for param in parameters:
+        if param.get('timebin_new') is None:
+            if job.get('timebin') is None:
+                raise ValueError(f"job '{job['name']}': no timebin_new for {os.path.basename(param['file'])} and no timebin for the job")
+            param['timebin_new'] = int(job['timebin'])
+    return parameters
+
+
+def _job_timebin(job: dict, info: pd.DataFrame, i: int) -> int:
+    # timebin of the job, spectrogram duration of the file i by default
+    timebin = job.get('timebin', info.iloc[i]['max_time'] if i < len(info) else None)
+    try:
+        valid = timebin is not None and np.isfinite(float(timebin)) and float(timebin) > 0
+    except (TypeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"job '{job['name']}': invalid timebin {timebin}, the timebin must be set in the job")
+    return int(timebin)
+
+
+def _load_job(job: dict) -> (pd.DataFrame, pd.DataFrame, pd.Timestamp, pd.Timestamp):
+    # detections of the files of a job, selected with the task status files, and evaluation window
+    df_detections, info = load_detections(job_parameters(job), n_workers=job.get('load_workers', 1))
+    if not len(df_detections):
+        raise ValueError(f"job '{job['name']}': no detection")
+    if job.get('status_files'):
+        df_detections = task_status_selection(files=job['status_files'], df_detections=df_detections, user=job.get('status_annotators', 'all'))
+
+    begin_date = pd.Timestamp(job['date_begin']) if 'date_begin' in job else df_detections['start_datetime'].min()
+    end_date = pd.Timestamp(job['date_end']) if 'date_end' in job else df_detections['end_datetime'].max()
+    return df_detections, info, begin_date, end_date
+
+
+def run_job(job: dict, output: str) -> dict:
+    ''' Runs a job and writes its results/figures to output/<job name>
+        Parameters :
+            job : dict of the job parameters (see the configuration file)
+            output : output directory
+        Returns :
+            summary : dict of the main results of the job
+    '''
+    if job.get('kind', 'performances') == 'results':
+        return run_results_job(job, output)
+    return run_performances_job(job, output)
+
+
+def run_performances_job(job: dict, output: str) -> dict:
+    ''' Computes the detection performances of a job and writes them to output/<job name>
+        Parameters :
+            job : dict of the job parameters (see the configuration file)
+            output : output directory
+        Returns :
+            summary : dict of the main results of the job
+    '''
+    job_dir = os.path.join(output, job['name'])
+    os.makedirs(job_dir, exist_ok=True)
+
+    df_detections, info, begin_date, end_date = _load_job(job)
+
+    annotator_ref, label_ref = _select_series(info, job.get('reference') or {}, default_file=0)
+    annotator_det, label_det = _select_series(info, job.get('detector') or {}, default_file=1)
+    df_ref = df_detections[(df_detections['annotator'] == annotator_ref) & (df_detections['annotation'] == label_ref)]
+    df_det = df_detections[(df_detections['annotator'] == annotator_det) & (df_detections['annotation'] == label_det)]
+
+    timebin = _job_timebin(job, info, (job.get('reference') or {}).get('file', 0))
+
+    summary = {'name': job['name'], 'annotator_ref': annotator_ref, 'label_ref': label_ref, 'annotator': annotator_det, 'label': label_det,
+               'begin_date': begin_date, 'end_date': end_date, 'timebin': timebin}
+    summary.update(evaluate_detections(df_ref=df_ref, df_det=df_det, begin_date=begin_date, end_date=end_date, timebin=timebin))
+
+    n_boot = job.get('n_boot', 1000)
+    if n_boot:
+        df_ci = bootstrap_detections(df_ref=df_ref, df_det=df_det, begin_date=begin_date, end_date=end_date, timebin=timebin,
+                                     block_duration=job.get('block_duration', 86400), n_boot=n_boot, seed=job.get('seed'))
+        df_ci.to_csv(os.path.join(job_dir, 'confidence_intervals.csv'), index_label='metric')
+        summary.update({f'{metric}_{bound}': df_ci.loc[metric, bound] for metric in df_ci.index for bound in ['ci_low', 'ci_high']})
+    pd.DataFrame([summary]).to_csv(os.path.join(job_dir, 'performances.csv'), index=False)
+
+    df_pairings = batch_evaluation(df=df_detections, begin_date=begin_date, end_date=end_date, timebin=timebin, references=[annotator_ref])
+    df_pairings.to_csv(os.path.join(job_dir, 'pairings.csv'), index=False)
+
+    df_sweep = tolerance_sweep(df_ref=df_ref, df_det=df_det, begin_date=begin_date, end_date=end_date, timebin=timebin,
+                               tolerances=job.get('tolerances', [0, timebin, 5 * timebin]), timebins=job.get('timebins', [timebin * i for i in [1, 6, 60]]))
+    df_sweep.to_csv(os.path.join(job_dir, 'tolerance_sweep.csv'), index=False)
+    _plot_tolerance_sweep(df_sweep, os.path.join(job_dir, 'precision_recall.png'))
+
+    df_correlation = correlation_resolutions(df_ref, df_det, begin_date=begin_date, end_date=end_date, resolutions=job.get('resolutions'))
+    df_correlation.to_csv(os.path.join(job_dir, 'correlation.csv'), index=False)
+
+    return summary
+
+
+def _figure_selection(df: pd.DataFrame, figure: dict, key: str) -> str:
+    # annotator/label of a figure, the single annotator/label of the detections if not specified
+    column = {'annotator': 'annotator', 'label': 'annotation'}[key]
+    available = sorted(df[column].unique())
+    value = figure.get(key)
+    if value is None:
+        if len(available) != 1:
+            raise ValueError(f'several {key}s {available}, the {key} of the {figure["type"]} figure must be specified')
+        value = available[0]
+    elif value not in available:
+        raise ValueError(f"{figure['type']} figure: {key} '{value}' not in {available}")
+    return value
+
+
+def _histogram(df: pd.DataFrame, begin_date: pd.Timestamp, end_date: pd.Timestamp, resolution, timebin: int, percentage: bool) -> pd.DataFrame:
+    # number of detections per bin, or proportion of positive timebins of each bin
+    edges = resolution_edges(begin_date, end_date, resolution)
+    counts = binned_counts(detection_epochs(df), edges)
+    values = counts / (np.diff(edges) / 1e9 / timebin) * 100 if percentage else counts
+    return pd.DataFrame({'begin': pd.to_datetime(edges[:-1], utc=True).tz_convert(begin_date.tz), 'value': values})
+
+
+def _plot_histogram(ax, df_hist: pd.DataFrame, title: str, percentage: bool):
+    widths = np.diff(mdates.date2num(df_hist['begin']))
+    width = np.append(widths, widths[-1] if len(widths) else 1)
+    ax.bar(df_hist['begin'], df_hist['value'], width=width, align='edge', edgecolor='k', linewidth=0.2)
+    ax.set_title(title)
+    ax.set_ylabel('Detection rate (%)' if percentage else 'Number of detections')
+    ax.tick_params(axis='x', rotation=60)
+    ax.grid(color='k', linestyle='-', linewidth=0.2, axis='y')
+
+
+def _diel_matrix(df: pd.DataFrame, begin_date: pd.Timestamp, end_date: pd.Timestamp, tz) -> (pd.DataFrame, np.ndarray):
+    # number of detections per local hour (rows) and local day (columns)
+    day_ns, hour_ns = 86400 * 10 ** 9, 3600 * 10 ** 9
+    epochs = detection_epochs(df)
+    local = epochs + tz_offset_minutes(epochs, tz) * 60 * 10 ** 9
+    bounds = np.array([begin_date.value, end_date.value], dtype=np.int64)
+    first_day, last_day = (bounds + tz_offset_minutes(bounds, tz) * 60 * 10 ** 9) // day_ns
+    days = np.arange(first_day, last_day + 1)
+
+    inside = (local // day_ns >= first_day) & (local // day_ns <= last_day)
+    M = np.zeros((24, len(days)), dtype=np.int64)
+    np.add.at(M, ((local[inside] % day_ns) // hour_ns, local[inside] // day_ns - first_day), 1)
+    return pd.DataFrame(M, index=pd.RangeIndex(24, name='hour'), columns=pd.to_datetime(days * day_ns).date), days * day_ns
+
+
+def _plot_figure(figure: dict, df: pd.DataFrame, begin_date: pd.Timestamp, end_date: pd.Timestamp, timebin: int, tz, file: str) -> pd.DataFrame:
+    # draws a figure of a results job to file (png), returns the values of the figure
+    resolution = figure.get('resolution', 'D')
+    percentage = figure.get('percentage', False)
+
+    if figure['type'] == 'overview':
+        values = df.groupby(['annotation', 'annotator']).size().unstack(fill_value=0)
+        fig, ax = plt.subplots(figsize=(12, 6))
+        values.plot.bar(ax=ax, edgecolor='k', linewidth=0.5)
+        ax.set_ylabel('Number of annotated calls')
+        ax.set_xlabel('')
+        ax.tick_params(axis='x', rotation=30)
+        ax.grid(color='k', linestyle='-', linewidth=0.2, axis='y')
+
+    elif figure['type'] == 'multilabel':
+        annotator = _figure_selection(df, figure, 'annotator')
+        df_annotator = df[df['annotator'] == annotator]
+        labels = figure.get('labels') or sorted(df_annotator['annotation'].unique())
+        unknown = [label for label in labels if label not in set(df_annotator['annotation'])]
+        if unknown:
+            raise ValueError(f"multilabel figure: labels {unknown} not annotated by '{annotator}'")
+        fig, axs = plt.subplots(len(labels), 1, figsize=(16, 4 * len(labels)), sharex=True, squeeze=False)
+        values = []
+        for ax, label in zip(axs[:, 0], labels):
+            df_hist = _histogram(df_annotator[df_annotator['annotation'] == label], begin_date, end_date, resolution, timebin, percentage)
+            _plot_histogram(ax, df_hist, f'{annotator} - {label}', percentage)
+            values.append(df_hist.assign(label=label))
+        values = pd.concat(values, ignore_index=True)
+
+    else:
+        annotator = _figure_selection(df, figure, 'annotator')
+        df_annotator = df[df['annotator'] == annotator]
+        label = _figure_selection(df_annotator, figure, 'label')
+        df_label = df_annotator[df_annotator['annotation'] == label]
+
+        if figure['type'] == 'seasonality':
+            values = _histogram(df_label, begin_date, end_date, resolution, timebin, percentage)
+            fig, ax = plt.subplots(figsize=(16, 6))
+            _plot_histogram(ax, values, f'{annotator} - {label}', percentage)
+        else:
+            values, days = _diel_matrix(df_label, begin_date, end_date, tz)
+            x_lims = mdates.date2num([values.columns[0], values.columns[-1] + pd.Timedelta(days=1)])
+            fig, ax = plt.subplots(figsize=(16, 6))
+            im = ax.imshow(values.to_numpy(), extent=[x_lims[0], x_lims[1], 0, 24], aspect='auto', origin='lower')
+            fig.colorbar(im).ax.set_ylabel('Number of detections', rotation=270, labelpad=15)
+            if figure.get('lat') is not None and figure.get('lon') is not None:
+                # suntime_hour gives UTC hours, shifted to the local hours of the matrix
+                hour_sunrise, hour_sunset, _, _, _, _ = suntime_hour(values.columns[0], values.columns[-1] + pd.Timedelta(days=1), tz, figure['lat'], figure['lon'])
+                shift = tz_offset_minutes(days, tz) / 60
+                x_days = mdates.date2num(values.columns) + 0.5
+                ax.plot(x_days, (np.array(hour_sunrise) + shift) % 24, color='w', linewidth=2)
+                ax.plot(x_days, (np.array(hour_sunset) + shift) % 24, color='w', linewidth=2)
+            ax.xaxis_date()
+            ax.set_yticks([0, 4, 8, 12, 16, 20, 24])
+            ax.set_ylabel('Hour')
+            ax.set_title(f'{annotator} - {label}')
+            ax.tick_params(axis='x', rotation=60)
+
+    fig.savefig(file, bbox_inches='tight')
+    plt.close(fig)
+    return values
+
+
+def run_results_job(job: dict, output: str) -> dict:
+    ''' Draws the figures of a results job to output/<job name>, a png and a csv of the values of each figure
+        Parameters :
+            job : dict of the job parameters (see the configuration file)
+            output : output directory
+        Returns :
+            summary : dict of the main results of the job
+    '''
+    job_dir = os.path.join(output, job['name'])
+    os.makedirs(job_dir, exist_ok=True)
+
+    df_detections, info, begin_date, end_date = _load_job(job)
+    timebin = _job_timebin(job, info, 0)
+    tz = begin_date.tz or info.iloc[0]['tz_data']
+    df_detections = df_detections[(df_detections['start_datetime'] >= begin_date) & (df_detections['start_datetime'] <= end_date)]
+
+    for i, figure in enumerate(job['figures']):
+        name = figure.get('name', f'{i}_{figure["type"]}')
+        values = _plot_figure(figure, df_detections, begin_date, end_date, timebin, tz, os.path.join(job_dir, name + '.png'))
+        values.to_csv(os.path.join(job_dir, name + '.csv'), index=figure['type'] in ['overview', 'diel'])
+
+    return {'name': job['name'], 'begin_date': begin_date, 'end_date': end_date, 'timebin': timebin,
+            'n_detections': len(df_detections), 'n_figures': len(job['figures'])}
+
+
+def _run_job_safe(args: (dict, str)) -> dict:
+    # runs a job, a failed job is reported in the summary without stopping the other ones
+    job, output = args
+    try:
+        return {**run_job(job, output), 'status': 'done'}
+    except Exception as error:
+        os.makedirs(os.path.join(output, job['name']), exist_ok=True)
+        with open(os.path.join(output, job['name'], 'error.log'), 'w') as log:
+            log.write(traceback.format_exc())
+        return {'name': job['name'], 'status': 'failed', 'error': f'{type(error).__name__}: {error}'}
+
+
+def run_batch(jobs: List[dict], output: str, n_workers: int = None) -> pd.DataFrame:
+    ''' Runs several jobs in parallel and writes the summary of all the jobs to output/summary.csv
+        Parameters :
+            jobs : list of dict of job parameters (see read_config)
+            output : output directory
+            n_workers : number of processes, by default one per job up to the number of CPUs, if set to 1 the jobs are run sequentially
+        Returns :
+            summary : DataFrame with one row per job
+    '''
+    os.makedirs(output, exist_ok=True)
+    if n_workers is None:
+        n_workers = min(len(jobs), os.cpu_count() or 1)
+
+    # the detection files of a job are loaded in parallel only if the jobs themselves are not
+    args = [({'load_workers': None if n_workers <= 1 else 1, **job}, output) for job in jobs]
+    if n_workers <= 1:
+        results = [_run_job_safe(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_run_job_safe, args))
+
+    summary = pd.DataFrame(results)
+    first = ['name', 'status'] + (['error'] if 'error' in summary else [])
+    summary = summary[first + [c for c in summary.columns if c not in first]]
+    summary.to_csv(os.path.join(output, 'summary.csv'), index=False)
+    return summary
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Computes the detection performances and draws the results figures of the jobs of a yaml configuration file, without user interaction')
+    parser.add_argument('config', help='path to the yaml configuration file')
+    parser.add_argument('-o', '--output', help='output directory, overrides the one of the configuration file')
+    parser.add_argument('-n', '--n-workers', type=int, help='number of processes, overrides the one of the configuration file')
+    parser.add_argument('--jobs', nargs='+', metavar='NAME', help='names of the jobs to run, all the jobs by default')
+    args = parser.parse_args(argv)
+
+    config = read_config(args.config)
+    jobs = config['jobs']
+    if args.jobs:
+        unknown = set(args.jobs) - {job['name'] for job in jobs}
+        if unknown:
+            parser.error(f'unknown jobs: {sorted(unknown)}')
+        jobs = [job for job in jobs if job['name'] in args.jobs]
+
+    output = args.output or config['output']
+    summary = run_batch(jobs, output=output, n_workers=args.n_workers or config['n_workers'])
+
+    with pd.option_context('display.width', 200, 'display.max_columns', 12):
+        print(summary[[c for c in ['name', 'status', 'precision', 'recall', 'f_score', 'error'] if c in summary]].to_string(index=False))
+    print(f'\nresults written to {os.path.abspath(output)}')
+    return int(np.any(summary['status'] != 'done'))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
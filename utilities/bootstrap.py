@@ -0,0 +1,87 @@
+import datetime as dt
+import numpy as np
+import pandas as pd
+from utilities.performances_func import presence_vector, confusion_matrix
+
+
+def block_counts(vec_ref: np.ndarray, vec_det: np.ndarray, block_size: int) -> np.ndarray:
+    ''' Numbers of true positives, false positives and false negatives of each block of consecutive timebins
+        Parameters :
+            vec_ref : boolean array, reference or "ground truth"
+            vec_det : boolean array of the evaluated detections, same length as vec_ref
+            block_size : number of timebins of a block, the last block can be shorter
+        Returns :
+            counts : int array of shape (n_blocks, 3), columns true_pos/false_pos/false_neg
+    '''
+    vec_ref, vec_det = np.asarray(vec_ref, dtype=bool), np.asarray(vec_det, dtype=bool)
+    if vec_ref.shape != vec_det.shape:
+        raise ValueError(f'vectors of different lengths ({len(vec_ref)} and {len(vec_det)})')
+
+    starts = np.arange(0, len(vec_ref), block_size)
+    counts = np.stack([vec_ref & vec_det, ~vec_ref & vec_det, vec_ref & ~vec_det], axis=1).astype(np.int64)
+    return np.add.reduceat(counts, starts, axis=0) if len(starts) else np.zeros((0, 3), dtype=np.int64)
+
+
+def bootstrap_performances(vec_ref: np.ndarray, vec_det: np.ndarray, block_size: int, n_boot: int = 1000, confidence: float = 0.95, seed: int = None, chunksize: int = None) -> pd.DataFrame:
+    ''' Block bootstrap confidence intervals of the precision, recall and f-score of presence/absence vectors :
+    blocks of consecutive timebins (ex : days or hours) are resampled with replacement to keep the temporal dependence of the detections.
+    Each replicate is a row of a matrix of block indexes, the replicates are computed by chunks of chunksize rows to bound the memory
+        Parameters :
+            vec_ref : boolean array, reference or "ground truth"
+            vec_det : boolean array of the evaluated detections, same length as vec_ref
+            block_size : number of timebins of a block (ex : 86400 / timebin for daily blocks)
+            n_boot : number of bootstrap replicates
+            confidence : confidence level of the intervals
+            seed : seed of the random generator, for reproducible intervals
+            chunksize : number of replicates computed at once, by default about 10**7 block indexes are drawn at once
+        Returns :
+            results : DataFrame indexed by metric (precision, recall, f_score) with columns value/ci_low/ci_high/std
+    '''
+    counts = block_counts(vec_ref, vec_det, block_size)
+    n_blocks = len(counts)
+    if n_blocks == 0:
+        raise ValueError('empty presence vectors')
+    rng = np.random.default_rng(seed)
+    chunksize = max(1, 10**7 // n_blocks) if chunksize is None else chunksize
+
+    replicates = np.zeros((n_boot, 3), dtype=np.int64)
+    for i in range(0, n_boot, chunksize):
+        index = rng.integers(0, n_blocks, size=(min(chunksize, n_boot - i), n_blocks))
+        for k in range(3):
+            replicates[i:i + len(index), k] = counts[:, k][index].sum(axis=1)
+    true_pos, false_pos, false_neg = replicates.T
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = true_pos / (true_pos + false_pos)
+        recall = true_pos / (true_pos + false_neg)
+        f_score = 2 * precision * recall / (precision + recall)
+
+    value = confusion_matrix(vec_ref, vec_det)
+    alpha = (1 - confidence) / 2
+    results = pd.DataFrame(index=['precision', 'recall', 'f_score'], columns=['value', 'ci_low', 'ci_high', 'std'], dtype=float)
+    for metric, boot in zip(results.index, [precision, recall, f_score]):
+        boot = boot[np.isfinite(boot)]
+        results.loc[metric] = [value[metric]] + ([np.quantile(boot, alpha), np.quantile(boot, 1 - alpha), np.std(boot)] if len(boot) else [np.nan] * 3)
+
+    return results
+
+
+def bootstrap_detections(df_ref: pd.DataFrame, df_det: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, block_duration: int = 86400, **kwargs) -> pd.DataFrame:
+    ''' Block bootstrap confidence intervals of the detection performances of a detection DataFrame compared to a reference DataFrame
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference or "ground truth" detections (one annotator/label)
+            df_det : APLOSE formatted DataFrame of the evaluated detections (one annotator/label)
+            begin_date : aware datetime, beginning of the window, the blocks start at begin_date
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            block_duration : duration of the resampled blocks in seconds, 86400 for days, 3600 for hours
+            **kwargs : n_boot, confidence, seed, chunksize (see bootstrap_performances)
+        Returns :
+            results : DataFrame indexed by metric (precision, recall, f_score) with columns value/ci_low/ci_high/std
+    '''
+    if block_duration % timebin != 0:
+        raise ValueError(f'block_duration={block_duration}: must be a multiple of the timebin ({timebin}s)')
+
+    vec_ref = presence_vector(df_ref, begin_date, end_date, timebin)
+    vec_det = presence_vector(df_det, begin_date, end_date, timebin)
+    return bootstrap_performances(vec_ref, vec_det, block_size=block_duration // timebin, **kwargs)
@@ -0,0 +1,85 @@
+from typing import List, Union
+import pandas as pd
+
+
+def consensus_threshold(user_sel: Union[str, int], n_annotators: int) -> int:
+    ''' Minimum number of annotators that must agree on a detection for a given consensus rule
+        Parameters :
+            user_sel : consensus rule
+                'intersection' : all the annotators
+                'union' : at least one annotator
+                'majority' : strictly more than half of the annotators
+                k (integer) : at least k annotators (k-of-n vote)
+            n_annotators : number of annotators
+        Returns :
+            k : minimum number of agreeing annotators
+    '''
+    if user_sel == 'intersection':
+        return n_annotators
+    elif user_sel == 'union':
+        return 1
+    elif user_sel == 'majority':
+        return n_annotators // 2 + 1
+    elif isinstance(user_sel, int) and not isinstance(user_sel, bool):
+        if not 1 <= user_sel <= n_annotators:
+            raise ValueError(f'user_sel={user_sel}: k must be between 1 and the number of annotators ({n_annotators})')
+        return user_sel
+    else:
+        raise ValueError(f"user_sel='{user_sel}': consensus rule not available")
+
+
+def consensus_name(annotators: List[str], user_sel: Union[str, int]) -> str:
+    ''' Name given to the annotator column of a consensus detection DataFrame
+        Parameters :
+            annotators : list of the annotators
+            user_sel : consensus rule, see consensus_threshold
+        Returns :
+            name of the consensus, ex: 'ann1 ∩ ann2', 'ann1 ∪ ann2', '2-of-3 (ann1, ann2, ann3)'
+    '''
+    if user_sel == 'intersection':
+        return ' ∩ '.join(annotators)
+    elif user_sel == 'union':
+        return ' ∪ '.join(annotators)
+    else:
+        k = consensus_threshold(user_sel, len(annotators))
+        return f'{k}-of-{len(annotators)} (' + ', '.join(annotators) + ')'
+
+
+def agreement_counts(df: pd.DataFrame) -> pd.DataFrame:
+    ''' Counts for each label and each detection bin (start_datetime) the number of distinct annotators having a detection
+    The counting is hash based (drop_duplicates/groupby) so it is linear in the number of detections
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+        Returns :
+            df_bins : first detection of each (label, start_datetime) bin, in order of appearance in df,
+                        with an additional 'agreement' column containing the number of annotators
+    '''
+    votes = df.drop_duplicates(subset=['annotation', 'start_datetime', 'annotator'])
+    count = votes.groupby(['annotation', 'start_datetime'], sort=False)['annotator'].transform('size')
+    return votes.assign(agreement=count.to_numpy()).drop_duplicates(subset=['annotation', 'start_datetime'])
+
+
+def consensus_detections(df: pd.DataFrame, user_sel: Union[str, int] = 'intersection', annotators: List[str] = None) -> (pd.DataFrame, pd.DataFrame):
+    ''' Selects the detections on which enough annotators agree, a detection being identified by its label and start_datetime
+        Parameters :
+            df : APLOSE formatted detection DataFrame, usually reshaped to a common timebin
+            user_sel : consensus rule, 'intersection', 'union', 'majority' or an integer k for a k-of-n vote
+            annotators : list of the annotators taken into account in n, by default the annotators present in df
+        Returns :
+            df_consensus : one detection per selected bin, sorted by start_datetime, the annotator column is set to the consensus name
+            df_agreement : DataFrame with columns annotation/start_datetime/agreement giving the number of agreeing annotators for every bin
+    '''
+    if annotators is None:
+        annotators = list(df['annotator'].drop_duplicates())
+    k = consensus_threshold(user_sel, len(annotators))
+
+    df = df[df['annotator'].isin(annotators)]
+    df_bins = agreement_counts(df)
+
+    df_consensus = df_bins[df_bins['agreement'] >= k].drop(columns='agreement')
+    df_consensus = df_consensus.sort_values('start_datetime', kind='mergesort').reset_index(drop=True)
+    df_consensus['annotator'] = consensus_name(annotators, user_sel)
+
+    df_agreement = df_bins[['annotation', 'start_datetime', 'agreement']].reset_index(drop=True)
+
+    return df_consensus, df_agreement
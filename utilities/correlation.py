@@ -0,0 +1,72 @@
+import datetime as dt
+from typing import List, Union
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# resolutions used by default : pandas frequency strings or integer numbers of seconds
+RESOLUTIONS = ['10min', '1h', 'D', 'W-MON', 'MS']
+
+
+def detection_epochs(df: pd.DataFrame) -> np.ndarray:
+    ''' Sorted start epochs of the detections, it is the cumulative count function of the detections :
+    the number of detections before an instant t is np.searchsorted(epochs, t)
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+        Returns :
+            epochs : sorted int64 array of the UTC epochs in nanoseconds of the start_datetime
+    '''
+    return np.sort(pd.to_datetime(df['start_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64))
+
+
+def resolution_edges(begin_date: dt.datetime, end_date: dt.datetime, resolution: Union[str, int]) -> np.ndarray:
+    ''' Edges of the bins of a resolution between two dates
+        Parameters :
+            begin_date, end_date : aware datetimes
+            resolution : pandas frequency string ('10min', 'D', 'W-MON', 'MS'...) or integer number of seconds
+        Returns :
+            edges : int64 array of the UTC epochs in nanoseconds of the edges
+    '''
+    freq = f'{resolution}s' if isinstance(resolution, (int, np.integer)) else resolution
+    return pd.date_range(start=begin_date, end=end_date, freq=freq).asi8
+
+
+def binned_counts(epochs: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    ''' Number of detections in each bin [edges[i], edges[i + 1]), by difference of the cumulative counts at the edges
+        Parameters :
+            epochs : sorted int64 array of the detection epochs (see detection_epochs)
+            edges : sorted int64 array of the bin edges
+        Returns :
+            counts : int array of length len(edges) - 1
+    '''
+    return np.diff(np.searchsorted(epochs, edges, side='left'))
+
+
+def _correlations(x: np.ndarray, y: np.ndarray) -> list:
+    # Pearson and Spearman coefficients/p-values, NaN when undefined (less than 3 bins or constant counts)
+    if len(x) < 3 or np.all(x == x[0]) or np.all(y == y[0]):
+        return [np.nan] * 4
+    pearson, spearman = stats.pearsonr(x, y), stats.spearmanr(x, y)
+    return [pearson[0], pearson[1], spearman[0], spearman[1]]
+
+
+def correlation_resolutions(df1: pd.DataFrame, df2: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, resolutions: List[Union[str, int]] = None) -> pd.DataFrame:
+    ''' Pearson and Spearman correlations between the numbers of detections of two detectors/annotators at several resolutions,
+    the cumulative counts of each detector are computed once and the histograms of every resolution are derived from them
+        Parameters :
+            df1, df2 : APLOSE formatted detection DataFrames (one annotator/label each)
+            begin_date, end_date : aware datetimes of the window
+            resolutions : list of pandas frequency strings or integer numbers of seconds, RESOLUTIONS by default
+        Returns :
+            results : DataFrame with one row per resolution, columns resolution/n_bins/pearson/pearson_p/spearman/spearman_p
+    '''
+    resolutions = RESOLUTIONS if resolutions is None else resolutions
+    epochs1, epochs2 = detection_epochs(df1), detection_epochs(df2)
+
+    results = []
+    for resolution in resolutions:
+        edges = resolution_edges(begin_date, end_date, resolution)
+        hist1, hist2 = binned_counts(epochs1, edges), binned_counts(epochs2, edges)
+        results.append([resolution, len(hist1)] + _correlations(hist1, hist2))
+
+    return pd.DataFrame(results, columns=['resolution', 'n_bins', 'pearson', 'pearson_p', 'spearman', 'spearman_p'])
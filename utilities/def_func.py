@@ -14,11 +14,20 @@ import gzip
 import math
 import easygui
 import glob
-import bisect
 from astral.sun import sun
 import astral
-import csv
 import yaml
+import dateutil.tz
+from concurrent.futures import ProcessPoolExecutor
+from utilities.detection_reader import read_detections, probe_tz, find_delimiter
+from utilities.consensus import consensus_detections, consensus_name
+from utilities.wav_index import FILENAME_DATETIME_FORMATS, file_index, bins_to_files, time_bin_index
+from utilities.sampling import sample_windows
+from utilities.aplose_datetime import tz_offset_minutes
+from utilities.raven import raven_offsets, timebin_selections, detection_selections
+
+# name of the confidence/score columns added by some detectors to the APLOSE formatted files
+SCORE_PATTERN = r'score|confidence|proba'
 
 
 def get_csv_file(num_files: int, message='Select csv') -> List[str]:
@@ -46,7 +55,7 @@ def get_csv_file(num_files: int, message='Select csv') -> List[str]:
     return file_paths
 
 
-def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin: dt.datetime = None, date_end: dt.datetime = None, annotator: str = None, annotation: str = None, box: bool = False, timebin_new: int = None, user_sel: str = 'all', fmin_filter: int = None, fmax_filter: int = None) -> (pd.DataFrame, pd.DataFrame):
+def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin: dt.datetime = None, date_end: dt.datetime = None, annotator: str = None, annotation: str = None, box: bool = False, timebin_new: int = None, user_sel: str = 'all', fmin_filter: int = None, fmax_filter: int = None, cache: bool = True) -> (pd.DataFrame, pd.DataFrame):
     ''' Filters an Aplose formatted detection file according to user specified filters
         Parameters :
             file : list of path(s) to the detection file(s), can be a str too
@@ -57,11 +66,14 @@ def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin
             annotation : string to be specified if the user wants to select the detection of a particular label
             box : if set to True, keeps all the annotations, if False keeps only the absence/presence box (weak detection)
             timebin_new : integer to be specified if the user already know the new time resolution to set the detection file to
-            user_sel: string to specify to filter detections of a file based on annotators
+            user_sel: string to specify to filter detections of a file based on annotators (see consensus.py)
                 'union' : the common detections of all annotators and the unique detections of each annotators are selected
                 'intersection' : only the common detections of all annotators are selected
+                'majority' : only the detections common to more than half of the annotators are selected
+                k (integer) : only the detections common to at least k annotators are selected
                 'all' : all the detections are selected, default value
             fmin_filer/fmax_filer : integer, in the case where the user wants to filter out detections based on their frequency range
+            cache : if set to True (default), the parsed file is loaded from/stored in the on-disk cache (see detection_cache.py)
         Returns :
             max_time : spectrogram temporal length
             max_freq : sampling frequency *0.5
@@ -71,59 +83,19 @@ def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin
             info : DataFrame containing infos such as max_time/max_freq/annotators/labels corresponding to each detection file
     '''
 
-    # find the proper delimiter for file
-    with open(file, 'r', newline='') as csv_file:
-        try:
-            temp_lines = csv_file.readline() + '\n' + csv_file.readline()
-            dialect = csv.Sniffer().sniff(temp_lines, delimiters=',;')
-            delimiter = dialect.delimiter
-        except csv.Error:
-            delimiter = ','
-
-    df = pd.read_csv(file, sep=delimiter)
-    list_annotators = list(df['annotator'].drop_duplicates())
-    list_labels = list(df['annotation'].drop_duplicates())
-    max_freq = int(max(df['end_frequency']))
-    max_time = int(max(df['end_time']))
-
-    df['start_datetime'] = pd.to_datetime(df['start_datetime'], format='%Y-%m-%dT%H:%M:%S.%f%z')
-    df['end_datetime'] = pd.to_datetime(df['end_datetime'], format='%Y-%m-%dT%H:%M:%S.%f%z')
-    df = df.sort_values('start_datetime')
+    df, max_time, max_freq, list_annotators, list_labels, tz_data = read_detections(file=file, date_begin=date_begin, date_end=date_end, annotator=annotator, annotation=annotation, fmin_filter=fmin_filter, fmax_filter=fmax_filter, cache=cache)
 
     if tz is not None:
-        df['start_datetime'] = [x.tz_convert(tz) for x in df['start_datetime']]
-        df['end_datetime'] = [x.tz_convert(tz) for x in df['end_datetime']]
-
-    tz_data = df['start_datetime'][0].tz
-
-    if date_begin is not None:
-        df = df[df['start_datetime'] >= date_begin]
-
-    if date_end is not None:
-        df = df[df['end_datetime'] <= date_end]
-
-    if date_begin is not None and date_end is not None:
-        if date_begin >= date_end:
-            raise ValueError("Error: date_begin > date_end")
+        df['start_datetime'] = pd.to_datetime(df['start_datetime'], utc=True).dt.tz_convert(tz)
+        df['end_datetime'] = pd.to_datetime(df['end_datetime'], utc=True).dt.tz_convert(tz)
+        tz_data = tz
 
     if annotator is not None:
-        df = df.loc[(df['annotator'] == annotator)]
         list_annotators = [annotator]
 
     if annotation is not None:
-        df = df.loc[(df['annotation'] == annotation)]
         list_labels = [annotation]
 
-    if fmin_filter is not None:
-        df = df[df['start_frequency'] >= fmin_filter]
-        if len(df) == 0:
-            raise Exception("No detection found after fmin filtering, upload aborted")
-
-    if fmax_filter is not None:
-        df = df[df['end_frequency'] <= fmax_filter]
-        if len(df) == 0:
-            raise Exception("No detection found after fmax filtering, upload aborted")
-
     df_nobox = df.loc[(df['start_time'] == 0) & (df['end_time'] == max_time) & (df['end_frequency'] == max_freq)]
     if len(df_nobox) == 0:
         max_time = 0
@@ -139,40 +111,9 @@ def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin
             else:
                 df = df_nobox
 
-    if len(list_annotators) > 1:
-        if user_sel == 'union' or user_sel == 'intersection':
-            df_inter = pd.DataFrame()
-            df_diff = pd.DataFrame()
-            for label_sel in list_labels:
-                df_label = df[df['annotation'] == label_sel]
-                values = list(df_label['start_datetime'].drop_duplicates())
-                common_values = []
-                diff_values = []
-                error_values = []
-                for value in values:
-                    if df_label['start_datetime'].to_list().count(value) == 2:
-                        common_values.append(value)
-                    elif df_label['start_datetime'].to_list().count(value) == 1:
-                        diff_values.append(value)
-                    else:
-                        error_values.append(value)
-
-                df_label_inter = df_label[df_label['start_datetime'].isin(common_values)].reset_index(drop=True)
-                df_label_inter = df_label_inter.drop_duplicates(subset='start_datetime')
-                df_inter = pd.concat([df_inter, df_label_inter]).reset_index(drop=True)
-
-                df_label_diff = df_label[df_label['start_datetime'].isin(diff_values)].reset_index(drop=True)
-                df_diff = pd.concat([df_diff, df_label_diff]).reset_index(drop=True)
-
-            if user_sel == 'intersection':
-                df = df_inter
-                list_annotators = [' ∩ '.join(list_annotators)]
-            elif user_sel == 'union':
-                df = pd.concat([df_diff, df_inter]).reset_index(drop=True)
-                df = df.sort_values('start_datetime')
-                list_annotators = [' ∪ '.join(list_annotators)]
-
-            df['annotator'] = list_annotators[0]
+    if len(list_annotators) > 1 and user_sel != 'all':
+        df, _ = consensus_detections(df=df, user_sel=user_sel, annotators=list_annotators)
+        list_annotators = [consensus_name(list_annotators, user_sel)]
 
     columns = ['file', 'max_time', 'max_freq', 'annotators', 'labels', 'tz_data']
     info = pd.DataFrame([[file, int(max_time), max_freq, list_annotators, list_labels, tz_data]], columns=columns)
@@ -180,15 +121,25 @@ def sorting_detections(file: List[str], tz: pytz._FixedOffset = None, date_begin
     return df.reset_index(drop=True), info
 
 
+def score_columns(df: pd.DataFrame) -> List[str]:
+    ''' Confidence/score columns of a detection DataFrame, i.e. the numeric columns whose name matches SCORE_PATTERN
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+        Returns :
+            list of the names of the score columns
+    '''
+    return [col for col in df.columns if re.search(SCORE_PATTERN, str(col), flags=re.IGNORECASE) and pd.api.types.is_numeric_dtype(df[col])]
+
+
 def reshape_timebin(df: pd.DataFrame, timebin_new: int = None) -> pd.DataFrame:
     ''' Changes the timebin (time resolution) of a detection dataframe
     ex :    -from a raw PAMGuard detection file to a detection file with 10s timebin
             -from an 10s detection file to a 1min / 1h / 24h detection file
     Parameter:
         df : detection dataframe
-        timebin_new : Time resolution to base the detections on, if not provided it is asked to the user
+        timebin_new : Time resolution to base the detections on, any integer number of seconds, if not provided it is asked to the user
     Returns:
-        df_new : detection dataframe with the new timebin
+        df_new : detection dataframe with the new timebin, the score columns (see score_columns) hold the maximum score of the detections of each timebin
     '''
     if isinstance(df, pd.DataFrame) is False:
         raise Exception("Not a dataframe passed, reshape aborted")
@@ -201,34 +152,26 @@ def reshape_timebin(df: pd.DataFrame, timebin_new: int = None) -> pd.DataFrame:
     max_freq = int(max(df['end_frequency']))
 
     tz_data = df['start_datetime'][0].tz
+    scores = score_columns(df)
 
     if timebin_new is None:
         while True:
             timebin_new = easygui.buttonbox('Select a new time resolution for the detections', df['dataset'][0], ['10s', '1min', '10min', '1h', '24h'])
-            if timebin_new == '10s':
-                f = timebin_new
-                timebin_new = 10
-            elif timebin_new == '1min':
-                f = timebin_new
-                timebin_new = 60
-            elif timebin_new == '10min':
-                f = timebin_new
-                timebin_new = 600
-            elif timebin_new == '1h':
-                f = timebin_new
-                timebin_new = 3600
-            elif timebin_new == '24h':
-                f = timebin_new
-                timebin_new = 86400
+            timebin_new = {'10s': 10, '1min': 60, '10min': 600, '1h': 3600, '24h': 86400}[timebin_new]
 
             if timebin_new > max_time: break
             else: easygui.msgbox('New time resolution is equal or smaller than the original one', 'Warning', 'Ok')
-    else: f = str(timebin_new) + 's'
 
-    df_new = pd.DataFrame()
     if isinstance(annotators, str): annotators = [annotators]
     if isinstance(labels, str): labels = [labels]
+
+    # the binning is done on integer epochs (ns) : each detection is assigned to the bin
+    # floor((start - t0) / timebin_new) where t0 is the rounded datetime of the first detection
+    res_ns = int(timebin_new) * 10**9
+
+    df_new = pd.DataFrame()
     for annotator in annotators:
+        df_new_annotator = [df_new]
         for label in labels:
 
             df_detect_prov = df[(df['annotator'] == annotator) & (df['annotation'] == label)]
@@ -236,80 +179,87 @@ def reshape_timebin(df: pd.DataFrame, timebin_new: int = None) -> pd.DataFrame:
             if len(df_detect_prov) == 0:
                 continue
 
-            t = t_rounder(t=df_detect_prov['start_datetime'].iloc[0], res=timebin_new)
-            t2 = t_rounder(df_detect_prov['start_datetime'].iloc[-1], timebin_new) + dt.timedelta(seconds=timebin_new)
-
-            time_vector = [ts.timestamp() for ts in pd.date_range(start=t, end=t2, freq=f)]
+            times_detect_beg = pd.to_datetime(df_detect_prov['start_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
 
-            # #here test to find for each time vector value which filename corresponds
-            filenames = sorted(list(set(df_detect_prov['filename'])))
-            if not all(isinstance(filename, str) for filename in filenames):
-                if all(math.isnan(filename) for filename in filenames):
-                    # FPOD case: the filenames of a FPOD csv file are NaN values
-                    filenames = [i.strftime('%Y-%m-%dT%H:%M:%S%z') for i in df_detect_prov['start_datetime']]
+            t0 = pd.Timestamp(t_rounder(t=df_detect_prov['start_datetime'].min(), res=timebin_new)).value
+            detection_ranks = (times_detect_beg - t0) // res_ns
+            ranks = np.unique(detection_ranks)
+            time_vector = t0 + ranks * res_ns
 
-            ts_filenames = [extract_datetime(var=filename, tz=tz_data).timestamp()for filename in filenames]
+            # for each selected timebin, find which filename it corresponds to
+            # (side='left' : a timebin starting exactly at the beginning of a file is assigned to the previous file, as it always was)
+            filenames = list(set(df_detect_prov['filename']))
+            if all(filename == '' if isinstance(filename, str) else math.isnan(filename) for filename in filenames):
+                # FPOD case (or Raven table without wav file): the filenames are missing, the filename of a timebin is the datetime of its detection
+                index = file_index(time_vector, (times_detect_beg // 10**9) * 10**9, side='left')
+                filenames = np.array(df_detect_prov['start_datetime'].iloc[index].dt.strftime('%Y-%m-%dT%H:%M:%S%z'))
+            else:
+                filenames = bins_to_files(time_vector, filenames, tz=tz_data, dataset=df_detect_prov['dataset'].iloc[0], side='left')
 
-            filename_vector = []
-            for ts in time_vector:
-                index = bisect.bisect_left(ts_filenames, ts)
-                if index == 0:
-                    filename_vector.append(filenames[index])
-                elif index == len(ts_filenames):
-                    filename_vector.append(filenames[index - 1])
-                else:
-                    filename_vector.append(filenames[index - 1])
-
-            times_detect_beg = [detect.timestamp() for detect in df_detect_prov['start_datetime']]
-            times_detect_end = [detect.timestamp() for detect in df_detect_prov['end_datetime']]
-
-            detect_vec, ranks, k = np.zeros(len(time_vector), dtype=int), [], 0
-            for i in range(len(times_detect_beg)):
-                for j in range(k, len(time_vector) - 1):
-                    if int(times_detect_beg[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)) or int(times_detect_end[i] * 1e7) in range(int(time_vector[j] * 1e7), int(time_vector[j + 1] * 1e7)):
-                        ranks.append(j)
-                        k = j
-                        break
-                    else:
-                        continue
-
-            ranks = sorted(list(set(ranks)))
-            detect_vec[ranks] = 1
-            detect_vec = list(detect_vec)
-
-            start_datetime_str, end_datetime_str, filename = [], [], []
-            for i in range(len(time_vector)):
-                if detect_vec[i] == 1:
-                    start_datetime = pd.Timestamp(time_vector[i], unit='s', tz=tz_data)
-                    start_datetime_str.append(start_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[:-8] + start_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[-5:-2] + ':' + start_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[-2:])
-                    end_datetime = pd.Timestamp(time_vector[i] + timebin_new, unit='s', tz=tz_data)
-                    end_datetime_str.append(end_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[:-8] + end_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[-5:-2] + ':' + end_datetime.strftime('%Y-%m-%dT%H:%M:%S.%f%z')[-2:])
-                    filename.append(filename_vector[i])
+            start_datetime = pd.to_datetime(time_vector, utc=True).tz_convert(tz_data)
 
             df_new_prov = pd.DataFrame()
-            dataset_str = list(set(df_detect_prov['dataset']))
-
-            df_new_prov['dataset'] = dataset_str * len(start_datetime_str)
-            df_new_prov['filename'] = filename
-            df_new_prov['start_time'] = [0] * len(start_datetime_str)
-            df_new_prov['end_time'] = [timebin_new] * len(start_datetime_str)
-            df_new_prov['start_frequency'] = [0] * len(start_datetime_str)
-            df_new_prov['end_frequency'] = [max_freq] * len(start_datetime_str)
-            df_new_prov['annotation'] = list(set(df_detect_prov['annotation'])) * len(start_datetime_str)
-            df_new_prov['annotator'] = list(set(df_detect_prov['annotator'])) * len(start_datetime_str)
-            df_new_prov['start_datetime'], df_new_prov['end_datetime'] = start_datetime_str, end_datetime_str
-
-            df_new = pd.concat([df_new, df_new_prov])
-
-        df_new['start_datetime'] = [pd.to_datetime(d, format='%Y-%m-%dT%H:%M:%S.%f%z') for d in df_new['start_datetime']]
-        # df_new['start_datetime'] = pd.to_datetime(df_new['start_datetime'], format='%Y-%m-%dT%H:%M:%S.%f%z')
-        df_new['end_datetime'] = [pd.to_datetime(d, format='%Y-%m-%dT%H:%M:%S.%f%z') for d in df_new['end_datetime']]
-        # df_new['end_datetime'] = pd.to_datetime(df_new['end_datetime'], format='%Y-%m-%dT%H:%M:%S.%f%z')
-        df_new = df_new.sort_values(by=['start_datetime'])
+            df_new_prov['dataset'] = [df_detect_prov['dataset'].iloc[0]] * len(time_vector)
+            df_new_prov['filename'] = filenames
+            df_new_prov['start_time'] = [0] * len(time_vector)
+            df_new_prov['end_time'] = [timebin_new] * len(time_vector)
+            df_new_prov['start_frequency'] = [0] * len(time_vector)
+            df_new_prov['end_frequency'] = [max_freq] * len(time_vector)
+            df_new_prov['annotation'] = [label] * len(time_vector)
+            df_new_prov['annotator'] = [annotator] * len(time_vector)
+            df_new_prov['start_datetime'] = start_datetime
+            df_new_prov['end_datetime'] = start_datetime + pd.Timedelta(seconds=timebin_new)
+            for col in scores:
+                df_new_prov[col] = df_detect_prov[col].groupby(detection_ranks).max().to_numpy()
+
+            df_new_annotator.append(df_new_prov)
+
+        df_new = pd.concat(df_new_annotator)
+        if len(df_new) > 0:
+            df_new = df_new.sort_values(by=['start_datetime'])
 
     return df_new
 
 
+def format_param(param: dict) -> dict:
+    ''' Converts a set of parameters read from a yaml file into sorting_detections arguments
+        Parameters :
+            param : dict of the parameters of one csv file (file, timebin_new, tz, date_begin...)
+        Returns :
+            argument : dict of sorting_detections arguments
+    '''
+    argument = {'file': param['file']}
+
+    if 'timebin_new' in param:
+        argument['timebin_new'] = param['timebin_new']
+    if 'tz' in param:
+        offset_string = param['tz']
+        hours, minutes = map(int, offset_string.lstrip('+').split(':'))
+        total_offset_minutes = (hours * 60) + minutes
+        argument['tz'] = pytz.FixedOffset(total_offset_minutes)
+    if 'fmin_filter' in param:
+        argument['fmin_filter'] = param['fmin_filter']
+    if 'fmax_filter' in param:
+        argument['fmax_filter'] = param['fmax_filter']
+    if 'date_begin' in param:
+        argument['date_begin'] = pd.Timestamp(param['date_begin'])
+    if 'date_end' in param:
+        argument['date_end'] = pd.Timestamp(param['date_end'])
+    if 'annotator' in param:
+        argument['annotator'] = param['annotator']
+    if 'annotation' in param:
+        argument['annotation'] = param['annotation']
+    if 'box' in param:
+        box_string = param['box']
+        argument['box'] = box_string.lower() != 'false'
+    if 'user_sel' in param:
+        argument['user_sel'] = param['user_sel']
+    if 'cache' in param:
+        argument['cache'] = str(param['cache']).lower() != 'false'
+
+    return argument
+
+
 def read_param(file: str):
     ''' Reads parameters from a yaml file for importing detections from an APLOSE formatted csv file with sorting_detection
         Parameters :
@@ -322,39 +272,51 @@ def read_param(file: str):
     with open(file, 'r') as yaml_file:
         parameters = yaml.safe_load(yaml_file)
 
-    arguments_list = []
-
-    for param in parameters:
-        argument = {'file': param['file']}
-
-        if 'timebin_new' in param:
-            argument['timebin_new'] = param['timebin_new']
-        if 'tz' in param:
-            offset_string = param['tz']
-            hours, minutes = map(int, offset_string.lstrip('+').split(':'))
-            total_offset_minutes = (hours * 60) + minutes
-            argument['tz'] = pytz.FixedOffset(total_offset_minutes)
-        if 'fmin_filter' in param:
-            argument['fmin_filter'] = param['fmin_filter']
-        if 'fmax_filter' in param:
-            argument['fmax_filter'] = param['fmax_filter']
-        if 'date_begin' in param:
-            argument['date_begin'] = pd.Timestamp(param['date_begin'])
-        if 'date_end' in param:
-            argument['date_end'] = pd.Timestamp(param['date_end'])
-        if 'annotator' in param:
-            argument['annotator'] = param['annotator']
-        if 'annotation' in param:
-            argument['annotation'] = param['annotation']
-        if 'box' in param:
-            box_string = param['box']
-            argument['box'] = box_string.lower() != 'false'
-        if 'user_sel' in param:
-            argument['user_sel'] = param['user_sel']
-
-        arguments_list.append(argument)
-
-    return arguments_list
+    return [format_param(param) for param in parameters]
+
+
+def _sorting_detections_args(args: dict) -> (pd.DataFrame, pd.DataFrame):
+    return sorting_detections(**args)
+
+
+def load_detections(parameters: List[dict], n_workers: int = 1) -> (pd.DataFrame, pd.DataFrame):
+    ''' Imports the detections of several APLOSE formatted files with sorting_detections, the files can be parsed and filtered in parallel
+    On Windows, the processes are spawned : a calling script using several processes must either be run from an interactive console (Spyder/IPython)
+    or protect its code with if __name__ == '__main__'
+        Parameters :
+            parameters : list of dict of sorting_detections arguments, one per file (output of read_param)
+            n_workers : number of processes, 1 by default (the files are loaded sequentially), None for one per file up to the number of CPUs
+        Returns :
+            df_detections : concatenated detections of all the files, empty if there is no file
+            info : concatenated infos of all the files (see sorting_detections)
+    '''
+    if not parameters:
+        columns = ['dataset', 'filename', 'start_time', 'end_time', 'start_frequency', 'end_frequency', 'annotation', 'annotator', 'start_datetime', 'end_datetime']
+        return pd.DataFrame(columns=columns), pd.DataFrame(columns=['file', 'max_time', 'max_freq', 'annotators', 'labels', 'tz_data'])
+
+    if n_workers is None:
+        n_workers = min(len(parameters), os.cpu_count() or 1)
+
+    if n_workers <= 1:
+        results = [_sorting_detections_args(args) for args in parameters]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_sorting_detections_args, parameters))
+
+    df_detections = pd.concat([result[0] for result in results], ignore_index=True)
+    info = pd.concat([result[1] for result in results], ignore_index=True)
+
+    return df_detections, info
+
+
+def read_task_status(file: str) -> pd.DataFrame:
+    ''' Reads an APLOSE task status file
+        Parameters :
+            file : path to the status file
+        Returns :
+            df : DataFrame with columns dataset, filename and one column per annotator with the status of each segment (ex : 'FINISHED')
+    '''
+    return pd.read_csv(file, sep=find_delimiter(file))
 
 
 def task_status_selection(files: List[str], df_detections: pd.DataFrame, user: Union[str, List[str]] = 'all') -> pd.DataFrame:
@@ -376,16 +338,7 @@ def task_status_selection(files: List[str], df_detections: pd.DataFrame, user: U
     result_df = pd.DataFrame()
     for file in files:
 
-        # find the proper delimiter for file
-        with open(file, 'r', newline='') as csv_file:
-            try:
-                temp_lines = csv_file.readline() + '\n' + csv_file.readline()
-                dialect = csv.Sniffer().sniff(temp_lines, delimiters=',;')
-                delimiter = dialect.delimiter
-            except csv.Error:
-                delimiter = ','
-
-        df = pd.read_csv(file, sep=delimiter)
+        df = read_task_status(file)
         annotators_df = [i for i in list(df.columns) if i != 'dataset' and i != 'filename']
 
         # selection of the annotators according to the user argument
@@ -499,15 +452,8 @@ def extract_datetime(var: str, tz: pytz._FixedOffset = None, formats=None) -> Un
     '''
 
     if formats is None:
-        # add more format if necessary
-        formats = [r'\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}',
-                   r'\d{2}\d{2}\d{2}\d{2}\d{2}\d{2}',
-                   r'\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}',
-                   r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}',
-                   r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',
-                   r'\d{4}_\d{2}_\d{2}_\d{2}_\d{2}_\d{2}',
-                   r'\d{4}_\d{2}_\d{2}T\d{2}_\d{2}_\d{2}',
-                   r'\d{4}\d{2}\d{2}T\d{2}\d{2}\d{2}']
+        # add more format to FILENAME_DATETIME_FORMATS (wav_index.py) if necessary
+        formats = list(FILENAME_DATETIME_FORMATS)
     match = None
     for f in formats:
         match = re.search(f, var)
@@ -515,24 +461,7 @@ def extract_datetime(var: str, tz: pytz._FixedOffset = None, formats=None) -> Un
             break
     if match:
         dt_string = match.group()
-        if f == r'\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}':
-            dt_format = '%Y-%m-%dT%H-%M-%S'
-        elif f == r'\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}':
-            dt_format = '%Y-%m-%d_%H-%M-%S'
-        elif f == r'\d{2}\d{2}\d{2}\d{2}\d{2}\d{2}':
-            dt_format = '%y%m%d%H%M%S'
-        elif f == r'\d{2}\d{2}\d{2}_\d{2}\d{2}\d{2}':
-            dt_format = '%y%m%d_%H%M%S'
-        elif f == r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}':
-            dt_format = '%Y-%m-%d %H:%M:%S'
-        elif f == r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}':
-            dt_format = '%Y-%m-%dT%H:%M:%S'
-        elif f == r'\d{4}_\d{2}_\d{2}_\d{2}_\d{2}_\d{2}':
-            dt_format = '%Y_%m_%d_%H_%M_%S'
-        elif f == r'\d{4}_\d{2}_\d{2}T\d{2}_\d{2}_\d{2}':
-            dt_format = '%Y_%m_%dT%H_%M_%S'
-        elif f == r'\d{4}\d{2}\d{2}T\d{2}\d{2}\d{2}':
-            dt_format = '%Y%m%dT%H%M%S'
+        dt_format = FILENAME_DATETIME_FORMATS[f]
 
         date_obj = pd.to_datetime(dt_string, format=dt_format)
 
@@ -552,6 +481,7 @@ def extract_datetime(var: str, tz: pytz._FixedOffset = None, formats=None) -> Un
 
 def t_rounder(t: dt.datetime, res: int):
     ''' Rounds a Timestamp according to the user specified resolution : 10s / 1min / 10 min / 1h / 24h
+    or any other positive integer resolution, in which case the local time is floored to a multiple of res
     Parameter :
         t: Timestamp to round
         res: integer corresponding to the new resolution in seconds
@@ -575,43 +505,52 @@ def t_rounder(t: dt.datetime, res: int):
         t = t.replace(hour=0, minute=0, second=0, microsecond=0)
     elif res == 3:
         t = t.replace(microsecond=0)
+    elif isinstance(res, (int, np.integer)) and res > 0:
+        # any other resolution : floor of the local epoch to a multiple of res
+        t = t.replace(microsecond=0)
+        local_epoch = int((t.replace(tzinfo=None) - dt.datetime(1970, 1, 1)).total_seconds())
+        t = t - dt.timedelta(seconds=local_epoch % res)
     else:
         raise ValueError(f'res={res}s: Resolution not available')
     return t
 
 
-def oneday_per_month(time_vector_ts, time_vector_str, vec) -> Tuple[list, list, list, list]:
-    # select a random day for each months in input datetimes list and returns all the datetimes of those randomly selected days
-
-    time_vector = [dt.datetime.fromtimestamp(time_vector_ts[i]) for i in range(len(time_vector_ts))]
-
-    datetimes_by_month = {}
-    for i in range(len(time_vector)):
-        key = (time_vector[i].year, time_vector[i].month)
-        if key not in datetimes_by_month:
-            datetimes_by_month[key] = []
-        datetimes_by_month[key].append((time_vector[i], vec[i], time_vector_str[i]))
-
-    # randomly select one day for each month
-    selected_datetimes = []
-    selected_vec = []
-    selected_str = []
-    for dt_by_month in datetimes_by_month.values():
-        if len(dt_by_month) > 0:
-            month_days = list(set(list_dt[0].day for list_dt in dt_by_month))  # get all unique days in the month
-            selected_day = random.choice(month_days)  # randomly select one day
-            for i, PG, time_str in dt_by_month:
-                if i.day == selected_day:
-                    selected_datetimes.append(i)
-                    selected_vec.append(PG)
-                    selected_str.append(time_str)
-
-    unique_dates = sorted(list(set(i.strftime('%d/%m/%Y') for i in selected_datetimes)), key=lambda x: dt.datetime.strptime(x, '%d/%m/%Y'))
-    return [selected_datetimes[i].timestamp() for i in range(len(selected_datetimes))], [selected_vec[i] for i in range(len(selected_vec))], [selected_str[i] for i in range(len(selected_str))], unique_dates
+def oneday_per_month(time_vector_ts, time_vector_str, vec, tz=None, seed: int = None) -> Tuple[list, list, list, list]:
+    ''' Selects a random day for each month of the time vector and returns all the timestamps of those randomly selected days
+    Parameter :
+        time_vector_ts : vector of timestamps
+        time_vector_str : vector of strings corresponding to the timestamps
+        vec: vector of 0/1 representing the absense/presence of a detection at the corresponding timestamp of the time_vector
+        tz : timezone of the days and months, local time of the computer by default
+        seed : seed of the random generator
+    Returns :
+        selected_time_vector_ts, selected_vec, selected_time_vector_str : timestamps, 0/1 values and strings of the selected days
+        unique_dates : sorted list of the selected days, '%d/%m/%Y'
+    '''
+    ts = np.asarray(time_vector_ts, dtype=np.float64)
+    seconds = np.floor(ts).astype(np.int64)
+    # the UTC offsets only change on the hour : they are computed once per hour of the time vector
+    hours = seconds // 3600
+    first_hour = hours.min() if len(hours) else 0
+    offsets = tz_offset_minutes(np.arange(first_hour, hours.max() + 1 if len(hours) else 0) * 3600 * 10**9, dateutil.tz.tzlocal() if tz is None else tz)
+    day_number = (seconds + offsets[hours - first_hour] * 60) // 86400
+
+    # one random day among the days of each month : the day with the highest random priority
+    days = day_number[np.r_[True, day_number[1:] > day_number[:-1]]] if np.all(day_number[1:] >= day_number[:-1]) else np.unique(day_number)
+    dates = pd.to_datetime(days, unit='D')
+    months = dates.year.to_numpy() * 12 + dates.month.to_numpy()
+    priority = np.random.default_rng(seed).random(len(days))
+    order = np.lexsort((priority, months))
+    selected = np.zeros(len(days), dtype=bool)
+    selected[order[np.r_[months[order][1:] != months[order][:-1], True]]] = True
+    index = np.flatnonzero(selected[np.searchsorted(days, day_number)])
+
+    unique_dates = list(dates[selected].strftime('%d/%m/%Y'))
+    return ts[index].tolist(), np.asarray(vec)[index].tolist(), np.asarray(time_vector_str, dtype=object)[index].tolist(), unique_dates
 
 
 def n_random_hour(time_vector_ts, time_vector_str, vec, n_hour: int, tz, time_step: int) -> Tuple[list, list, list, list]:
-    ''' Randomly select n non-overlapping hours from the time vector
+    ''' Randomly select n non-overlapping hours from the time vector, see sampling.sample_windows to constrain the positive rate of the selection
     Parameter :
         time_vector_ts : vector of timestamps
         time_vector_str : vector of strings corresponding to the timestamps
@@ -620,7 +559,9 @@ def n_random_hour(time_vector_ts, time_vector_str, vec, n_hour: int, tz, time_st
         tz : timezone object
         time_step: time bin of the time vector
     Returns :
-        t: rounded Timestamp'''
+        selected_time_vector_ts, selected_time_vector_str, selected_vec : timestamps, strings and 0/1 values of the selected hours
+        selected_dates : beginning of the selected hours, '%d/%m/%Y %H:%M:%S'
+    '''
 
     if type(tz) is not pytz._FixedOffset and tz is not pytz.utc: tz = pytz.timezone(tz)
 
@@ -628,88 +569,50 @@ def n_random_hour(time_vector_ts, time_vector_str, vec, n_hour: int, tz, time_st
         print('n_hour is not an integer')
         return
 
-    selected_time_vector_ts, selected_dates = [], []
-    while len(selected_dates) < n_hour:
-        # choose a random datetime from the time vector
-        rand_idx = random.randrange(len(time_vector_ts))
-        rand_datetime = time_vector_ts[rand_idx]
-
-        rand_datetime = np.round(rand_datetime / 3600) * 3600
-
-        selected_dates.append(rand_datetime)
-
-        # select all datetimes that fall within the hour following this datetime
-        possible_datetimes = time_vector_ts[rand_idx:rand_idx + round(3600 / time_step) + 1]
-
-        # check if any of the selected datetimes overlap with the previously selected datetimes
-        overlap = False
-        for i in selected_time_vector_ts:
-            if any(i <= time < i + 3600 for time in possible_datetimes):
-                overlap = True
-                break
-
-        if overlap: continue
-
-        # add the selected datetimes to the list
-        selected_time_vector_ts.extend(possible_datetimes)
-
-        # sort the selected datetimes in chronological order
-        selected_time_vector_ts.sort()
-        selected_dates.sort()
-
-    # extract the corresponding vectors and time strings
-    selected_vec = [vec[time_vector_ts.index(i)] for i in tqdm(selected_time_vector_ts, position=0, leave=True)]
-    selected_time_vector_str = [time_vector_str[time_vector_ts.index(i)] for i in tqdm(selected_time_vector_ts, position=0, leave=True)]
-    selected_dates = [dt.datetime.fromtimestamp(i, tz).strftime('%d/%m/%Y %H:%M:%S') for i in selected_dates]
-
-    return selected_time_vector_ts, selected_time_vector_str, selected_vec, selected_dates
+    return sample_windows(time_vector_ts, time_vector_str, vec, n_windows=n_hour, duration=3600, tz=tz, tolerance=None,
+                          min_bins=max(1, round(3600 / time_step) // 2))
 
 
 def pick_datetimes(time_vector_ts, time_vector_str, vec, selected_dates, selected_durations, TZ) -> Tuple[list, list, list, list]:
-    # user-selected datetimes from the time vector
-
+    ''' User-selected windows of the time vector
+    Parameter :
+        time_vector_ts : vector of timestamps
+        time_vector_str : vector of strings corresponding to the timestamps
+        vec: vector of 0/1 representing the absense/presence of a detection at the corresponding timestamp of the time_vector
+        selected_dates : list of the beginning of the windows, '%d/%m/%Y %H:%M:%S'
+        selected_durations : list of the durations of the windows, integer followed by 'd', 'h', 'm' or 's' (ex : '1d', '30m')
+        TZ : timezone of the data
+    Returns :
+        selected_time_vector_ts, selected_time_vector_str, selected_vec : timestamps, strings and 0/1 values of the selected windows
+        selected_df_out : DataFrame of the selected datetimes and durations
+    '''
     selected_df_out = pd.DataFrame({'datetimes': selected_dates, 'durations': selected_durations})
 
-    # format the datetimes and durations from strings to datetimes/timedeltas
-    # selected_dates = [dt.datetime.strptime(i, '%d/%m/%Y %H:%M:%S').timestamp() for i in selected_dates]
-    selected_dates = [pd.to_datetime(i, format='%d/%m/%Y %H:%M:%S').timestamp() for i in selected_dates]
-    timedeltas = []
-    for i in selected_durations:
-        if i.endswith('h'):
-            timedeltas.append(dt.timedelta(hours=int(i[:-1])).total_seconds())
-        elif i.endswith('m'):
-            timedeltas.append(dt.timedelta(minutes=int(i[:-1])).total_seconds())
-        elif i.endswith('s'):
-            timedeltas.append(dt.timedelta(seconds=int(i[:-1])).total_seconds())
-        elif i.endswith('d'):
-            timedeltas.append(dt.timedelta(days=int(i[:-1])).total_seconds())
-        else:
-            print('incorrect duration format')
-            return
-    selected_durations = timedeltas
-
-    selected_time_vector_ts = []
-
-    for i in range(len(selected_dates)):
-        # select all datetimes that fall within the durations following this datetime
-        possible_datetimes = [time for time in time_vector_ts if selected_dates[i] <= time <= selected_dates[i] + selected_durations[i]]
-
-        # add the selected datetimes to the list
-        selected_time_vector_ts.extend(possible_datetimes)
+    # format the datetimes and durations from strings to timestamps/seconds
+    begin = pd.to_datetime(pd.Series(selected_dates), format='%d/%m/%Y %H:%M:%S').to_numpy(dtype='datetime64[ns]').astype(np.int64) / 10**9
+    durations = pd.Series(selected_durations, dtype=str).str.extract(r'^(\d+)([dhms])$')
+    if durations.isna().any(axis=None):
+        print('incorrect duration format')
+        return
+    end = begin + durations[0].astype(int).to_numpy() * durations[1].map({'d': 86400, 'h': 3600, 'm': 60, 's': 1}).to_numpy()
 
-    # sort the selected datetimes in chronological order
-    selected_time_vector_ts.sort()
+    # select all datetimes that fall within the durations following each datetime, bounds included
+    ts = np.asarray(time_vector_ts, dtype=np.float64)
+    order = np.arange(len(ts)) if np.all(ts[1:] >= ts[:-1]) else np.argsort(ts, kind='stable')
+    lo = np.searchsorted(ts[order], begin, side='left')
+    hi = np.searchsorted(ts[order], end, side='right')
+    index = order[np.sort(np.concatenate([np.arange(i, j) for i, j in zip(lo, hi)]))] if len(lo) else np.zeros(0, dtype=np.int64)
 
     # extract the corresponding vectors and time strings
-    selected_vec = [vec[time_vector_ts.index(i)] for i in tqdm(selected_time_vector_ts, position=0, leave=True)]
-    selected_time_vector_str = [time_vector_str[time_vector_ts.index(i)] for i in tqdm(selected_time_vector_ts, position=0, leave=True)]
-    selected_dates = [dt.datetime.fromtimestamp(i, pytz.timezone(TZ)).strftime('%d/%m/%Y %H:%M:%S') for i in selected_dates]
+    selected_time_vector_ts = ts[index].tolist()
+    selected_vec = np.asarray(vec)[index].tolist()
+    selected_time_vector_str = np.asarray(time_vector_str, dtype=object)[index].tolist()
 
     return selected_time_vector_ts, selected_time_vector_str, selected_vec, selected_df_out
 
 
 def export2Raven(tuple_info, timestamps, df, timebin_new, bin_height, selection_vec: bool = False, offset: bool = False) -> pd.DataFrame:
-    ''' Export a given vector to Raven formatted table
+    ''' Export a given vector to Raven formatted table, the offset table of the wav files is built once per dataset (see utilities.raven)
         Parameters :
             df : dataframe of the detections
             timebin_new : int, duration of the detection boxes to export, if set to 0, the original detections are exported
@@ -717,73 +620,16 @@ def export2Raven(tuple_info, timestamps, df, timebin_new, bin_height, selection_
             tuple_info : tuple containing info such as the filenames of the wav files, their durations and datetimes
             selection_vec : if it is set to False, all the timebins are exported, else the selection_vec is used to selec the wanted timebins to export, for instance it corresponds to all the positives timebins, containing detections
     '''
-
-    file_list = list(tuple_info[0])
-    file_datetimes = tuple_info[1]
-    dur = list(tuple_info[2])
-
-    offsets = [(file_datetimes[i] + dt.timedelta(seconds=dur[i])).timestamp() - (file_datetimes[i + 1]).timestamp() for i in range(len(file_datetimes) - 1)]
-    offsets_cumsum = (list(np.cumsum([offsets[i] for i in range(len(offsets))])))
-    offsets_cumsum.insert(0, 0)
-    idx_wav_df = [file_list.index(df['filename'][i]) for i in range(len(df))]
+    table = raven_offsets(tuple_info)
 
     if timebin_new > 0:
-
-        # time_vec = []
-        # for i in range(len(file_list)):
-        #     timestamp = file_datetimes[i].timestamp() + offsets_cumsum[i]
-        #     durations = np.arange(0, dur[i], timebin_new).astype(int)
-
-        #     for elem in durations:
-        #         time_vec.append(timestamp + elem)
-        time_vec = np.arange(t_rounder(file_datetimes[0], res=timebin_new).timestamp(), file_datetimes[-1].timestamp() + dur[-1], timebin_new).astype(int)
-
-        if selection_vec is True:
-            times_det_beg = [df['start_datetime'][i].timestamp() + offsets_cumsum[idx_wav_df[i]] + 1e-8 * timebin_new for i in range(len(df))]
-            times_det_end = [df['end_datetime'][i].timestamp() + offsets_cumsum[idx_wav_df[i]] - 1e-8 * timebin_new for i in range(len(df))]
-
-            det_vec, ranks, k = np.zeros(len(time_vec) - 1, dtype=int), [], 0
-            for i in range(len(times_det_beg)):
-                for j in range(k, len(time_vec) - 0):
-                    if int(times_det_beg[i] * 1e8) in range(int(time_vec[j] * 1e8), int(time_vec[j + 1] * 1e8)) or int(times_det_end[i] * 1e8) in range(int(time_vec[j] * 1e7), int(time_vec[j + 1] * 1e7)):
-                        ranks.append(j)
-                        k = j
-                        break
-                    else: continue
-            ranks = sorted(list(set(ranks)))
-            det_vec[np.isin(range(len(time_vec) - 1), ranks)] = 1
-
-        else:
-            det_vec = [1] * (len(time_vec) - 1)
-
-        start_time = [int(time_vec[i] - file_datetimes[0].timestamp()) for i in range(0, len(time_vec) - 1)]
-        end_time = [int(time_vec[i] - file_datetimes[0].timestamp()) for i in range(1, len(time_vec))]
-        delta = [end_time[i] - start_time[i] for i in range(len(start_time))]
-        df_time = pd.DataFrame({'start': start_time, 'end': end_time, 'd': delta, 'vec': det_vec})
-        df_time_sorted = df_time[(df_time['d'] == timebin_new) & (df_time['vec'] == 1)].reset_index(drop=True)
-
-        df_PG2Raven = pd.DataFrame()
-        df_PG2Raven['Selection'] = np.arange(1, len(df_time_sorted) + 1)
-        df_PG2Raven['View'], df_PG2Raven['Channel'] = [1] * len(df_time_sorted), [1] * len(df_time_sorted)
-        df_PG2Raven['Begin Time (s)'] = df_time_sorted['start']
-        df_PG2Raven['End Time (s)'] = df_time_sorted['end']
-        df_PG2Raven['Low Freq (Hz)'] = [0] * len(df_time_sorted)
-        df_PG2Raven['High Freq (Hz)'] = [bin_height] * len(df_time_sorted)
-
+        origin = t_rounder(tuple_info[1][0], res=timebin_new).timestamp()
+        df_PG2Raven = timebin_selections(table, timebin_new, bin_height, df=df if selection_vec is True else None, origin=origin)
     else:
-        start_time = [df['start_time'][i] + offsets_cumsum[idx_wav_df[i]] for i in range(len(df))]
-        end_time = [df['end_time'][i] + offsets_cumsum[idx_wav_df[i]] for i in range(len(df))]
-
-        df_PG2Raven = pd.DataFrame()
-        df_PG2Raven['Selection'] = np.arange(1, len(df) + 1)
-        df_PG2Raven['View'], df_PG2Raven['Channel'] = [1] * len(df), [1] * len(df)
-        df_PG2Raven['Begin Time (s)'] = start_time
-        df_PG2Raven['End Time (s)'] = end_time
-        df_PG2Raven['Low Freq (Hz)'] = df['start_frequency']
-        df_PG2Raven['High Freq (Hz)'] = df['end_frequency']
+        df_PG2Raven = detection_selections(table, df)
 
     if offset is True:
-        df_offset = pd.DataFrame({'filename': file_list, 'offset_cumsum': offsets_cumsum})
+        df_offset = pd.DataFrame({'filename': list(table.index), 'offset_cumsum': table['offset'].tolist()})
         return df_PG2Raven, df_offset
     else:
         return df_PG2Raven, None
@@ -958,37 +804,26 @@ def find_files(f_type: str, ext: str, path: str = None, msg: str = None, n_dir:
     return selected_files
 
 
-def get_tz(file):
+def get_tz(file, n_rows: int = 1000, verify: bool = False):
     '''Extract the tz from a detection file list
+    Only the first n_rows of each file are read, see detection_reader.probe_tz
     if more than one tz is present UTC is chosen by default
     Parameters :
-        file : list of APLOSE formatted detection files
+        file : APLOSE formatted detection file or list of files
+        n_rows : number of rows read in each file to find its tz
+        verify : if set to True, all the rows of the files are read to check that each file has a single tz
     Returns:
         tz: pytz.tz object
     '''
+    if not isinstance(file, list):
+        return probe_tz(file, n_rows=n_rows, verify=verify)
 
-    tz = []
-    if isinstance(file, list):
-        if len(file) == 1: [file] = file  # Convert the single string to a list with one element
-        else:
-            for i in file:
-                dt = pd.to_datetime(pd.read_csv(i, usecols=['start_datetime'])['start_datetime'], format='%Y-%m-%dT%H:%M:%S.%f%z').tolist()
-                tz.append(list(set([x.tz for x in dt]))[0])
-            tz = list(set(tz))
-            if len(tz) == 1: tz = tz[0]
-            else:
-                print('More than one tz present on detection files, UTC is selected')
-                tz = pytz.UTC
-        return tz
+    tz = list(dict.fromkeys([probe_tz(f, n_rows=n_rows, verify=verify) for f in file]))
+    if len(tz) == 1:
+        return tz[0]
     else:
-        dt = pd.to_datetime(pd.read_csv(file, usecols=['start_datetime'])['start_datetime'].tolist(), format='%Y-%m-%dT%H:%M:%S.%f%z')
-        tz = list(set([x.tz for x in dt]))
-
-        if len(tz) == 1:
-            return tz[0]
-        elif len(tz) > 1:
-            print('More than one timezone present in file')
-        else: print('error tz')
+        print('More than one tz present on detection files, UTC is selected')
+        return pytz.UTC
 
 
 # def input_date(msg):
@@ -0,0 +1,172 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# bump this version when the layout of the cached tables changes, older caches are then ignored
+CACHE_VERSION = 3
+CACHE_DIR = os.environ.get('POST_PROCESSING_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'post_processing_detections'))
+
+
+def file_hash(file: str, block_size: int = 2**20) -> str:
+    ''' Computes the sha1 hash of the content of a file
+        Parameters :
+            file : path to the file
+            block_size : size in bytes of the blocks read from the file
+        Returns :
+            hexadecimal sha1 digest of the file
+    '''
+    h = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path(file: str, cache_dir: str = None) -> str:
+    ''' Path (without extension) of the cache entry of a detection file, the entry is named after the hash of the absolute path of the file
+        Parameters :
+            file : path to the detection file
+            cache_dir : directory of the cache, CACHE_DIR by default
+        Returns :
+            path of the cache entry, '.parquet' and '.json' are appended to get the table and its metadata
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(file)).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key)
+
+
+def file_signature(file: str) -> dict:
+    ''' Signature of a detection file stored with its cache entries, an entry is valid while the signature does not change
+        Parameters :
+            file : path to the detection file
+        Returns :
+            dict with keys file (absolute path), size, mtime_ns and version (CACHE_VERSION)
+    '''
+    stat = os.stat(file)
+    return {'file': os.path.abspath(file), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'version': CACHE_VERSION}
+
+
+def read_detection_cache(file: str, cache_dir: str = None, chunksize: int = 10**6):
+    ''' Loads the parsed detection table of an APLOSE formatted file from the cache
+    The entry is valid if the size and modification time of the file did not change,
+    otherwise the content hash is compared and the entry is deleted if the file content changed
+        Parameters :
+            file : path to the detection file
+            cache_dir : directory of the cache, CACHE_DIR by default
+            chunksize : number of rows of the yielded DataFrames
+        Returns :
+            generator of DataFrames (chunks of the parsed file, in file order), None if there is no valid cache entry for the file
+    '''
+    if not PARQUET_AVAILABLE:
+        return None
+
+    entry = cache_path(file, cache_dir)
+    if not os.path.exists(entry + '.json') or not os.path.exists(entry + '.parquet'):
+        return None
+
+    with open(entry + '.json', 'r') as f:
+        metadata = json.load(f)
+
+    signature = file_signature(file)
+    if metadata.get('version') != CACHE_VERSION or metadata.get('size') != signature['size']:
+        clear_detection_cache(file, cache_dir)
+        return None
+
+    if metadata.get('mtime_ns') != signature['mtime_ns']:
+        # the file was touched or copied, it is still valid if its content is the same
+        if metadata.get('sha1') != file_hash(file):
+            clear_detection_cache(file, cache_dir)
+            return None
+        metadata.update(signature)
+        _write_json(entry + '.json', metadata)
+
+    def chunks():
+        for batch in pq.ParquetFile(entry + '.parquet').iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+    return chunks()
+
+
+def write_detection_cache(file: str, chunks, cache_dir: str = None):
+    ''' Stores the parsed detection table of an APLOSE formatted file in the cache while it is being read
+    The chunks are passed through unchanged, the cache entry is only created once all chunks have been consumed.
+    Nothing is cached if pyarrow is not installed or if the chunks can not be stored in a single table (ex: mixed timezones)
+        Parameters :
+            file : path to the detection file the chunks are parsed from
+            chunks : iterable of parsed DataFrames, in file order
+            cache_dir : directory of the cache, CACHE_DIR by default
+        Returns :
+            generator of the DataFrames of chunks
+    '''
+    if not PARQUET_AVAILABLE:
+        yield from chunks
+        return
+
+    entry = cache_path(file, cache_dir)
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+    # written to a temporary file first so that concurrent readers never see a partial entry
+    tmp = f'{entry}.{os.getpid()}.tmp'
+    metadata = file_signature(file)
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is not False:
+                try:
+                    if not all(isinstance(chunk[col].dtype, pd.DatetimeTZDtype) for col in ['start_datetime', 'end_datetime']):
+                        raise TypeError('datetimes with mixed timezones')
+                    table = pa.Table.from_pandas(chunk, preserve_index=True)
+                    if writer is None:
+                        writer = pq.ParquetWriter(tmp, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                except (pa.ArrowException, TypeError, ValueError):
+                    if writer is not None:
+                        writer.close()
+                    writer = False
+            yield chunk
+
+        if writer:
+            writer.close()
+            metadata['sha1'] = file_hash(file)
+            os.replace(tmp, entry + '.parquet')
+            _write_json(entry + '.json', metadata)
+    finally:
+        if os.path.exists(tmp):
+            if writer:
+                writer.close()
+            os.remove(tmp)
+
+
+def clear_detection_cache(file: str = None, cache_dir: str = None):
+    ''' Deletes the cache entry of a detection file, or the whole cache if no file is given
+        Parameters :
+            file : path to the detection file
+            cache_dir : directory of the cache, CACHE_DIR by default
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    if file is not None:
+        entries = [cache_path(file, cache_dir)]
+    elif os.path.isdir(cache_dir):
+        entries = [os.path.join(cache_dir, os.path.splitext(f)[0]) for f in os.listdir(cache_dir) if f.endswith('.json')]
+    else:
+        entries = []
+
+    for entry in entries:
+        for ext in ['.json', '.parquet', '.pyramid.npz']:
+            if os.path.exists(entry + ext):
+                os.remove(entry + ext)
+
+
+def _write_json(path: str, content: dict):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(content, f)
+    os.replace(tmp, path)
@@ -0,0 +1,159 @@
+import os
+import csv
+import datetime as dt
+import pytz
+import numpy as np
+import pandas as pd
+from utilities.detection_cache import read_detection_cache, write_detection_cache
+from utilities.aplose_datetime import read_aplose_datetime, parse_aplose_datetime, APLOSE_FORMAT
+
+# timezones already probed, keyed by file path and signature (size, modification time)
+_TZ_CACHE = {}
+
+
+def find_delimiter(file: str, delimiters: str = ',;') -> str:
+    ''' Finds the delimiter of a csv file from its first two lines
+        Parameters :
+            file : path to the csv file
+            delimiters : candidate delimiters, the first one is returned if none is found
+        Returns :
+            delimiter : one of delimiters
+    '''
+    with open(file, 'r', newline='') as csv_file:
+        try:
+            temp_lines = csv_file.readline() + '\n' + csv_file.readline()
+            dialect = csv.Sniffer().sniff(temp_lines, delimiters=delimiters)
+            delimiter = dialect.delimiter
+        except csv.Error:
+            delimiter = delimiters[0]
+    return delimiter
+
+
+def parse_detection_chunks(file: str, chunksize: int = 10**6):
+    ''' Reads an APLOSE formatted detection file by chunks and parses the datetime columns
+        Parameters :
+            file : path to the detection file
+            chunksize : number of rows read at once
+        Returns :
+            generator of DataFrames, the index of each chunk is the row number in the file
+    '''
+    delimiter = find_delimiter(file)
+    for chunk in pd.read_csv(file, sep=delimiter, chunksize=chunksize):
+        chunk['start_datetime'] = read_aplose_datetime(chunk['start_datetime'])
+        chunk['end_datetime'] = read_aplose_datetime(chunk['end_datetime'])
+        yield chunk
+
+
+def _utc_offsets(values) -> np.ndarray:
+    # UTC offsets in minutes of datetime strings, with the vectorized parser when possible
+    try:
+        _, offset = parse_aplose_datetime(values)
+    except ValueError:
+        offset = np.array([int(t.utcoffset().total_seconds() // 60) for t in pd.to_datetime(values, format=APLOSE_FORMAT)], dtype=np.int64)
+    return offset
+
+
+def probe_tz(file: str, n_rows: int = 1000, verify: bool = False, chunksize: int = 10**6):
+    ''' Timezone of an APLOSE formatted detection file, only the first n_rows start_datetime are read
+    The result is cached per file and computed again if the file is modified or if more rows are requested
+        Parameters :
+            file : path to the detection file
+            n_rows : number of rows read to find the timezone
+            verify : if set to True, the whole start_datetime column is read to check that the timezone is the same for all detections
+            chunksize : number of rows read at once in the verification mode
+        Returns :
+            tz : pytz.FixedOffset of the detections
+    '''
+    stat = os.stat(file)
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+    n_checked = np.inf if verify else n_rows
+    if key in _TZ_CACHE and _TZ_CACHE[key][1] >= n_checked:
+        return _TZ_CACHE[key][0]
+
+    delimiter = find_delimiter(file)
+    if verify:
+        offsets = set()
+        for chunk in pd.read_csv(file, sep=delimiter, usecols=['start_datetime'], chunksize=chunksize):
+            offsets.update(np.unique(_utc_offsets(chunk['start_datetime'])).tolist())
+    else:
+        sample = pd.read_csv(file, sep=delimiter, usecols=['start_datetime'], nrows=n_rows)
+        offsets = set(np.unique(_utc_offsets(sample['start_datetime'])).tolist())
+
+    if len(offsets) == 0:
+        raise ValueError(f'{file}: no detection, timezone can not be found')
+    if len(offsets) > 1:
+        raise ValueError(f'{file}: more than one timezone present in file ({len(offsets)} UTC offsets)')
+
+    tz = pytz.FixedOffset(offsets.pop())
+    _TZ_CACHE[key] = (tz, n_checked)
+    return tz
+
+
+def read_detections(file: str, date_begin: dt.datetime = None, date_end: dt.datetime = None, annotator: str = None, annotation: str = None, fmin_filter: int = None, fmax_filter: int = None, cache: bool = True, chunksize: int = 10**6):
+    ''' Streams an APLOSE formatted detection file and only keeps the detections matching the filters,
+    the peak memory is bounded by the selected rows and the chunk size, not by the size of the file
+        Parameters :
+            file : path to the detection file
+            date_begin : datetime to be specified if the user wants to select detections after date_begin
+            date_end : datetime to be specified if the user wants to select detections before date_end
+            annotator : string to be specified if the user wants to select the detection of a particular annotator
+            annotation : string to be specified if the user wants to select the detection of a particular label
+            fmin_filer/fmax_filer : integer, in the case where the user wants to filter out detections based on their frequency range
+            cache : if set to True, the chunks are read from/written to the on-disk cache (see detection_cache.py)
+            chunksize : number of rows read at once
+        Returns :
+            df : DataFrame of the selected detections, sorted by start_datetime
+            max_time : maximum end_time of the whole file
+            max_freq : maximum end_frequency of the whole file
+            list_annotators : annotators of the whole file, in order of appearance
+            list_labels : labels of the whole file, in order of appearance
+            tz_data : timezone of the first detection of the file
+    '''
+    if date_begin is not None and date_end is not None:
+        if date_begin >= date_end:
+            raise ValueError("Error: date_begin > date_end")
+
+    chunks = read_detection_cache(file, chunksize=chunksize) if cache else None
+    if chunks is None:
+        chunks = parse_detection_chunks(file, chunksize=chunksize)
+        if cache:
+            chunks = write_detection_cache(file, chunks)
+
+    selected = []
+    annotators, labels = {}, {}
+    max_time, max_freq, tz_data = -np.inf, -np.inf, None
+    n_fmin, n_fmax = 0, 0
+    for chunk in chunks:
+        annotators.update(dict.fromkeys(chunk['annotator'].drop_duplicates()))
+        labels.update(dict.fromkeys(chunk['annotation'].drop_duplicates()))
+        max_time = max(max_time, chunk['end_time'].max())
+        max_freq = max(max_freq, chunk['end_frequency'].max())
+        if tz_data is None:
+            tz_data = chunk['start_datetime'].iloc[0].tz
+
+        mask = np.ones(len(chunk), dtype=bool)
+        if date_begin is not None:
+            mask &= (chunk['start_datetime'] >= date_begin).to_numpy()
+        if date_end is not None:
+            mask &= (chunk['end_datetime'] <= date_end).to_numpy()
+        if annotator is not None:
+            mask &= (chunk['annotator'] == annotator).to_numpy()
+        if annotation is not None:
+            mask &= (chunk['annotation'] == annotation).to_numpy()
+        if fmin_filter is not None:
+            mask &= (chunk['start_frequency'] >= fmin_filter).to_numpy()
+            n_fmin += mask.sum()
+        if fmax_filter is not None:
+            mask &= (chunk['end_frequency'] <= fmax_filter).to_numpy()
+            n_fmax += mask.sum()
+
+        selected.append(chunk[mask])
+
+    if fmin_filter is not None and n_fmin == 0:
+        raise Exception("No detection found after fmin filtering, upload aborted")
+    if fmax_filter is not None and n_fmax == 0:
+        raise Exception("No detection found after fmax filtering, upload aborted")
+
+    df = pd.concat(selected).sort_values('start_datetime', kind='mergesort')
+
+    return df, int(max_time), int(max_freq), list(annotators), list(labels), tz_data
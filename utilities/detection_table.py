@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from utilities.aplose_datetime import to_epoch_ns, to_datetime_series
+
+STRING_COLUMNS = ['dataset', 'filename', 'annotation', 'annotator']
+DATETIME_COLUMNS = ['start_datetime', 'end_datetime']
+FREQUENCY_COLUMNS = ['start_frequency', 'end_frequency']
+
+
+class DetectionTable:
+    ''' Compact in-memory representation of an APLOSE formatted detection DataFrame :
+    categorical codes for the string columns, int64 UTC epochs in nanoseconds for the datetimes,
+    int32 frequencies and a single timezone for the whole table.
+    Columns are decoded on access (table['start_datetime']) and to_frame gives back the usual DataFrame,
+    so that a list of tables (ex : one per deployment) costs a fraction of the memory of a list of DataFrames
+        Attributes :
+            data : compact DataFrame
+            tz : timezone of the datetimes
+    '''
+
+    def __init__(self, data: pd.DataFrame, tz, dtypes: dict = None):
+        self.data = data
+        self.tz = tz
+        self._dtypes = {} if dtypes is None else dtypes
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, tz=None):
+        ''' Builds a DetectionTable from an APLOSE formatted detection DataFrame
+            Parameters :
+                df : detection DataFrame, as returned by sorting_detections
+                tz : timezone of the table, by default the timezone of the datetimes of df
+            Returns :
+                DetectionTable
+        '''
+        data = df.copy()
+        dtypes = {col: df[col].dtype for col in df.columns}
+
+        for col in DATETIME_COLUMNS:
+            if col not in data.columns:
+                continue
+            ns, offset = to_epoch_ns(data[col])
+            if tz is None:
+                if isinstance(data[col].dtype, pd.DatetimeTZDtype):
+                    tz = data[col].dt.tz
+                elif len(np.unique(offset)) > 1:
+                    raise ValueError(f'{col}: more than one timezone in the detections, the tz of the table must be given')
+                elif len(offset):
+                    tz = data[col].iloc[0].tz
+            data[col] = ns
+
+        for col in STRING_COLUMNS:
+            if col in data.columns:
+                data[col] = data[col].astype('category')
+
+        for col in FREQUENCY_COLUMNS + ['start_time', 'end_time']:
+            if col in data.columns and pd.api.types.is_numeric_dtype(data[col]):
+                values = data[col].to_numpy()
+                if np.all(np.isfinite(values)) and np.all(values == np.round(values)) and np.all(np.abs(values) < 2**31):
+                    data[col] = values.astype(np.int32)
+
+        return cls(data, tz, dtypes)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.data.columns
+
+    def _decode(self, col: str) -> pd.Series:
+        if col in DATETIME_COLUMNS:
+            return to_datetime_series(self.data[col].to_numpy(), np.zeros(len(self), dtype=np.int64), tz=self.tz, index=self.data.index).rename(col)
+        if col in self._dtypes and self.data[col].dtype != self._dtypes[col]:
+            return self.data[col].astype(self._dtypes[col])
+        return self.data[col]
+
+    def __getitem__(self, key):
+        ''' table['col'] returns the decoded column, table[mask] returns the DetectionTable of the selected rows
+        '''
+        if isinstance(key, str):
+            return self._decode(key)
+        return DetectionTable(self.data[key], self.tz, self._dtypes)
+
+    def epoch(self, col: str = 'start_datetime') -> np.ndarray:
+        ''' int64 UTC epochs in nanoseconds of a datetime column, without any conversion
+        '''
+        return self.data[col].to_numpy()
+
+    def to_frame(self) -> pd.DataFrame:
+        ''' APLOSE formatted detection DataFrame of the table, same layout as the one given to from_frame
+        '''
+        return pd.DataFrame({col: self._decode(col) for col in self.data.columns}, index=self.data.index)
+
+    def memory_usage(self) -> int:
+        ''' Memory used by the table in bytes
+        '''
+        return int(self.data.memory_usage(deep=True).sum())
+
+    def __repr__(self) -> str:
+        return f'DetectionTable({len(self)} detections, tz={self.tz}, columns={list(self.columns)})'
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from utilities.performances_func import detection_scores
+
+
+def box_arrays(df: pd.DataFrame) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    ''' Time-frequency boxes of an APLOSE formatted detection DataFrame
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+        Returns :
+            start_ns, end_ns : int64 arrays of the UTC epochs in nanoseconds of the beginning/end of the boxes
+            fmin, fmax : float arrays of the frequency bounds of the boxes
+    '''
+    start_ns = pd.to_datetime(df['start_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    end_ns = pd.to_datetime(df['end_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return start_ns, end_ns, df['start_frequency'].to_numpy(dtype=float), df['end_frequency'].to_numpy(dtype=float)
+
+
+def overlapping_pairs(ref_start: np.ndarray, ref_end: np.ndarray, cand_start: np.ndarray, cand_end: np.ndarray, chunksize: int = 10**5) -> (np.ndarray, np.ndarray):
+    ''' All the pairs of temporally overlapping intervals between two sets, with a sweep over the candidates sorted by start.
+    The candidates are split in classes of durations within a factor 2 : for each reference interval and each class, only the candidates
+    starting between (ref_start - longest candidate of the class) and ref_end are tested, so a few long candidates do not extend the scan
+    of the short ones and the cost is proportional to the number of overlapping pairs and not to the product of the sizes of the sets
+        Parameters :
+            ref_start, ref_end : int64 arrays of the reference intervals
+            cand_start, cand_end : int64 arrays of the candidate intervals
+            chunksize : number of reference intervals processed at once, bounds the memory used
+        Returns :
+            ref_index, cand_index : int arrays of the positional indexes of the overlapping pairs, sorted by reference then candidate
+    '''
+    if len(ref_start) == 0 or len(cand_start) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    duration_class = np.floor(np.log2(np.maximum(cand_end - cand_start, 1))).astype(np.int64)
+    ref_index, cand_index = [], []
+    for k in np.unique(duration_class):
+        members = np.flatnonzero(duration_class == k)
+        order = members[np.argsort(cand_start[members], kind='stable')]
+        cand_start_sorted, cand_end_sorted = cand_start[order], cand_end[order]
+        max_duration = int(np.max(cand_end_sorted - cand_start_sorted))
+
+        for i in range(0, len(ref_start), chunksize):
+            start, end = ref_start[i:i + chunksize], ref_end[i:i + chunksize]
+            lo = np.searchsorted(cand_start_sorted, start - max_duration, side='left')
+            hi = np.searchsorted(cand_start_sorted, end, side='left')
+            counts = np.maximum(hi - lo, 0)
+
+            refs = np.repeat(np.arange(i, i + len(start)), counts)
+            cands = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+            overlap = cand_end_sorted[cands] > ref_start[refs]
+
+            ref_index.append(refs[overlap])
+            cand_index.append(order[cands[overlap]])
+
+    ref_index, cand_index = np.concatenate(ref_index), np.concatenate(cand_index)
+    order = np.lexsort((cand_index, ref_index))
+    return ref_index[order], cand_index[order]
+
+
+def box_overlaps(df_ref: pd.DataFrame, df_cand: pd.DataFrame) -> pd.DataFrame:
+    ''' Temporally overlapping pairs of boxes between a reference and a candidate detection DataFrame, with their overlap scores
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference boxes
+            df_cand : APLOSE formatted DataFrame of the candidate boxes
+        Returns :
+            pairs : DataFrame with columns
+                ref/cand : positional indexes of the boxes in df_ref/df_cand
+                time_iou : intersection over union of the time intervals
+                iou : intersection over union of the time-frequency boxes, the time_iou is used for the pairs of boxes without bandwidth
+    '''
+    ref_start, ref_end, ref_fmin, ref_fmax = box_arrays(df_ref)
+    cand_start, cand_end, cand_fmin, cand_fmax = box_arrays(df_cand)
+    ref, cand = overlapping_pairs(ref_start, ref_end, cand_start, cand_end)
+
+    t_inter = np.minimum(ref_end[ref], cand_end[cand]) - np.maximum(ref_start[ref], cand_start[cand])
+    t_union = np.maximum(ref_end[ref], cand_end[cand]) - np.minimum(ref_start[ref], cand_start[cand])
+    time_iou = t_inter / np.maximum(t_union, 1)
+
+    f_inter = np.maximum(np.minimum(ref_fmax[ref], cand_fmax[cand]) - np.maximum(ref_fmin[ref], cand_fmin[cand]), 0)
+    ref_area = (ref_end[ref] - ref_start[ref]) * (ref_fmax[ref] - ref_fmin[ref])
+    cand_area = (cand_end[cand] - cand_start[cand]) * (cand_fmax[cand] - cand_fmin[cand])
+    inter = t_inter * f_inter
+    union = ref_area + cand_area - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        iou = np.where(union > 0, inter / union, time_iou)
+
+    return pd.DataFrame({'ref': ref, 'cand': cand, 'time_iou': time_iou, 'iou': iou})
+
+
+def greedy_assignment(ref: np.ndarray, cand: np.ndarray, score: np.ndarray) -> np.ndarray:
+    ''' One-to-one greedy assignment : the pairs are selected by decreasing score, a box being used at most once.
+    The pairs are sorted once and scanned in a single pass, so the cost does not depend on the length of the chains of overlapping boxes
+        Parameters :
+            ref, cand : int arrays of the indexes of the candidate pairs
+            score : float array of the scores of the pairs
+        Returns :
+            selected : boolean array, True for the pairs of the assignment
+    '''
+    selected = np.zeros(len(score), dtype=bool)
+    if len(score) == 0:
+        return selected
+
+    # global priority of the pairs, ties are broken by the reference then candidate index
+    order = np.lexsort((cand, ref, -score))
+    used_ref = np.zeros(int(ref.max()) + 1, dtype=bool)
+    used_cand = np.zeros(int(cand.max()) + 1, dtype=bool)
+    for i, r, c in zip(order.tolist(), ref[order].tolist(), cand[order].tolist()):
+        if not used_ref[r] and not used_cand[c]:
+            selected[i] = used_ref[r] = used_cand[c] = True
+
+    return selected
+
+
+def hungarian_assignment(ref: np.ndarray, cand: np.ndarray, score: np.ndarray) -> np.ndarray:
+    ''' One-to-one assignment maximizing the sum of the scores (Hungarian algorithm),
+    solved independently on each connected group of overlapping boxes
+        Parameters :
+            ref, cand : int arrays of the indexes of the candidate pairs
+            score : float array of the scores of the pairs
+        Returns :
+            selected : boolean array, True for the pairs of the assignment
+    '''
+    selected = np.zeros(len(score), dtype=bool)
+    if len(score) == 0:
+        return selected
+
+    ref_codes, ref_nodes = np.unique(ref, return_inverse=True)
+    cand_codes, cand_nodes = np.unique(cand, return_inverse=True)
+    n_ref = len(ref_codes)
+    graph = coo_matrix((np.ones(len(score)), (ref_nodes, n_ref + cand_nodes)), shape=(n_ref + len(cand_codes),) * 2)
+    _, labels = connected_components(graph, directed=False)
+    component = labels[ref_nodes]
+
+    # groups with a single reference or a single candidate box are solved by taking their best pair
+    n_refs = np.bincount(labels[:n_ref])
+    n_cands = np.bincount(labels[n_ref:], minlength=len(n_refs))
+    star = np.flatnonzero((n_refs[component] == 1) | (n_cands[component] == 1))
+    order = star[np.lexsort((-score[star], component[star]))]
+    selected[order[np.r_[True, np.diff(component[order]) != 0]]] = True
+
+    pairs = np.setdiff1d(np.arange(len(score)), star)
+    pairs = pairs[np.argsort(component[pairs], kind='stable')]
+    for group in np.split(pairs, np.flatnonzero(np.diff(component[pairs])) + 1):
+        if len(group) == 0:
+            continue
+        rows, row_index = np.unique(ref_nodes[group], return_inverse=True)
+        cols, col_index = np.unique(cand_nodes[group], return_inverse=True)
+        weights = np.zeros((len(rows), len(cols)))
+        weights[row_index, col_index] = score[group]
+        matched_rows, matched_cols = linear_sum_assignment(weights, maximize=True)
+        matched = set(zip(matched_rows.tolist(), matched_cols.tolist()))
+        selected[group] = [(r, c) in matched for r, c in zip(row_index.tolist(), col_index.tolist())]
+
+    return selected
+
+
+def match_events(df_ref: pd.DataFrame, df_cand: pd.DataFrame, min_iou: float = 0.1, criterion: str = 'iou', method: str = 'greedy') -> (pd.DataFrame, dict):
+    ''' Event-level evaluation : the candidate boxes (ex : PAMGuard detections) are matched one-to-one to the reference boxes (ex : APLOSE annotations)
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference boxes, one annotator/label
+            df_cand : APLOSE formatted DataFrame of the candidate boxes, one annotator/label
+            min_iou : minimum score of a pair of boxes to be matched
+            criterion : 'iou' for the time-frequency intersection over union, 'time_iou' for the temporal one only
+            method : 'greedy' or 'hungarian' (maximum total score)
+        Returns :
+            matches : DataFrame with columns ref/cand (positional indexes of the matched boxes in df_ref/df_cand), time_iou and iou
+            results : dict with 'true_pos' (matched boxes), 'false_pos' (unmatched candidates), 'false_neg' (unmatched references)
+                      and 'precision', 'recall', 'f_score'
+    '''
+    if criterion not in ['iou', 'time_iou']:
+        raise ValueError(f"criterion='{criterion}': criterion not available")
+    if method not in ['greedy', 'hungarian']:
+        raise ValueError(f"method='{method}': assignment method not available")
+
+    pairs = box_overlaps(df_ref, df_cand)
+    pairs = pairs[pairs[criterion] >= min_iou].reset_index(drop=True)
+
+    ref, cand, score = pairs['ref'].to_numpy(), pairs['cand'].to_numpy(), pairs[criterion].to_numpy()
+    selected = greedy_assignment(ref, cand, score) if method == 'greedy' else hungarian_assignment(ref, cand, score)
+    matches = pairs[selected].sort_values('ref').reset_index(drop=True)
+
+    true_pos = len(matches)
+    results = detection_scores(true_pos=true_pos, false_pos=len(df_cand) - true_pos, false_neg=len(df_ref) - true_pos)
+
+    return matches, results
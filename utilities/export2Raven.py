@@ -9,17 +9,18 @@ User can choose between exporting the raw detections or transform the raw detect
 Other important parameters to adapt
     -tz : the timezone in which the detections need to be imported from the csv -> argument tz in sorting_detections
     -timebin : the length in seconds of the raven boxes in the output table, if set to 0 the original detections will be exported (raw_detections)
-    -offset : the input argument 'offset' in the export2Raven function, if set to True, the export2Raven function will return 2 outputs, df_Raven (the Raven table)
-    and the offsets introduced by Raven due to the rounded durations of the wav files. If set to False, the function simply returns df_Raven and df_offset
-    is set to None
+    -raven_table : the offsets introduced by Raven due to the rounded durations of the wav files are in the column 'offset' of raven_table
     -bin_height :  it is the height of the raven boxes that are going to be exported, can be set to any user-defined value < sampling frequency
-    -selection_vec : if set to True, only the boxes with detection are exported i.e. the positives. Otherwise all the boxes of length timebin are exported
+    -df : argument of iter_timebin_selections, only the boxes with detection are exported i.e. the positives. If set to None, all the boxes of length timebin are exported
     -PG2Raven_str : this string can be modified at will, this variable will be the name of the exported txt file
+    -split : None to export a single table, 'file' or 'day' to export one table per wav file or per day, the tables are written by chunks
+    of selections so that long deployments are exported without loading the whole table in memory
 """
 
 import pytz
 import os
-from utilities.def_func import get_csv_file, sorting_detections, get_timestamps, extract_datetime, export2Raven
+from utilities.def_func import get_csv_file, sorting_detections, get_timestamps, extract_datetime, t_rounder
+from utilities.raven import raven_offsets, iter_timebin_selections, iter_detection_selections, write_selections
 
 # Load data
 file = get_csv_file(1)
@@ -36,16 +37,15 @@ wav_datetimes = [extract_datetime(d, tz=tz_data) for d in timestamps_file['times
 durations = timestamps_file['duration']
 wav_tuple = (wav_names, wav_datetimes, durations)
 
-# Export detections in a Raven formatted table
+# Export detections in a Raven formatted table, written by chunks with the Begin File and File Offset (s) columns
 timebin = 60
-df_Raven, df_offset = export2Raven(df=df_detections,
-                                   tuple_info=wav_tuple,
-                                   timestamps=timestamps_file,
-                                   offset=False,
-                                   timebin_new=timebin,
-                                   bin_height=1.5 * fmax,
-                                   selection_vec=True)
+split = None
+raven_table = raven_offsets(wav_tuple)
+if timebin > 0:
+    selections = iter_timebin_selections(raven_table, timebin, bin_height=1.5 * fmax, df=df_detections, origin=t_rounder(wav_datetimes[0], res=timebin).timestamp())
+else:
+    selections = iter_detection_selections(raven_table, df_detections)
 
 PG2Raven_str = file[0].split('.csv')[0] + f'_{timebin}s_testtt' + '.txt'
-df_Raven.to_csv(PG2Raven_str, index=False, sep='\t')
-print(os.path.basename(PG2Raven_str), ' exported in ', os.path.dirname(PG2Raven_str))
+PG2Raven_files = write_selections(raven_table, selections, file=PG2Raven_str, split=split)
+[print(os.path.basename(f), ' exported in ', os.path.dirname(f)) for f in PG2Raven_files]
@@ -0,0 +1,251 @@
+import io
+import os
+import json
+import datetime as dt
+import numpy as np
+import pandas as pd
+from utilities.performances_func import detection_scores
+
+STATE_VERSION = 2
+DAY_NS = 86400 * 10**9
+
+# columns of the per-day contingency tables of a state
+TRUE_POS, FALSE_POS, FALSE_NEG, N_BINS = range(4)
+
+
+def new_state(timebin: int, offset: int = 0) -> dict:
+    ''' Empty state of an incremental evaluation
+        Parameters :
+            timebin : duration of the timebins in seconds
+            offset : UTC offset in minutes of the local time, the timebins and the days are aligned on the local midnight
+        Returns :
+            state : dict with keys
+                timebin, offset
+                closed : first timebin of the open days, the days before it are closed : only their counts are kept
+                ref_begin/det_begin : first timebin of the day of the last window of the reference/evaluated detections, None before the first one
+                ref_bins/det_bins : sorted int64 arrays of the positive timebins of the open days of the reference/evaluated detections
+                coverage : int64 array of shape (n, 2) of the evaluated intervals of timebins [first, last) of the open days, sorted and disjoint
+                days : sorted int64 array of the local days (number of days since 1970-01-01)
+                counts : int64 array of shape (n_days, 4), true_pos/false_pos/false_neg/n_bins of each day
+    '''
+    if 86400 % timebin != 0:
+        raise ValueError(f'timebin={timebin}: must divide a day')
+    return {'timebin': int(timebin), 'offset': int(offset), 'closed': None, 'ref_begin': None, 'det_begin': None, 'ref_bins': np.zeros(0, dtype=np.int64), 'det_bins': np.zeros(0, dtype=np.int64),
+            'coverage': np.zeros((0, 2), dtype=np.int64), 'days': np.zeros(0, dtype=np.int64), 'counts': np.zeros((0, 4), dtype=np.int64)}
+
+
+def read_state(file: str) -> dict:
+    ''' Reads the state of an incremental evaluation
+        Parameters :
+            file : path to the state file (.npz)
+        Returns :
+            state : see new_state
+    '''
+    with np.load(file, allow_pickle=False) as content:
+        metadata = json.loads(str(content['metadata']))
+        if metadata.get('version') != STATE_VERSION:
+            raise ValueError(f"{file}: state version {metadata.get('version')}, expected {STATE_VERSION}")
+        state = {key: content[key] for key in ['ref_bins', 'det_bins', 'coverage', 'days', 'counts']}
+    state.update({key: metadata[key] for key in ['timebin', 'offset', 'closed', 'ref_begin', 'det_begin']})
+    return state
+
+
+def write_state(state: dict, file: str):
+    ''' Writes the state of an incremental evaluation, the file is replaced atomically
+        Parameters :
+            state : see new_state
+            file : path to the state file (.npz)
+    '''
+    metadata = {'version': STATE_VERSION, **{key: state[key] for key in ['timebin', 'offset', 'closed', 'ref_begin', 'det_begin']}}
+    buffer = io.BytesIO()
+    np.savez(buffer, metadata=np.array(json.dumps(metadata)), **{key: state[key] for key in ['ref_bins', 'det_bins', 'coverage', 'days', 'counts']})
+
+    if os.path.dirname(file):
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+    tmp = f'{file}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp, file)
+
+
+def _local_ns(state: dict, datetimes) -> np.ndarray:
+    # epochs in nanoseconds of the local time of the state, of a datetime or of a Series of datetimes
+    if isinstance(datetimes, pd.Series):
+        utc = pd.to_datetime(datetimes, utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    else:
+        utc = pd.Timestamp(datetimes).value
+    return utc + state['offset'] * 60 * 10**9
+
+
+def _contains(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # membership test of values in a sorted array, in O(len(values) * log(len(sorted_values)))
+    index = np.minimum(np.searchsorted(sorted_values, values), max(len(sorted_values) - 1, 0))
+    return (sorted_values[index] == values) if len(sorted_values) else np.zeros(len(values), dtype=bool)
+
+
+def _insert(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # insertion of sorted values absent from a sorted array
+    return np.insert(sorted_values, np.searchsorted(sorted_values, values), values)
+
+
+def _add_counts(state: dict, bins: np.ndarray, column: int, values):
+    # adds values to a column of the contingency tables of the days of the timebins
+    days = bins * state['timebin'] * 10**9 // DAY_NS
+    new_days = np.setdiff1d(days, state['days'])
+    if len(new_days):
+        index = np.searchsorted(state['days'], new_days)
+        state['days'] = np.insert(state['days'], index, new_days)
+        state['counts'] = np.insert(state['counts'], index, 0, axis=0)
+    np.add.at(state['counts'][:, column], np.searchsorted(state['days'], days), values)
+
+
+def _add_coverage(state: dict, first: int, last: int):
+    # adds the interval of timebins [first, last) to the coverage and counts the timebins not covered yet
+    coverage = state['coverage']
+    overlapping = coverage[(coverage[:, 1] >= first) & (coverage[:, 0] <= last)]
+
+    uncovered, position = [], first
+    for lo, hi in overlapping:
+        if lo > position:
+            uncovered.append(np.arange(position, lo))
+        position = max(position, hi)
+    if position < last:
+        uncovered.append(np.arange(position, last))
+    if uncovered:
+        _add_counts(state, np.concatenate(uncovered), N_BINS, 1)
+
+    merged = [np.min(np.r_[first, overlapping[:, 0]]), np.max(np.r_[last, overlapping[:, 1]])]
+    kept = coverage[(coverage[:, 1] < first) | (coverage[:, 0] > last)]
+    state['coverage'] = np.concatenate([kept, [merged]]).astype(np.int64)
+    state['coverage'] = state['coverage'][np.argsort(state['coverage'][:, 0])]
+
+
+def _close_days(state: dict):
+    # closes the days before the last windows of both the reference and the evaluated detections, they cannot receive late rows anymore :
+    # their timebins are dropped, the state only grows with the number of days
+    if state['ref_begin'] is None or state['det_begin'] is None:
+        return
+    closed = min(state['ref_begin'], state['det_begin'])
+    if state['closed'] is not None and closed <= state['closed']:
+        return
+    state['closed'] = closed
+    state['ref_bins'] = state['ref_bins'][np.searchsorted(state['ref_bins'], closed):]
+    state['det_bins'] = state['det_bins'][np.searchsorted(state['det_bins'], closed):]
+    coverage = state['coverage'][state['coverage'][:, 1] > closed]
+    coverage[:, 0] = np.maximum(coverage[:, 0], closed)
+    state['coverage'] = coverage
+
+
+def _new_bins(state: dict, df: pd.DataFrame, first: int, last: int, end_ns: int, known: np.ndarray) -> np.ndarray:
+    # positive timebins of the detections of the window [first, last) not known yet,
+    # the detections ending after the end of the window are ignored as in evaluate_detections
+    start = _local_ns(state, df['start_datetime'])
+    bins = start // (state['timebin'] * 10**9)
+    bins = np.unique(bins[(bins >= first) & (bins < last) & (_local_ns(state, df['end_datetime']) <= end_ns)])
+    return bins[~_contains(known, bins)]
+
+
+def update_state(state: dict, begin_date: dt.datetime, end_date: dt.datetime, df_ref: pd.DataFrame = None, df_det: pd.DataFrame = None) -> dict:
+    ''' Updates the state of an incremental evaluation with a new batch of detections, in proportion of the size of the batch :
+    only the timebins becoming positive change the running counts. The days before the windows of the last batches of both the reference
+    and the evaluated detections are closed, the timebins of a closed day are ignored (late rows must be delivered before the day is closed)
+        Parameters :
+            state : see new_state, modified in place
+            begin_date, end_date : aware datetimes of the window covered by the batch, only the complete timebins of the window are evaluated
+            df_ref : APLOSE formatted DataFrame of the new reference detections (one annotator/label), None if there is none
+            df_det : APLOSE formatted DataFrame of the new evaluated detections (one annotator/label), None if there is none
+        Returns :
+            state : the updated state
+    '''
+    res_ns = state['timebin'] * 10**9
+    begin_ns, end_ns = _local_ns(state, begin_date), _local_ns(state, end_date)
+    if begin_ns >= end_ns:
+        raise ValueError('Error: begin_date >= end_date')
+    first, last = -(-begin_ns // res_ns), end_ns // res_ns
+    if state['closed'] is not None:
+        first = max(first, state['closed'])
+
+    if last > first:
+        _add_coverage(state, first, last)
+
+    if df_ref is not None and len(df_ref):
+        # a new positive reference timebin is a true positive if the detector was already positive (former false positive), else a false negative
+        new_ref = _new_bins(state, df_ref, first, last, end_ns, state['ref_bins'])
+        hit = _contains(state['det_bins'], new_ref)
+        _add_counts(state, new_ref[hit], TRUE_POS, 1)
+        _add_counts(state, new_ref[hit], FALSE_POS, -1)
+        _add_counts(state, new_ref[~hit], FALSE_NEG, 1)
+        state['ref_bins'] = _insert(state['ref_bins'], new_ref)
+
+    if df_det is not None and len(df_det):
+        new_det = _new_bins(state, df_det, first, last, end_ns, state['det_bins'])
+        hit = _contains(state['ref_bins'], new_det)
+        _add_counts(state, new_det[hit], TRUE_POS, 1)
+        _add_counts(state, new_det[hit], FALSE_NEG, -1)
+        _add_counts(state, new_det[~hit], FALSE_POS, 1)
+        state['det_bins'] = _insert(state['det_bins'], new_det)
+
+    day_bin = int(begin_ns // DAY_NS * DAY_NS // res_ns)
+    for key, df in [('ref_begin', df_ref), ('det_begin', df_det)]:
+        if df is not None:
+            state[key] = day_bin if state[key] is None else max(state[key], day_bin)
+    _close_days(state)
+
+    return state
+
+
+def state_summary(state: dict) -> (pd.DataFrame, dict):
+    ''' Current results of an incremental evaluation
+        Parameters :
+            state : see new_state
+        Returns :
+            daily : DataFrame with one row per local day, columns date/n_bins/true_pos/false_pos/false_neg/true_neg/precision/recall/f_score
+            results : dict of the results over all the evaluated timebins, see confusion_matrix
+    '''
+    counts = state['counts']
+    daily = pd.DataFrame({'date': pd.to_datetime(state['days'], unit='D').date, 'n_bins': counts[:, N_BINS], 'true_pos': counts[:, TRUE_POS],
+                          'false_pos': counts[:, FALSE_POS], 'false_neg': counts[:, FALSE_NEG]})
+    daily['true_neg'] = daily['n_bins'] - daily['true_pos'] - daily['false_pos'] - daily['false_neg']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily['precision'] = daily['true_pos'] / (daily['true_pos'] + daily['false_pos'])
+        daily['recall'] = daily['true_pos'] / (daily['true_pos'] + daily['false_neg'])
+        daily['f_score'] = 2 * daily['precision'] * daily['recall'] / (daily['precision'] + daily['recall'])
+
+    total = counts.sum(axis=0)
+    results = detection_scores(true_pos=int(total[TRUE_POS]), false_pos=int(total[FALSE_POS]), false_neg=int(total[FALSE_NEG]))
+    results['true_neg'] = int(total[N_BINS] - total[TRUE_POS] - total[FALSE_POS] - total[FALSE_NEG])
+
+    return daily, results
+
+
+def update_evaluation(state_file: str, begin_date: dt.datetime, end_date: dt.datetime, df_ref: pd.DataFrame = None, df_det: pd.DataFrame = None,
+                      timebin: int = None, summary_file: str = None) -> (pd.DataFrame, dict):
+    ''' Updates the evaluation stored in a state file with a new batch of detections (ex : the PAMGuard detections and annotations of the last day),
+    the state is created at the first call
+        Parameters :
+            state_file : path to the state file (.npz)
+            begin_date, end_date : aware datetimes of the window covered by the batch
+            df_ref : APLOSE formatted DataFrame of the new reference detections (one annotator/label), None if there is none
+            df_det : APLOSE formatted DataFrame of the new evaluated detections (one annotator/label), None if there is none
+            timebin : duration of the timebins in seconds, needed to create the state
+            summary_file : path to a csv file where the per-day results are written after the update
+        Returns :
+            daily, results : see state_summary
+    '''
+    if os.path.exists(state_file):
+        state = read_state(state_file)
+        if timebin is not None and timebin != state['timebin']:
+            raise ValueError(f"timebin={timebin}: the state file has a {state['timebin']}s timebin")
+    elif timebin is None:
+        raise ValueError(f'{state_file}: no state file, the timebin must be specified')
+    else:
+        state = new_state(timebin, offset=int(pd.Timestamp(begin_date).utcoffset().total_seconds() // 60))
+
+    update_state(state, begin_date, end_date, df_ref=df_ref, df_det=df_det)
+    write_state(state, state_file)
+
+    daily, results = state_summary(state)
+    if summary_file is not None:
+        daily.to_csv(summary_file, index=False)
+
+    return daily, results
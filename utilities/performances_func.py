@@ -0,0 +1,319 @@
+import os
+import datetime as dt
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utilities.def_func import load_detections
+
+
+def window_bins(begin_date: dt.datetime, end_date: dt.datetime, timebin: int) -> (int, int, int):
+    ''' Integer description of the timebins [begin_date + i * timebin, begin_date + (i + 1) * timebin) contained in a time window
+        Parameters :
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+        Returns :
+            begin_ns : UTC epoch of begin_date in nanoseconds
+            res_ns : duration of the timebins in nanoseconds
+            n_bins : number of complete timebins in the window
+    '''
+    begin_ns, end_ns = pd.Timestamp(begin_date).value, pd.Timestamp(end_date).value
+    if begin_ns >= end_ns:
+        raise ValueError('Error: begin_date >= end_date')
+    res_ns = int(timebin * 10**9)
+    return begin_ns, res_ns, int((end_ns - begin_ns) // res_ns)
+
+
+def _window_ranks(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int) -> (np.ndarray, int):
+    # timebin index of each detection of the window, -1 for the detections outside of the window
+    begin_ns, res_ns, n_bins = window_bins(begin_date, end_date, timebin)
+    start_ns = pd.to_datetime(df['start_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    end_ns = pd.to_datetime(df['end_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+
+    ranks = (start_ns - begin_ns) // res_ns
+    ranks[(start_ns < begin_ns) | (end_ns > pd.Timestamp(end_date).value) | (ranks >= n_bins)] = -1
+    return ranks, n_bins
+
+
+def presence_vector(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int) -> np.ndarray:
+    ''' Presence/absence of detections in each timebin of a time window
+    Only the detections beginning after begin_date and ending before end_date are taken into account,
+    a detection is assigned to the timebin containing its start_datetime
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+        Returns :
+            vec : boolean array, True for the timebins containing at least one detection
+    '''
+    ranks, n_bins = _window_ranks(df, begin_date, end_date, timebin)
+    vec = np.zeros(n_bins, dtype=bool)
+    vec[ranks[ranks >= 0]] = True
+    return vec
+
+
+def detection_scores(true_pos: int, false_pos: int, false_neg: int) -> dict:
+    ''' Precision, recall and f-score of a detector
+        Parameters :
+            true_pos, false_pos, false_neg : number of true positives, false positives and false negatives
+        Returns :
+            results : dict with the counts and 'precision', 'recall', 'f_score' (NaN if undefined)
+    '''
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos > 0 else np.nan
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg > 0 else np.nan
+    f_score = 2 * precision * recall / (precision + recall) if precision + recall > 0 else np.nan
+
+    return {'true_pos': true_pos, 'false_pos': false_pos, 'false_neg': false_neg,
+            'precision': precision, 'recall': recall, 'f_score': f_score}
+
+
+def confusion_matrix(vec_ref: np.ndarray, vec_det: np.ndarray) -> dict:
+    ''' Detection performances of a presence/absence vector compared to a reference vector
+        Parameters :
+            vec_ref : boolean array, reference or "ground truth"
+            vec_det : boolean array of the evaluated detections, same length as vec_ref
+        Returns :
+            results : dict with the counts 'true_pos', 'false_pos', 'true_neg', 'false_neg'
+                      and the metrics 'precision', 'recall', 'f_score' (NaN if undefined)
+    '''
+    vec_ref, vec_det = np.asarray(vec_ref, dtype=bool), np.asarray(vec_det, dtype=bool)
+    if vec_ref.shape != vec_det.shape:
+        raise ValueError(f'vectors of different lengths ({len(vec_ref)} and {len(vec_det)})')
+
+    true_pos = int(np.count_nonzero(vec_ref & vec_det))
+    false_pos = int(np.count_nonzero(~vec_ref & vec_det))
+    false_neg = int(np.count_nonzero(vec_ref & ~vec_det))
+    true_neg = len(vec_ref) - true_pos - false_pos - false_neg
+
+    results = {'true_pos': true_pos, 'false_pos': false_pos, 'true_neg': true_neg, 'false_neg': false_neg}
+    results.update(detection_scores(true_pos, false_pos, false_neg))
+    return results
+
+
+def evaluate_detections(df_ref: pd.DataFrame, df_det: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int) -> dict:
+    ''' Computes the detection performances of a detection DataFrame compared to a reference DataFrame :
+    the time window is divided into timebins and each timebin is positive if it contains at least one detection
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference or "ground truth" detections (one annotator/label)
+            df_det : APLOSE formatted DataFrame of the evaluated detections (one annotator/label)
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+        Returns :
+            results : dict with the confusion matrix and precision/recall/f_score, see confusion_matrix
+    '''
+    vec_ref = presence_vector(df_ref, begin_date, end_date, timebin)
+    vec_det = presence_vector(df_det, begin_date, end_date, timebin)
+    return confusion_matrix(vec_ref, vec_det)
+
+
+def presence_series(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int) -> (pd.DataFrame, int):
+    ''' Bins the detections of every annotator/label of a detection DataFrame at once
+        Parameters :
+            df : APLOSE formatted detection DataFrame
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+        Returns :
+            series : DataFrame with columns annotator/annotation/bins, bins being the sorted array of the positive timebins of the series
+            n_bins : number of timebins in the window
+    '''
+    ranks, n_bins = _window_ranks(df, begin_date, end_date, timebin)
+    positives = pd.DataFrame({'annotator': df['annotator'].to_numpy(), 'annotation': df['annotation'].to_numpy(), 'bin': ranks})
+    positives = positives[positives['bin'] >= 0].drop_duplicates().sort_values('bin', kind='mergesort')
+
+    # every annotator/label of df is a series, even without detection in the window
+    series = df[['annotator', 'annotation']].drop_duplicates().reset_index(drop=True)
+    bins = {key: group['bin'].to_numpy() for key, group in positives.groupby(['annotator', 'annotation'], sort=False)}
+    series['bins'] = [bins.get((annotator, label), np.zeros(0, dtype=np.int64)) for annotator, label in zip(series['annotator'], series['annotation'])]
+
+    return series, n_bins
+
+
+def batch_evaluation(df: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, references: List[str] = None, same_label: bool = False) -> pd.DataFrame:
+    ''' Detection performances of every (annotator, label) series of a detection DataFrame against every other one,
+    each series is binned once and reused for all the pairings
+        Parameters :
+            df : APLOSE formatted detection DataFrame, ex : concatenated detections of several files (load_detections)
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            references : list of the annotators used as reference, by default all the annotators
+            same_label : if set to True, only the series with the same label are compared
+        Returns :
+            results : DataFrame with one row per pairing, columns annotator_ref/label_ref/annotator/label,
+                      the confusion matrix and precision/recall/f_score (see confusion_matrix)
+    '''
+    series, n_bins = presence_series(df, begin_date, end_date, timebin)
+    n_pos = np.array([len(bins) for bins in series['bins']])
+
+    results = []
+    for i, ref in series.iterrows():
+        if references is not None and ref['annotator'] not in references:
+            continue
+        for j, det in series.iterrows():
+            if i == j or (same_label and ref['annotation'] != det['annotation']):
+                continue
+            true_pos = len(np.intersect1d(ref['bins'], det['bins'], assume_unique=True))
+            results.append([ref['annotator'], ref['annotation'], det['annotator'], det['annotation'], true_pos, n_pos[j] - true_pos, n_pos[i] - true_pos])
+
+    results = pd.DataFrame(results, columns=['annotator_ref', 'label_ref', 'annotator', 'label', 'true_pos', 'false_pos', 'false_neg'])
+    results['true_neg'] = n_bins - results['true_pos'] - results['false_pos'] - results['false_neg']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['precision'] = results['true_pos'] / (results['true_pos'] + results['false_pos'])
+        results['recall'] = results['true_pos'] / (results['true_pos'] + results['false_neg'])
+        results['f_score'] = 2 * results['precision'] * results['recall'] / (results['precision'] + results['recall'])
+
+    return results
+
+
+def _evaluate_deployment(deployment: dict) -> pd.DataFrame:
+    df, _ = load_detections(deployment['parameters'], n_workers=deployment.get('load_workers', 1))
+    results = batch_evaluation(df, begin_date=deployment['begin_date'], end_date=deployment['end_date'], timebin=deployment['timebin'],
+                               references=deployment.get('references'), same_label=deployment.get('same_label', False))
+    results.insert(0, 'deployment', deployment['name'])
+    return results
+
+
+def evaluate_deployments(deployments: List[dict], n_workers: int = None) -> pd.DataFrame:
+    ''' Batch evaluation (see batch_evaluation) of several deployments, the deployments are loaded and evaluated in parallel
+    On Windows, the processes are spawned : see load_detections
+        Parameters :
+            deployments : list of dict, one per deployment, with keys
+                'name' : name of the deployment
+                'parameters' : list of dict of sorting_detections arguments, one per detection file (output of read_param)
+                'begin_date'/'end_date' : aware datetimes of the evaluation window
+                'timebin' : duration of the timebins in seconds
+                'references' (optional) : list of the reference annotators
+                'same_label' (optional) : if set to True, only the series with the same label are compared
+                'load_workers' (optional) : number of processes loading the detection files, all the CPUs if the deployments are evaluated sequentially, 1 otherwise
+            n_workers : number of processes, by default one per deployment up to the number of CPUs, if set to 1 the deployments are evaluated sequentially
+        Returns :
+            results : concatenated results of all the deployments, with an additional 'deployment' column
+    '''
+    if n_workers is None:
+        n_workers = min(len(deployments), os.cpu_count() or 1)
+
+    if n_workers <= 1:
+        # the deployments being evaluated sequentially, the detection files of each deployment are loaded in parallel
+        results = [_evaluate_deployment({'load_workers': None, **deployment}) for deployment in deployments]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_evaluate_deployment, deployments))
+
+    return pd.concat(results, ignore_index=True)
+
+
+def dilate(vec: np.ndarray, k: int, cumsum: np.ndarray = None) -> np.ndarray:
+    ''' Dilation of a presence/absence vector by k timebins on each side, computed with a cumulative sum
+        Parameters :
+            vec : boolean array
+            k : number of timebins, 0 returns vec
+            cumsum : cumulative sum of vec with a leading 0 (np.concatenate([[0], np.cumsum(vec)])), computed if not given
+        Returns :
+            dilated : boolean array, True for the timebins at less than k timebins from a positive timebin of vec
+    '''
+    if cumsum is None:
+        cumsum = np.concatenate([[0], np.cumsum(vec, dtype=np.int64)])
+    index = np.arange(len(vec))
+    return cumsum[np.minimum(index + k + 1, len(vec))] - cumsum[np.maximum(index - k, 0)] > 0
+
+
+def tolerance_sweep(df_ref: pd.DataFrame, df_det: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, tolerances: List[int] = None, timebins: List[int] = None) -> pd.DataFrame:
+    ''' Detection performances as a function of the temporal tolerance and of the timebin, in one call :
+    the detections are binned once at the finest timebin, coarser timebins are derived by OR-reduction
+    and the tolerances are applied by dilating the presence vectors (see dilate).
+    With a tolerance, a reference timebin is found (recall) if a detection is at less than the tolerance from it
+    and a detection timebin is correct (precision) if a reference is at less than the tolerance from it
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference or "ground truth" detections (one annotator/label)
+            df_det : APLOSE formatted DataFrame of the evaluated detections (one annotator/label)
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : finest duration of the timebins in seconds
+            tolerances : list of tolerances in seconds, rounded up to a number of timebins, by default 0 and 1 to 5 timebins
+            timebins : list of the timebins to evaluate, multiples of timebin, by default [timebin]
+        Returns :
+            results : DataFrame with one row per timebin and tolerance, columns timebin/tolerance/tolerance_bins, the counts
+                      'true_pos' (found reference timebins), 'false_pos', 'false_neg' and 'precision', 'recall', 'f_score'
+    '''
+    timebins = [timebin] if timebins is None else timebins
+    if any(tb % timebin != 0 for tb in timebins):
+        raise ValueError(f'timebins={timebins}: the timebins must be multiples of {timebin}s')
+
+    vec_ref = presence_vector(df_ref, begin_date, end_date, timebin)
+    vec_det = presence_vector(df_det, begin_date, end_date, timebin)
+
+    results = []
+    for tb in sorted(timebins):
+        factor = tb // timebin
+        n_bins = len(vec_ref) // factor
+        ref, det = vec_ref[:n_bins * factor].reshape(n_bins, factor).any(axis=1), vec_det[:n_bins * factor].reshape(n_bins, factor).any(axis=1)
+        cumsum_ref = np.concatenate([[0], np.cumsum(ref, dtype=np.int64)])
+        cumsum_det = np.concatenate([[0], np.cumsum(det, dtype=np.int64)])
+        n_ref, n_det = int(cumsum_ref[-1]), int(cumsum_det[-1])
+
+        for tolerance in (range(0, 6 * tb, tb) if tolerances is None else tolerances):
+            k = int(-(-tolerance // tb))
+            found_ref = int(np.count_nonzero(ref & dilate(det, k, cumsum_det)))
+            correct_det = int(np.count_nonzero(det & dilate(ref, k, cumsum_ref)))
+            precision = correct_det / n_det if n_det > 0 else np.nan
+            recall = found_ref / n_ref if n_ref > 0 else np.nan
+            scores = {'true_pos': found_ref, 'false_pos': n_det - correct_det, 'false_neg': n_ref - found_ref, 'precision': precision, 'recall': recall,
+                      'f_score': 2 * precision * recall / (precision + recall) if precision + recall > 0 else np.nan}
+            results.append({'timebin': tb, 'tolerance': tolerance, 'tolerance_bins': k, **scores})
+
+    return pd.DataFrame(results)
+
+
+def score_sweep(df_ref: pd.DataFrame, df_det: pd.DataFrame, begin_date: dt.datetime, end_date: dt.datetime, timebin: int, score: str = 'score', thresholds: List[float] = None) -> pd.DataFrame:
+    ''' Precision-recall and ROC curves of a detector with a score/confidence column, for all the score thresholds in a single pass :
+    the score of a timebin is the maximum score of its detections, the positive timebins are sorted by decreasing score once
+    and the counts of every threshold are read in the cumulative sums of the true/false positives
+        Parameters :
+            df_ref : APLOSE formatted DataFrame of the reference or "ground truth" detections (one annotator/label)
+            df_det : APLOSE formatted DataFrame of the evaluated detections (one annotator/label) with a score column
+            begin_date : aware datetime, beginning of the window
+            end_date : aware datetime, end of the window
+            timebin : duration of the timebins in seconds
+            score : name of the score column of df_det, the detections without score are ignored
+            thresholds : list of score thresholds, a timebin is positive if its score is >= threshold, by default every distinct score of the timebins
+        Returns :
+            results : DataFrame with one row per threshold (decreasing), columns threshold/true_pos/false_pos/false_neg/true_neg/precision/recall/f_score
+                      and fpr (false positive rate), the recall being the true positive rate of the ROC curve
+    '''
+    if score not in df_det.columns:
+        raise ValueError(f"'{score}' not in the columns of df_det")
+
+    vec_ref = presence_vector(df_ref, begin_date, end_date, timebin)
+    ranks, n_bins = _window_ranks(df_det, begin_date, end_date, timebin)
+    kept = (ranks >= 0) & df_det[score].notna().to_numpy()
+    bin_scores = pd.Series(df_det[score].to_numpy(dtype=float)[kept]).groupby(ranks[kept]).max()
+
+    # timebins by decreasing score, cumulative true/false positives
+    order = np.argsort(-bin_scores.to_numpy(), kind='stable')
+    sorted_scores = bin_scores.to_numpy()[order]
+    hits = vec_ref[bin_scores.index.to_numpy()[order]]
+    cum_true_pos = np.concatenate([[0], np.cumsum(hits, dtype=np.int64)])
+    cum_false_pos = np.concatenate([[0], np.cumsum(~hits, dtype=np.int64)])
+
+    if thresholds is None:
+        thresholds = np.unique(sorted_scores)[::-1]
+    thresholds = np.asarray(thresholds, dtype=float)
+    # number of timebins with a score >= threshold
+    n_pos = np.searchsorted(-sorted_scores, -thresholds, side='right')
+
+    n_ref = int(np.count_nonzero(vec_ref))
+    results = pd.DataFrame({'threshold': thresholds, 'true_pos': cum_true_pos[n_pos], 'false_pos': cum_false_pos[n_pos]})
+    results['false_neg'] = n_ref - results['true_pos']
+    results['true_neg'] = n_bins - n_ref - results['false_pos']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['precision'] = results['true_pos'] / (results['true_pos'] + results['false_pos'])
+        results['recall'] = results['true_pos'] / n_ref if n_ref > 0 else np.nan
+        results['f_score'] = 2 * results['precision'] * results['recall'] / (results['precision'] + results['recall'])
+        results['fpr'] = results['false_pos'] / (n_bins - n_ref) if n_bins > n_ref else np.nan
+
+    return results.sort_values('threshold', ascending=False, ignore_index=True)
@@ -0,0 +1,201 @@
+import io
+import os
+import json
+import pytz
+import numpy as np
+import pandas as pd
+from utilities.detection_reader import read_detections
+from utilities.detection_cache import cache_path, file_hash, file_signature
+from utilities.aplose_datetime import to_epoch_ns, tz_offset_minutes, to_datetime_series
+
+# time resolutions of the pyramid in seconds, each one must be a multiple of the previous one
+LEVELS = [10, 60, 600, 3600, 86400]
+
+# version of the layout of the cached pyramids
+PYRAMID_VERSION = 2
+
+
+def build_presence_pyramid(df: pd.DataFrame, levels: list = None, tz=None) -> dict:
+    ''' Computes the presence/absence of detections at several time resolutions in a single pass :
+    the detections are binned once at the finest resolution and each coarser level is derived from the previous one
+    by OR-reduction, per annotator and label.
+    The bins are aligned on the local time of each detection, so the hours and days stay aligned on the local midnight across DST changes
+        Parameters :
+            df : APLOSE formatted detection DataFrame (raw detections or already reshaped to a timebin finer than levels[0])
+            levels : list of the time resolutions in seconds, LEVELS by default
+            tz : timezone of the bins, by default the timezone of the detections
+        Returns :
+            pyramid : dict with keys
+                'levels' : list of the time resolutions
+                'tz' : timezone of the bins, None if the detections have mixed UTC offsets (the offset of each bin is then kept)
+                'offset' : UTC offset of the first detection (minutes)
+                'dataset' : dataset of the detections
+                'max_freq' : maximum end_frequency of the detections
+                'bins' : dict {timebin: DataFrame with columns annotator/annotation/bin/offset}, bin being the index of the timebin since the local epoch
+                         and offset the UTC offset (minutes) of its first detection
+    '''
+    levels = LEVELS if levels is None else sorted(int(res) for res in levels)
+    if any(coarse % fine != 0 for fine, coarse in zip(levels[:-1], levels[1:])):
+        raise ValueError(f'levels={levels}: each time resolution must be a multiple of the previous one')
+
+    ns, offset = to_epoch_ns(df['start_datetime'])
+    if tz is None:
+        tz = df['start_datetime'].dt.tz if isinstance(df['start_datetime'].dtype, pd.DatetimeTZDtype) else None
+    elif len(ns):
+        offset = tz_offset_minutes(ns, tz)
+
+    # the grid is the one of the local time of each detection, as with a DST timezone the offset changes between the detections
+    order = np.argsort(ns, kind='stable')
+    local_ns = ns[order] + offset[order] * 60 * 10**9
+
+    bins = {}
+    level = pd.DataFrame({'annotator': df['annotator'].to_numpy()[order], 'annotation': df['annotation'].to_numpy()[order],
+                          'bin': local_ns // (levels[0] * 10**9), 'offset': np.asarray(offset, dtype=np.int64)[order]})
+    previous = levels[0]
+    for res in levels:
+        level = level.assign(bin=level['bin'] // (res // previous)).drop_duplicates(['annotator', 'annotation', 'bin'], ignore_index=True)
+        bins[res] = level
+        previous = res
+
+    return {'levels': levels,
+            'tz': tz,
+            'offset': int(offset[order[0]]) if len(ns) else 0,
+            'dataset': df['dataset'].iloc[0] if len(df) else None,
+            'max_freq': int(df['end_frequency'].max()) if len(df) else 0,
+            'bins': bins}
+
+
+def pyramid_level(pyramid: dict, timebin: int, annotator: str = None, annotation: str = None) -> pd.DataFrame:
+    ''' Detection DataFrame of a level of a presence pyramid, same layout as the output of reshape_timebin
+    The filename of the timebins is not kept in the pyramid and is set to NaN
+        Parameters :
+            pyramid : presence pyramid, see build_presence_pyramid
+            timebin : time resolution in seconds, one of pyramid['levels']
+            annotator : string to be specified if the user wants to select the detection of a particular annotator
+            annotation : string to be specified if the user wants to select the detection of a particular label
+        Returns :
+            df : detection DataFrame sorted by start_datetime
+    '''
+    if timebin not in pyramid['bins']:
+        raise ValueError(f'timebin={timebin}: not a level of the pyramid {pyramid["levels"]}')
+
+    level = pyramid['bins'][timebin]
+    if annotator is not None:
+        level = level[level['annotator'] == annotator]
+    if annotation is not None:
+        level = level[level['annotation'] == annotation]
+
+    offset = level['offset'].to_numpy()
+    start_ns = level['bin'].to_numpy() * timebin * 10**9 - offset * 60 * 10**9
+    start_datetime = to_datetime_series(start_ns, offset, tz=pyramid['tz'])
+
+    df = pd.DataFrame({'dataset': pyramid['dataset'],
+                       'filename': np.nan,
+                       'start_time': 0,
+                       'end_time': timebin,
+                       'start_frequency': 0,
+                       'end_frequency': pyramid['max_freq'],
+                       'annotation': level['annotation'].to_numpy(),
+                       'annotator': level['annotator'].to_numpy(),
+                       'start_datetime': start_datetime,
+                       'end_datetime': start_datetime + pd.Timedelta(seconds=timebin)})
+
+    return df.sort_values('start_datetime', kind='mergesort').reset_index(drop=True)
+
+
+def _write_tz(tz):
+    # name of a timezone (ex : 'Europe/Paris'), or UTC offset in minutes of a fixed offset timezone
+    name = getattr(tz, 'zone', None) or getattr(tz, 'key', None)
+    return name if name else int(tz.utcoffset(None).total_seconds() // 60)
+
+
+def _read_tz(value):
+    return pytz.timezone(value) if isinstance(value, str) else pytz.FixedOffset(value)
+
+
+def _pyramid_key(file: str, levels: list, tz) -> dict:
+    return {'levels': levels, 'tz': None if tz is None else str(tz), 'pyramid_version': PYRAMID_VERSION, **file_signature(file)}
+
+
+def read_pyramid_cache(file: str, levels: list = None, tz=None, cache_dir: str = None) -> dict:
+    ''' Loads the presence pyramid of a detection file stored alongside its detection cache entry
+        Parameters :
+            file : path to the detection file
+            levels : list of the time resolutions in seconds, LEVELS by default
+            tz : timezone of the bins, None for the timezone of the detections
+            cache_dir : directory of the cache, CACHE_DIR by default
+        Returns :
+            pyramid : presence pyramid, None if there is no valid entry
+    '''
+    levels = LEVELS if levels is None else sorted(int(res) for res in levels)
+    path = cache_path(file, cache_dir) + '.pyramid.npz'
+    if not os.path.exists(path):
+        return None
+
+    with np.load(path, allow_pickle=False) as content:
+        metadata = json.loads(str(content['metadata']))
+        key = _pyramid_key(file, levels, tz)
+        if any(metadata.get(k) != v for k, v in key.items() if k != 'mtime_ns'):
+            return None
+        if metadata.get('mtime_ns') != key['mtime_ns'] and metadata.get('sha1') != file_hash(file):
+            return None
+
+        bins = {res: pd.DataFrame({'annotator': content[f'annotator_{res}'], 'annotation': content[f'annotation_{res}'], 'bin': content[f'bin_{res}'],
+                                   'offset': content[f'offset_{res}']}) for res in levels}
+
+    if tz is None:
+        tz = metadata['bins_tz'] if metadata['bins_tz'] is None else _read_tz(metadata['bins_tz'])
+    return {'levels': levels, 'tz': tz, 'offset': metadata['offset'],
+            'dataset': metadata['dataset'], 'max_freq': metadata['max_freq'], 'bins': bins}
+
+
+def write_pyramid_cache(file: str, pyramid: dict, tz=None, cache_dir: str = None):
+    ''' Stores the presence pyramid of a detection file alongside its detection cache entry
+        Parameters :
+            file : path to the detection file the pyramid is computed from
+            pyramid : presence pyramid, see build_presence_pyramid
+            tz : timezone given to build_presence_pyramid, None if the timezone of the detections was used
+            cache_dir : directory of the cache, CACHE_DIR by default
+    '''
+    path = cache_path(file, cache_dir) + '.pyramid.npz'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    metadata = _pyramid_key(file, pyramid['levels'], tz)
+    metadata.update({'sha1': file_hash(file), 'offset': pyramid['offset'], 'dataset': pyramid['dataset'], 'max_freq': pyramid['max_freq'],
+                     'bins_tz': None if pyramid['tz'] is None else _write_tz(pyramid['tz'])})
+    arrays = {'metadata': np.array(json.dumps(metadata))}
+    for res, level in pyramid['bins'].items():
+        arrays[f'annotator_{res}'] = level['annotator'].to_numpy(dtype=str)
+        arrays[f'annotation_{res}'] = level['annotation'].to_numpy(dtype=str)
+        arrays[f'bin_{res}'] = level['bin'].to_numpy(dtype=np.int64)
+        arrays[f'offset_{res}'] = level['offset'].to_numpy(dtype=np.int64)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp, path)
+
+
+def load_presence_pyramid(file: str, levels: list = None, tz=None, cache: bool = True) -> dict:
+    ''' Presence pyramid of all the detections of an APLOSE formatted file, read from the cache if possible
+        Parameters :
+            file : path to the detection file
+            levels : list of the time resolutions in seconds, LEVELS by default
+            tz : timezone of the bins, by default the timezone of the detections
+            cache : if set to True, the pyramid is read from/written to the cache directory (see detection_cache.py)
+        Returns :
+            pyramid : presence pyramid, see build_presence_pyramid
+    '''
+    if cache:
+        pyramid = read_pyramid_cache(file, levels=levels, tz=tz)
+        if pyramid is not None:
+            return pyramid
+
+    df = read_detections(file, cache=cache)[0]
+    pyramid = build_presence_pyramid(df, levels=levels, tz=tz)
+    if cache:
+        write_pyramid_cache(file, pyramid, tz=tz)
+
+    return pyramid
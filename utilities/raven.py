@@ -0,0 +1,414 @@
+import os
+import hashlib
+from typing import List
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from utilities.aplose_datetime import to_datetime_series, to_epoch_ns, format_aplose_datetime, tz_offset_minutes
+from utilities.wav_index import file_start_times, file_index
+from utilities.detection_reader import find_delimiter
+
+# columns needed to import a Raven selection table, datetime format of its Begin Date Time column
+RAVEN_REQUIRED_COLUMNS = ['Begin Time (s)', 'End Time (s)', 'Low Freq (Hz)', 'High Freq (Hz)']
+RAVEN_DATETIME_FORMAT = '%Y/%m/%d %H:%M:%S.%f'
+
+RAVEN_COLUMNS = ['Selection', 'View', 'Channel', 'Begin Time (s)', 'End Time (s)', 'Low Freq (Hz)', 'High Freq (Hz)']
+
+# number of selections generated at once by the iter_* functions
+CHUNKSIZE = 100000
+
+# offset tables of the datasets already exported, per content of the wav tuple
+_OFFSET_TABLES = {}
+
+
+def raven_offsets(tuple_info) -> pd.DataFrame:
+    ''' Offset table of a dataset opened in Raven : Raven concatenates the wav files, so the time of a selection is counted
+    from the beginning of the first file without the gaps between the files. The table is built once per dataset and cached
+        Parameters :
+            tuple_info : tuple (filenames, datetimes, durations) of the wav files, sorted by datetime
+        Returns :
+            table : DataFrame indexed by the filenames, with columns
+                start : POSIX timestamp of the beginning of the file in seconds
+                duration : duration of the file in seconds
+                offset : cumulated offset between the files introduced by Raven, in seconds (offsets_cumsum)
+                position : beginning of the file in the Raven timeline, in seconds
+    '''
+    filenames = np.asarray(tuple_info[0], dtype=object)
+    datetimes = list(tuple_info[1])
+    durations = np.asarray(tuple_info[2], dtype=np.float64)
+    if not (len(filenames) == len(datetimes) == len(durations)):
+        raise ValueError('tuple_info: the filenames, datetimes and durations must have the same length')
+    if not len(filenames):
+        raise ValueError('tuple_info: no wav file')
+
+    # the datetimes being read from the filenames, a dataset is identified by its files, durations and first/last datetimes
+    bounds_ns = np.array([pd.Timestamp(datetimes[i]).value for i in [0, -1]], dtype=np.int64)
+    key = hashlib.sha1('\n'.join(map(str, filenames)).encode() + durations.tobytes() + bounds_ns.tobytes()).hexdigest()
+    if key not in _OFFSET_TABLES:
+        starts_ns = pd.DatetimeIndex(pd.to_datetime(datetimes, utc=True)).asi8
+        position = np.concatenate([[0], np.cumsum(durations[:-1])])
+        starts = starts_ns / 1e9
+        table = pd.DataFrame({'start': starts, 'duration': durations, 'offset': position - (starts_ns - starts_ns[0]) / 1e9, 'position': position},
+                             index=pd.Index(filenames, name='filename'))
+        utc_offset = pd.Timestamp(datetimes[0]).utcoffset()
+        table.attrs['utc_offset'] = 0 if utc_offset is None else int(utc_offset.total_seconds())
+        _OFFSET_TABLES[key] = table
+    return _OFFSET_TABLES[key]
+
+
+def selection_table(begin, end, low, high) -> pd.DataFrame:
+    ''' Raven formatted selection table
+        Parameters :
+            begin, end : arrays of the beginning/end of the selections in the Raven timeline, in seconds
+            low, high : scalars or arrays of the low/high frequency of the selections, in Hz
+        Returns :
+            df : DataFrame with the columns of a Raven selection table
+    '''
+    n = len(begin)
+    return pd.DataFrame({'Selection': np.arange(1, n + 1), 'View': np.ones(n, dtype=int), 'Channel': np.ones(n, dtype=int),
+                         'Begin Time (s)': np.asarray(begin), 'End Time (s)': np.asarray(end),
+                         'Low Freq (Hz)': np.broadcast_to(low, n), 'High Freq (Hz)': np.broadcast_to(high, n)})[RAVEN_COLUMNS]
+
+
+def file_rows(table: pd.DataFrame, filenames) -> np.ndarray:
+    ''' Row of the offset table of each filename, with a single hash lookup per filename
+        Parameters :
+            table : offset table (see raven_offsets)
+            filenames : filenames of the detections
+        Returns :
+            rows : int array of the rows of table
+    '''
+    rows = table.index.get_indexer(filenames)
+    if np.any(rows < 0):
+        raise ValueError(f'{np.asarray(filenames)[rows < 0][0]}: file not found in the wav files')
+    return rows
+
+
+def raven_times(table: pd.DataFrame, timestamps) -> np.ndarray:
+    ''' Times of the Raven timeline of POSIX timestamps, each timestamp belonging to the last file starting before it
+        Parameters :
+            table : offset table (see raven_offsets)
+            timestamps : array of POSIX timestamps in seconds
+        Returns :
+            times : array of the corresponding times in the Raven timeline, in seconds
+    '''
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    starts = table['start'].to_numpy()
+    rows = np.maximum(np.searchsorted(starts, timestamps, side='right') - 1, 0)
+    return timestamps - starts[rows] + table['position'].to_numpy()[rows]
+
+
+def _selection_chunk(table: pd.DataFrame, begin: np.ndarray, end: np.ndarray, low, high, rows: np.ndarray = None) -> pd.DataFrame:
+    # selections with the file containing their beginning, found in the Raven timeline if rows is None
+    position = table['position'].to_numpy()
+    if rows is None:
+        rows = np.maximum(np.searchsorted(position, begin, side='right') - 1, 0)
+    n = len(begin)
+    return pd.DataFrame({'Begin Time (s)': begin, 'End Time (s)': end, 'Low Freq (Hz)': np.broadcast_to(low, n), 'High Freq (Hz)': np.broadcast_to(high, n),
+                         'Begin File': table.index.to_numpy()[rows], 'File Offset (s)': begin - position[rows]})
+
+
+def _collect(chunks) -> pd.DataFrame:
+    # single selection table of chunks of selections
+    chunks = list(chunks)
+    if not chunks:
+        return selection_table(np.zeros(0, dtype=int), np.zeros(0, dtype=int), 0, 0)
+    df = pd.concat(chunks, ignore_index=True)
+    return selection_table(df['Begin Time (s)'].to_numpy(), df['End Time (s)'].to_numpy(), df['Low Freq (Hz)'].to_numpy(), df['High Freq (Hz)'].to_numpy())
+
+
+def iter_timebin_selections(table: pd.DataFrame, timebin: int, bin_height: float, df: pd.DataFrame = None, origin: float = None, chunksize: int = CHUNKSIZE):
+    ''' Regular timebins of the Raven timeline, all of them or only the ones containing the beginning of a detection,
+    generated by chunks so that the whole grid of timebins of a deployment is never held in memory
+        Parameters :
+            table : offset table (see raven_offsets)
+            timebin : duration of the timebins in seconds
+            bin_height : high frequency of the selections in Hz
+            df : APLOSE formatted DataFrame of the detections, if None all the timebins are exported
+            origin : POSIX timestamp of the first timebin, by default the beginning of the first file floored to a multiple of timebin in local time
+            chunksize : number of timebins processed at once
+        Yields :
+            chunk : DataFrame of selections, columns Begin Time (s)/End Time (s)/Low Freq (Hz)/High Freq (Hz)/Begin File/File Offset (s)
+    '''
+    first, end = table['start'].iloc[0], table['start'].iloc[-1] + table['duration'].iloc[-1]
+    origin = first - (first + table.attrs.get('utc_offset', 0)) % timebin if origin is None else origin
+    n_bins = max(int(np.ceil((end - origin) / timebin)) - 1, 0)
+
+    if df is not None:
+        # timebin of the beginning of each detection in the Raven timeline, by integer division of nanoseconds
+        start_ns = pd.to_datetime(df['start_datetime'], utc=True).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        offset_ns = np.round(table['offset'].to_numpy()[file_rows(table, df['filename'])] * 1e9).astype(np.int64)
+        ranks = (start_ns + offset_ns + 10 * timebin - int(origin) * 10**9) // (int(timebin) * 10**9)
+        ranks = np.unique(ranks[(ranks >= 0) & (ranks < n_bins)])
+
+    for i in range(0, n_bins, chunksize):
+        index = np.arange(i, min(i + chunksize, n_bins))
+        if df is not None:
+            index = ranks[np.searchsorted(ranks, index[0]):np.searchsorted(ranks, index[-1], side='right')]
+            if not len(index):
+                continue
+        begin = ((origin + index * timebin).astype(int) - first).astype(int)
+        yield _selection_chunk(table, begin, ((origin + (index + 1) * timebin).astype(int) - first).astype(int), 0, bin_height)
+
+
+def iter_vector_selections(table: pd.DataFrame, timestamps, timebin: int, bin_height: float, selection_vec=None, chunksize: int = CHUNKSIZE):
+    ''' Timebins of a time vector (ex : the time vector of the double check), all of them or the selected ones, generated by chunks
+        Parameters :
+            table : offset table (see raven_offsets)
+            timestamps : array of the POSIX timestamps of the beginning of the timebins
+            timebin : duration of the timebins in seconds
+            bin_height : high frequency of the selections in Hz
+            selection_vec : vector of 0/1 of the same length as timestamps, only the timebins set to 1 are exported, all the timebins if None
+            chunksize : number of timebins processed at once
+        Yields :
+            chunk : DataFrame of selections, see iter_timebin_selections
+    '''
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if selection_vec is not None:
+        timestamps = timestamps[np.asarray(selection_vec).astype(bool)]
+
+    starts = table['start'].to_numpy()
+    for i in range(0, len(timestamps), chunksize):
+        ts = timestamps[i:i + chunksize]
+        rows = np.maximum(np.searchsorted(starts, ts, side='right') - 1, 0)
+        begin = ts - starts[rows] + table['position'].to_numpy()[rows]
+        yield _selection_chunk(table, begin, begin + timebin, 0, bin_height, rows=rows)
+
+
+def iter_detection_selections(table: pd.DataFrame, df: pd.DataFrame, chunksize: int = CHUNKSIZE):
+    ''' Original boxes of the detections, generated by chunks
+        Parameters :
+            table : offset table (see raven_offsets)
+            df : APLOSE formatted DataFrame of the detections
+            chunksize : number of detections processed at once
+        Yields :
+            chunk : DataFrame of selections, see iter_timebin_selections
+    '''
+    position = table['position'].to_numpy()
+    for i in range(0, len(df), chunksize):
+        df_chunk = df.iloc[i:i + chunksize]
+        rows = file_rows(table, df_chunk['filename'])
+        yield _selection_chunk(table, df_chunk['start_time'].to_numpy() + position[rows], df_chunk['end_time'].to_numpy() + position[rows],
+                               df_chunk['start_frequency'].to_numpy(), df_chunk['end_frequency'].to_numpy(), rows=rows)
+
+
+def timebin_selections(table: pd.DataFrame, timebin: int, bin_height: float, df: pd.DataFrame = None, origin: float = None) -> pd.DataFrame:
+    ''' Single selection table of iter_timebin_selections
+        Returns :
+            df_raven : Raven formatted selection table
+    '''
+    return _collect(iter_timebin_selections(table, timebin, bin_height, df=df, origin=origin))
+
+
+def vector_selections(table: pd.DataFrame, timestamps, timebin: int, bin_height: float, selection_vec=None) -> pd.DataFrame:
+    ''' Single selection table of iter_vector_selections
+        Returns :
+            df_raven : Raven formatted selection table
+    '''
+    return _collect(iter_vector_selections(table, timestamps, timebin, bin_height, selection_vec=selection_vec))
+
+
+def detection_selections(table: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    ''' Single selection table of iter_detection_selections
+        Returns :
+            df_raven : Raven formatted selection table
+    '''
+    return _collect(iter_detection_selections(table, df))
+
+
+def _output_name(file: str, suffix: str) -> str:
+    root, ext = os.path.splitext(file)
+    return f'{root}_{suffix}{ext or ".txt"}'
+
+
+def write_selections(table: pd.DataFrame, chunks, file: str, split: str = None) -> List[str]:
+    ''' Writes chunks of selections to Raven selection tables without holding the whole table in memory,
+    in a single table or in one table per wav file or per day. The files are replaced atomically once all the chunks are written
+        Parameters :
+            table : offset table (see raven_offsets)
+            chunks : iterable of chunks of selections (see iter_timebin_selections, iter_vector_selections, iter_detection_selections)
+            file : path to the output table (.txt), the wav filename or the date is appended to it if the output is split
+            split : None for a single table, 'file' for one table per wav file, 'day' for one table per day (local time of the wav files),
+                    the times of a split table are counted from the beginning of its first file
+        Returns :
+            files : list of the paths to the written tables
+    '''
+    if split not in [None, 'file', 'day']:
+        raise ValueError(f"split='{split}': must be None, 'file' or 'day'")
+
+    position = table['position'].to_numpy()
+    days = (table['start'].to_numpy() + table.attrs.get('utc_offset', 0)) // 86400
+    # path and row of the first file of each output table, number of selections written to each output table
+    outputs, counts = {}, {}
+
+    try:
+        for chunk in chunks:
+            rows = table.index.get_indexer(chunk['Begin File'])
+            if split == 'file':
+                keys = rows
+            elif split == 'day':
+                keys = days[rows]
+            else:
+                keys = np.zeros(len(chunk), dtype=np.int64)
+
+            for key, df in chunk.groupby(keys, sort=False):
+                if key not in outputs:
+                    if split == 'file':
+                        outputs[key] = (_output_name(file, os.path.splitext(table.index[key])[0]), key)
+                    elif split == 'day':
+                        outputs[key] = (_output_name(file, pd.Timestamp(int(key) * 86400, unit='s').strftime('%Y%m%d')), np.searchsorted(days, key))
+                    else:
+                        outputs[key] = (file, 0)
+                    counts[key] = 0
+                output, row = outputs[key]
+
+                df = df.assign(**{'Begin Time (s)': df['Begin Time (s)'] - position[row], 'End Time (s)': df['End Time (s)'] - position[row]})
+                df.insert(0, 'Selection', np.arange(counts[key] + 1, counts[key] + len(df) + 1))
+                df.insert(1, 'View', 1)
+                df.insert(2, 'Channel', 1)
+                df.to_csv(f'{output}.tmp', mode='a' if counts[key] else 'w', header=not counts[key], index=False, sep='\t')
+                counts[key] += len(df)
+
+        if split is None and not outputs:
+            outputs[0] = (file, 0)
+            pd.DataFrame(columns=RAVEN_COLUMNS + ['Begin File', 'File Offset (s)']).to_csv(f'{file}.tmp', index=False, sep='\t')
+    except BaseException:
+        # the partial tables are removed, the existing tables are left untouched
+        for output, _ in outputs.values():
+            if os.path.exists(f'{output}.tmp'):
+                os.remove(f'{output}.tmp')
+        raise
+
+    for output, _ in outputs.values():
+        os.replace(f'{output}.tmp', output)
+    return [output for output, _ in outputs.values()]
+
+
+def read_raven_table(file: str) -> pd.DataFrame:
+    ''' Reads a Raven selection table and checks its columns, the rows of the other views of a selection
+    (ex : Waveform 1 when Spectrogram 1 is also exported) are dropped
+        Parameters :
+            file : path to the selection table (.txt tab separated, or csv with ';' or ',' as delimiter)
+        Returns :
+            df : DataFrame with one row per selection
+    '''
+    df = pd.read_csv(file, sep=find_delimiter(file, delimiters='\t;,'))
+
+    missing = [c for c in RAVEN_REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f'{file}: missing Raven columns {missing}')
+
+    if 'Selection' in df.columns:
+        df = df.drop_duplicates('Selection', keep='first')
+    return df.reset_index(drop=True)
+
+
+def raven2aplose(df: pd.DataFrame, tz, dataset: str, annotator: str, annotation: str = None, label_column: str = None, reject_column: str = None,
+                 table: pd.DataFrame = None) -> pd.DataFrame:
+    ''' Converts a Raven selection table to an APLOSE formatted detection DataFrame, same format as the output of read_detections.
+    The datetimes are computed from the Begin File and File Offset (s) columns if present, from the Begin Date Time column otherwise,
+    from the Begin Time (s) column and the offset table of the wav files if there is none of them (ex : tables exported by export2Raven).
+    The filename of a selection is its wav file if known (Begin File or offset table), NaN otherwise as for FPOD detections
+        Parameters :
+            df : Raven selection table (see read_raven_table)
+            tz : timezone of the Begin Date Time column and of the datetimes written in the wav filenames
+            dataset : name of the dataset
+            annotator : name of the annotator of the detections (ex : 'PG double check')
+            annotation : label of the detections, used if label_column is None
+            label_column : column of the table containing the label of each selection
+            reject_column : column filled during the double check for the rejected selections (ex : 'Double_Check'), these selections are dropped
+            table : offset table of the wav files opened in Raven (see raven_offsets)
+        Returns :
+            df_aplose : APLOSE formatted DataFrame, sorted by start_datetime
+    '''
+    if (annotation is None) == (label_column is None):
+        raise ValueError('either annotation or label_column must be specified')
+    missing = [c for c in [label_column, reject_column] if c is not None and c not in df.columns]
+    if missing:
+        raise ValueError(f'missing columns {missing} in the Raven table')
+    if reject_column is not None:
+        df = df[df[reject_column].isna()]
+    if label_column is not None and df[label_column].isna().any():
+        raise ValueError(f"'{label_column}': {df[label_column].isna().sum()} selections without label")
+
+    duration = (df['End Time (s)'] - df['Begin Time (s)']).to_numpy(dtype=np.float64)
+    if {'Begin File', 'File Offset (s)'}.issubset(df.columns):
+        filenames = df['Begin File'].astype(str).map(os.path.basename).to_numpy(dtype=object)
+        start_time = df['File Offset (s)'].to_numpy(dtype=np.float64)
+        start_ns = file_start_times(filenames, tz) + np.round(start_time * 1e9).astype(np.int64)
+    elif 'Begin Date Time' in df.columns or table is not None:
+        if 'Begin Date Time' in df.columns:
+            naive = pd.to_datetime(df['Begin Date Time'], format=RAVEN_DATETIME_FORMAT)
+            start_ns = pd.DatetimeIndex(naive).tz_localize(tz).asi8
+        if table is None:
+            filenames = np.full(len(df), np.nan, dtype=object)
+            start_time = np.zeros(len(df))
+        else:
+            # wav file of each selection : the file containing its datetime, or its position in the Raven timeline
+            files_ns = np.round(table['start'].to_numpy() * 1e6).astype(np.int64) * 1000
+            if 'Begin Date Time' in df.columns:
+                rows = file_index(start_ns, files_ns)
+                start_time = (start_ns - files_ns[rows]) / 1e9
+            else:
+                begin = df['Begin Time (s)'].to_numpy(dtype=np.float64)
+                rows = np.maximum(np.searchsorted(table['position'].to_numpy(), begin, side='right') - 1, 0)
+                start_time = begin - table['position'].to_numpy()[rows]
+                start_ns = files_ns[rows] + np.round(start_time * 1e9).astype(np.int64)
+            filenames = table.index.to_numpy(dtype=object)[rows]
+    else:
+        raise ValueError("missing columns 'Begin Date Time' or 'Begin File'/'File Offset (s)' in the Raven table, and no offset table")
+    end_ns = start_ns + np.round(duration * 1e9).astype(np.int64)
+
+    df_aplose = pd.DataFrame({'dataset': dataset, 'filename': filenames, 'start_time': start_time, 'end_time': start_time + duration,
+                              'start_frequency': df['Low Freq (Hz)'].to_numpy(), 'end_frequency': df['High Freq (Hz)'].to_numpy(),
+                              'annotation': annotation if label_column is None else df[label_column].to_numpy(), 'annotator': annotator,
+                              'start_datetime': to_datetime_series(start_ns, tz_offset_minutes(start_ns, tz)),
+                              'end_datetime': to_datetime_series(end_ns, tz_offset_minutes(end_ns, tz))})
+    return df_aplose.sort_values('start_datetime', kind='mergesort').reset_index(drop=True)
+
+
+def _raven2aplose_args(args: dict) -> pd.DataFrame:
+    args = dict(args)
+    file = args.pop('file')
+    return raven2aplose(read_raven_table(file), **args)
+
+
+def import_raven_tables(files: List[str], tz, dataset: str, annotator: str, annotation: str = None, label_column: str = None, reject_column: str = None,
+                        table: pd.DataFrame = None, n_workers: int = None) -> pd.DataFrame:
+    ''' Imports several Raven selection tables (ex : the tables of a double check campaign) as a single APLOSE formatted detection DataFrame,
+    the tables are read and converted in parallel. Same arguments as raven2aplose
+        Parameters :
+            files : list of paths to the selection tables
+            n_workers : number of processes, by default one per table up to the number of CPUs, if set to 1 the tables are read sequentially
+        Returns :
+            df_aplose : APLOSE formatted DataFrame of all the tables, sorted by start_datetime, empty if no table is given
+    '''
+    if isinstance(files, str):
+        files = [files]
+    if not files:
+        return pd.DataFrame(columns=['dataset', 'filename', 'start_time', 'end_time', 'start_frequency', 'end_frequency', 'annotation', 'annotator',
+                                     'start_datetime', 'end_datetime'])
+    if n_workers is None:
+        n_workers = min(len(files), os.cpu_count() or 1)
+
+    args = [{'file': file, 'tz': tz, 'dataset': dataset, 'annotator': annotator, 'annotation': annotation, 'label_column': label_column,
+             'reject_column': reject_column, 'table': table} for file in files]
+    if n_workers <= 1:
+        results = [_raven2aplose_args(arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_raven2aplose_args, args))
+
+    return pd.concat(results, ignore_index=True).sort_values('start_datetime', kind='mergesort').reset_index(drop=True)
+
+
+def write_aplose(df: pd.DataFrame, file: str):
+    ''' Writes an APLOSE formatted detection DataFrame to a csv file readable by sorting_detections
+        Parameters :
+            df : APLOSE formatted DataFrame (see raven2aplose)
+            file : path to the csv file
+    '''
+    df = df.copy()
+    for column in ['start_datetime', 'end_datetime']:
+        df[column] = format_aplose_datetime(*to_epoch_ns(df[column]))
+    df.to_csv(file, index=False)
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from utilities.aplose_datetime import tz_offset_minutes
+
+
+def window_ids(time_vector_ts, duration: int, tz=None) -> np.ndarray:
+    ''' Index of the window of each timestamp, the windows of duration seconds being aligned on the local time (ex : hours, days)
+        Parameters :
+            time_vector_ts : list/array of POSIX timestamps in seconds
+            duration : duration of the windows in seconds (3600 for hours, 86400 for days)
+            tz : timezone of the local time, UTC by default
+        Returns :
+            ids : int64 array, number of windows since 1970-01-01 local time
+    '''
+    ts = np.asarray(time_vector_ts, dtype=np.float64)
+    local = np.floor(ts).astype(np.int64)
+    if tz is not None:
+        local += tz_offset_minutes(local * 10**9, tz) * 60
+    return local // int(duration)
+
+
+def window_counts(ids: np.ndarray, vec) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    ''' Number of timebins and of positive timebins of each window, from the prefix sums of the presence vector
+        Parameters :
+            ids : window index of each timebin (see window_ids)
+            vec : vector of 0/1 representing the absence/presence of a detection in each timebin
+        Returns :
+            windows : sorted array of the window indexes
+            order : positions of the timebins sorted by window (stable)
+            bounds : array of length len(windows) + 1, the timebins of window i are order[bounds[i]:bounds[i + 1]]
+            n_pos : number of positive timebins of each window
+    '''
+    order = np.arange(len(ids)) if np.all(ids[1:] >= ids[:-1]) else np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(sorted_ids)) + 1, [len(ids)]])
+    cumsum = np.concatenate([[0], np.cumsum(np.asarray(vec, dtype=np.int64)[order])])
+    return sorted_ids[bounds[:-1]], order, bounds, cumsum[bounds[1:]] - cumsum[bounds[:-1]]
+
+
+def constrained_draw(n_bins: np.ndarray, n_pos: np.ndarray, n_windows: int, target_rate: float, tolerance: float = 0.25, rng=None) -> (np.ndarray, bool):
+    ''' Random selection of n_windows windows whose overall positive rate is within a tolerance of a target rate, in one pass :
+    the windows above and below the target rate are shuffled separately and the selection is made of the first k windows above
+    and the first n_windows - k windows below, k giving the rate closest to the target. If it is still out of the tolerance,
+    a window of the selection is replaced by the first other window (in random order) bringing the selection within the tolerance
+        Parameters :
+            n_bins : number of timebins of each candidate window
+            n_pos : number of positive timebins of each candidate window
+            n_windows : number of windows to select
+            target_rate : target proportion of positive timebins of the selection
+            tolerance : maximum relative difference between the positive rate of the selection and target_rate, None for no constraint
+            rng : numpy random Generator
+        Returns :
+            selected : sorted indexes of the selected windows
+            found : False if no selection meets the constraint, the selection closest to the target rate is then returned
+    '''
+    rng = np.random.default_rng() if rng is None else rng
+    if n_windows > len(n_bins):
+        raise ValueError(f'n_windows={n_windows}: only {len(n_bins)} windows available')
+    if tolerance is None or n_windows == 0:
+        return np.sort(rng.choice(len(n_bins), size=n_windows, replace=False)), True
+
+    high = rng.permutation(np.flatnonzero(n_pos > target_rate * n_bins))
+    low = rng.permutation(np.flatnonzero(n_pos <= target_rate * n_bins))
+    # positive rate of the selections made of the first k windows above and the first n_windows - k windows below the target rate
+    k = np.arange(max(0, n_windows - len(low)), min(n_windows, len(high)) + 1)
+    high_pos = np.concatenate([[0], np.cumsum(n_pos[high[:k[-1]]])])
+    high_bins = np.concatenate([[0], np.cumsum(n_bins[high[:k[-1]]])])
+    low_pos = np.concatenate([[0], np.cumsum(n_pos[low[:n_windows - k[0]]])])
+    low_bins = np.concatenate([[0], np.cumsum(n_bins[low[:n_windows - k[0]]])])
+    error = np.abs((high_pos[k] + low_pos[n_windows - k]) / (high_bins[k] + low_bins[n_windows - k]) - target_rate)
+    best = k[np.argmin(error)]
+    selected = np.concatenate([high[:best], low[:n_windows - best]])
+    if error.min() <= tolerance * target_rate:
+        return np.sort(selected), True
+
+    # replacement of one window, the windows being tried in random order until the selection meets the constraint
+    closest = (np.inf, selected)
+    for i in rng.permutation(n_windows):
+        kept = np.delete(selected, i)
+        others = rng.permutation(np.setdiff1d(np.arange(len(n_bins)), kept))
+        error = np.abs((n_pos[kept].sum() + n_pos[others]) / (n_bins[kept].sum() + n_bins[others]) - target_rate)
+        valid = np.flatnonzero(error <= tolerance * target_rate)
+        if len(valid):
+            return np.sort(np.append(kept, others[valid[0]])), True
+        if error.min() < closest[0]:
+            closest = (error.min(), np.append(kept, others[np.argmin(error)]))
+    return np.sort(closest[1]), False
+
+
+def sample_windows(time_vector_ts, time_vector_str, vec, n_windows: int, duration: int = 3600, tz=None, target_rate: float = None, tolerance: float = 0.25,
+                   min_bins: int = None, seed: int = None) -> (list, list, list, list):
+    ''' Randomly selects n non-overlapping windows (hours, days...) of a time vector with a positive rate close to a target rate,
+    replaces the repeated calls to n_random_hour until the positive rate of the selection is close enough to the global one
+        Parameters :
+            time_vector_ts : list/array of POSIX timestamps of the timebins
+            time_vector_str : list of strings corresponding to the timestamps
+            vec : vector of 0/1 representing the absence/presence of a detection at the corresponding timestamp of the time_vector
+            n_windows : number of windows to select
+            duration : duration of the windows in seconds, aligned on the local time (3600 : hours, 86400 : days)
+            tz : timezone of the local time, UTC by default
+            target_rate : target proportion of positives of the selection, the proportion of positives of vec by default
+            tolerance : maximum relative difference between the positive rate of the selection and the target rate (0.25 : ±25%), None for no constraint
+            min_bins : minimum number of timebins of a candidate window, by default half of the number of timebins of the fullest window
+            seed : seed of the random generator
+        Returns :
+            selected_time_vector_ts : list of the timestamps of the selected windows
+            selected_time_vector_str : list of the corresponding strings
+            selected_vec : list of the corresponding 0/1 values
+            selected_dates : list of the beginning of the selected windows, '%d/%m/%Y %H:%M:%S'
+    '''
+    ts = np.asarray(time_vector_ts, dtype=np.float64)
+    vec = np.asarray(vec)
+    windows, order, bounds, n_pos = window_counts(window_ids(ts, duration, tz), vec)
+    n_bins = np.diff(bounds)
+
+    min_bins = max(1, n_bins.max() // 2) if min_bins is None else min_bins
+    candidates = np.flatnonzero(n_bins >= min_bins)
+    target_rate = np.count_nonzero(vec) / len(vec) if target_rate is None else target_rate
+
+    selected, found = constrained_draw(n_bins[candidates], n_pos[candidates], n_windows, target_rate, tolerance=tolerance, rng=np.random.default_rng(seed))
+    if not found:
+        print(f'\nno selection of {n_windows} windows within ±{tolerance:.0%} of the positive rate {target_rate:.3f}, the closest one is returned')
+    selected = candidates[selected]
+
+    index = np.sort(np.concatenate([order[bounds[i]:bounds[i + 1]] for i in selected]))
+    # beginning of the windows, from local to UTC time
+    starts = windows[selected] * duration
+    if tz is None:
+        starts = pd.to_datetime(starts, unit='s')
+    else:
+        starts = pd.to_datetime(starts - tz_offset_minutes(starts * 10**9, tz) * 60, unit='s', utc=True).tz_convert(tz)
+
+    return ts[index].tolist(), np.asarray(time_vector_str, dtype=object)[index].tolist(), vec[index].tolist(), list(starts.strftime('%d/%m/%Y %H:%M:%S'))
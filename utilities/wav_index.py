@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# datetime templates found in wav filenames, regex : strftime format, tried in this order
+FILENAME_DATETIME_FORMATS = {r'\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}': '%Y-%m-%d_%H-%M-%S',
+                             r'\d{2}\d{2}\d{2}\d{2}\d{2}\d{2}': '%y%m%d%H%M%S',
+                             r'\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}': '%Y-%m-%dT%H-%M-%S',
+                             r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}': '%Y-%m-%dT%H:%M:%S',
+                             r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}': '%Y-%m-%d %H:%M:%S',
+                             r'\d{4}_\d{2}_\d{2}_\d{2}_\d{2}_\d{2}': '%Y_%m_%d_%H_%M_%S',
+                             r'\d{4}_\d{2}_\d{2}T\d{2}_\d{2}_\d{2}': '%Y_%m_%dT%H_%M_%S',
+                             r'\d{4}\d{2}\d{2}T\d{2}\d{2}\d{2}': '%Y%m%dT%H%M%S',
+                             r'\d{2}\d{2}\d{2}_\d{2}\d{2}\d{2}': '%y%m%d_%H%M%S'}
+
+# start times (UTC epochs in ns) of the wav files already parsed, per dataset and timezone
+_START_TIMES = {}
+
+
+def parse_filename_datetimes(filenames, tz) -> np.ndarray:
+    ''' Vectorized version of extract_datetime : extracts the datetime of a list of wav filenames
+        Parameters :
+            filenames : list/array of wav filenames
+            tz : timezone of the datetimes written in the filenames
+        Returns :
+            ns : int64 array of the UTC epochs in nanoseconds of the filenames
+    '''
+    names = pd.Series(np.asarray(filenames, dtype=object), dtype=object)
+    naive = pd.Series(pd.NaT, index=names.index, dtype='datetime64[ns]')
+
+    remaining = names.index
+    for regex, dt_format in FILENAME_DATETIME_FORMATS.items():
+        if len(remaining) == 0:
+            break
+        match = names[remaining].str.extract(f'({regex})', expand=False)
+        found = match.notna()
+        naive[remaining[found]] = pd.to_datetime(match[found], format=dt_format)
+        remaining = remaining[~found.to_numpy()]
+
+    if len(remaining):
+        raise ValueError(f'{names[remaining[0]]}: No datetime found')
+
+    return pd.DatetimeIndex(naive).tz_localize(tz).asi8
+
+
+def file_start_times(filenames, tz, dataset: str = None) -> np.ndarray:
+    ''' Start times of wav files from their filenames, the parsed datetimes are cached per dataset
+    so that each filename is only parsed once per session
+        Parameters :
+            filenames : list/array of wav filenames
+            tz : timezone of the datetimes written in the filenames
+            dataset : name of the dataset the files belong to
+        Returns :
+            ns : int64 array of the UTC epochs in nanoseconds, in the order of filenames
+    '''
+    known = _START_TIMES.setdefault((dataset, str(tz)), {})
+    new = [f for f in dict.fromkeys(filenames) if f not in known]
+    if new:
+        known.update(zip(new, parse_filename_datetimes(new, tz).tolist()))
+    return np.array([known[f] for f in filenames], dtype=np.int64)
+
+
+def file_index(times_ns: np.ndarray, starts_ns: np.ndarray, side: str = 'right') -> np.ndarray:
+    ''' Index of the source file of each time, i.e. the last file starting before it
+    Times before the first file are assigned to the first file
+        Parameters :
+            times_ns : int64 array of UTC epochs in nanoseconds (ex : start of timebins or detections)
+            starts_ns : sorted int64 array of the start times of the files
+            side : 'right' : a time equal to the start of a file is assigned to this file,
+                   'left' : it is assigned to the previous file
+        Returns :
+            index : int array of the index of the file of each time
+    '''
+    return np.maximum(np.searchsorted(starts_ns, times_ns, side=side) - 1, 0)
+
+
+def bins_to_files(times_ns: np.ndarray, filenames, tz, dataset: str = None, side: str = 'right') -> np.ndarray:
+    ''' Filename of the source wav file of each time (ex : start of timebins)
+        Parameters :
+            times_ns : int64 array of UTC epochs in nanoseconds
+            filenames : wav filenames the times can belong to, in any order
+            tz : timezone of the datetimes written in the filenames
+            dataset : name of the dataset the files belong to, used to cache the parsed start times
+            side : see file_index
+        Returns :
+            array of the filenames of each time
+    '''
+    filenames = np.array(sorted(set(filenames)), dtype=object)
+    starts_ns = file_start_times(filenames, tz, dataset=dataset)
+    order = np.argsort(starts_ns, kind='stable')
+    return filenames[order][file_index(times_ns, starts_ns[order], side=side)]
+
+
+def time_bin_index(times_ns: np.ndarray, edges_ns: np.ndarray) -> np.ndarray:
+    ''' Index of the time bin [edges[i], edges[i + 1]) containing each time
+        Parameters :
+            times_ns : int64 array of UTC epochs in nanoseconds
+            edges_ns : sorted int64 array of the bin edges
+        Returns :
+            index : int array, -1 for the times outside of the bins
+    '''
+    index = np.searchsorted(edges_ns, times_ns, side='right') - 1
+    index[(index < 0) | (index >= len(edges_ns) - 1)] = -1
+    return index